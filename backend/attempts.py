@@ -0,0 +1,302 @@
+"""Write-behind logging of answers into the append-only ``question_attempts`` table.
+
+Quiz endpoints call :meth:`AttemptBuffer.record`, which only appends the event
+to an in-memory list and one JSON line to a local spill file. A background
+thread writes the list to the database in a single bulk INSERT. The same
+transaction adds the batch to the precomputed counters (``question_stats``).
+The thread runs every ``ATTEMPT_FLUSH_SECONDS``, or sooner once
+``ATTEMPT_FLUSH_SIZE`` events are waiting. The request path never waits on the
+database, so thousands of answers a second cost the quiz endpoints a lock and a
+buffered file write.
+
+The spill file makes the buffer crash-safe. Events are written to the OS
+before ``record`` returns, so they survive a killed or crashed worker (not a
+power cut). Each flush moves the buffer to a new spill segment. The old
+segment is deleted once its rows are committed, and kept for the next flush if
+the INSERT fails. Every segment is held under an exclusive ``flock`` while its
+process is alive. On startup, :meth:`AttemptBuffer.recover` replays segments
+that no live worker holds. Delivery is at-least-once: a crash between the
+commit and the delete replays that one batch.
+
+While the database is down, at most ``MAX_RETAINED_BATCHES`` failed batches
+stay in memory with their segment open. Older ones are closed and left on
+disk, and the next successful flush replays them through ``recover``, so an
+outage does not pile up memory or file descriptors.
+
+Spill files live in ``ATTEMPT_SPILL_DIR`` (default ``attempt-spill``), one
+segment per worker at a time.
+"""
+
+import importlib.util
+import json
+import logging
+import os
+import threading
+import uuid
+from datetime import datetime
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Tuple
+
+from sqlalchemy import insert
+
+from db import SessionLocal
+from models import QuestionAttempt
+from question_stats import apply_attempts
+
+logger = logging.getLogger(__name__)
+
+FLUSH_SIZE = int(os.getenv("ATTEMPT_FLUSH_SIZE", "500"))
+FLUSH_SECONDS = float(os.getenv("ATTEMPT_FLUSH_SECONDS", "2"))
+SPILL_DIR = Path(os.getenv("ATTEMPT_SPILL_DIR", "attempt-spill"))
+
+# Spill segments are locked with flock where available (Linux, macOS). Without
+# it, recovery assumes a single worker and replays every segment it finds.
+HAS_FLOCK = importlib.util.find_spec("fcntl") is not None
+if HAS_FLOCK:
+    import fcntl
+
+SEGMENT_GLOB = "attempts-*.jsonl"
+MAX_RETAINED_BATCHES = 4
+
+# A logged answer: the QuestionAttempt columns except id.
+Attempt = Dict
+
+
+class _Segment:
+    """An open, locked spill file and the events written to it."""
+
+    __slots__ = ("path", "handle", "events")
+
+    def __init__(self, path: Path):
+        self.path = path
+        self.handle = open(path, "a", encoding="utf-8")
+        if HAS_FLOCK:
+            fcntl.flock(self.handle.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+        self.events: List[Attempt] = []
+
+    def append(self, event: Attempt) -> None:
+        line = dict(event, answered_at=event["answered_at"].isoformat())
+        self.handle.write(json.dumps(line, separators=(",", ":")) + "\n")
+        # Into the OS page cache: survives the process, not the machine.
+        self.handle.flush()
+        self.events.append(event)
+
+    def release(self) -> None:
+        """Close the file and drop its lock, leaving it on disk for ``recover``."""
+        self.handle.close()
+
+    def discard(self) -> None:
+        self.handle.close()
+        try:
+            self.path.unlink()
+        except OSError as exc:
+            logger.warning(f"Could not remove spill file {self.path}: {exc}")
+
+
+def _read_segment(handle) -> List[Attempt]:
+    events = []
+    for line in handle:
+        try:
+            event = json.loads(line)
+            event["answered_at"] = datetime.fromisoformat(event["answered_at"])
+        except (ValueError, KeyError, TypeError):
+            continue  # A line cut short by the crash
+        events.append(event)
+    return events
+
+
+class AttemptBuffer:
+    """Buffers answer events in memory and a spill file, and bulk-inserts them in the background."""
+
+    def __init__(
+        self,
+        session_factory: Callable = SessionLocal,
+        flush_size: int = FLUSH_SIZE,
+        flush_seconds: float = FLUSH_SECONDS,
+        spill_dir: Optional[Path] = SPILL_DIR,
+    ):
+        self.session_factory = session_factory
+        self.flush_size = max(1, flush_size)
+        self.flush_seconds = flush_seconds
+        self.spill_dir = Path(spill_dir) if spill_dir else None
+        self.flushed = 0
+        self.failed_flushes = 0
+        self.dropped = 0
+        self._released = False  # Segments were left on disk for recover()
+        self._segment: Optional[_Segment] = None
+        self._pending: List[Attempt] = []  # Used instead of a segment when spilling is off
+        self._unflushed: List[Tuple[Optional[_Segment], List[Attempt]]] = []
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    # -- writes ----------------------------------------------------------
+
+    def record(
+        self,
+        question_id: int,
+        answer: Optional[int],
+        is_correct: Optional[bool],
+        source: str,
+        session_id: Optional[str] = None,
+    ) -> None:
+        """Log one answer; returns without touching the database."""
+        event = {
+            "question_id": question_id,
+            "session_id": session_id,
+            "answer": answer,
+            "is_correct": is_correct,
+            "source": source,
+            "answered_at": datetime.utcnow(),
+        }
+        with self._lock:
+            self._ensure_thread()
+            if self.spill_dir is not None:
+                if self._segment is None:
+                    self._segment = self._new_segment()
+                self._segment.append(event)
+                waiting = len(self._segment.events)
+            else:
+                self._pending.append(event)
+                waiting = len(self._pending)
+        if waiting >= self.flush_size:
+            self._wake.set()
+
+    def _new_segment(self) -> _Segment:
+        self.spill_dir.mkdir(parents=True, exist_ok=True)
+        return _Segment(self.spill_dir / f"attempts-{os.getpid()}-{uuid.uuid4().hex[:12]}.jsonl")
+
+    # -- flushing --------------------------------------------------------
+
+    def flush(self) -> int:
+        """Insert every buffered event now; returns how many rows were written."""
+        with self._flush_lock:
+            with self._lock:
+                segment, self._segment = self._segment, None
+                pending, self._pending = self._pending, []
+                if segment is not None and segment.events:
+                    self._unflushed.append((segment, segment.events))
+                elif segment is not None:
+                    segment.discard()
+                if pending:
+                    self._unflushed.append((None, pending))
+                batches, self._unflushed = self._unflushed, []
+
+            written = 0
+            for index, (segment, events) in enumerate(batches):
+                try:
+                    self._insert(events)
+                except Exception as exc:
+                    self.failed_flushes += 1
+                    logger.error(f"❌ Could not write {len(events)} attempts, will retry: {exc}")
+                    with self._lock:
+                        self._unflushed = batches[index:] + self._unflushed
+                        excess = self._unflushed[:-MAX_RETAINED_BATCHES]
+                        self._unflushed = self._unflushed[-MAX_RETAINED_BATCHES:]
+                    self._shed(excess)
+                    break
+                if segment is not None:
+                    segment.discard()
+                written += len(events)
+            if written and self._released:
+                # The database is back: replay the segments shed during the outage.
+                try:
+                    written += self.recover()
+                    self._released = False
+                except Exception as exc:
+                    logger.error(f"❌ Could not replay shed attempt segments, will retry: {exc}")
+            self.flushed += written
+            return written
+
+    def _shed(self, batches: List[Tuple[Optional[_Segment], List[Attempt]]]) -> None:
+        for segment, events in batches:
+            if segment is not None:
+                segment.release()
+                self._released = True
+            else:
+                # Spilling is off: nothing on disk to come back to.
+                self.dropped += len(events)
+                logger.error(f"❌ Dropped {len(events)} attempts after repeated flush failures")
+
+    def _insert(self, events: List[Attempt]) -> None:
+        db = self.session_factory()
+        try:
+            db.execute(insert(QuestionAttempt), events)
+            apply_attempts(db, events)
+            db.commit()
+        except Exception:
+            db.rollback()
+            raise
+        finally:
+            db.close()
+
+    def recover(self) -> int:
+        """Write the events of spill segments no live process holds; returns how many."""
+        if self.spill_dir is None or not self.spill_dir.is_dir():
+            return 0
+        recovered = 0
+        for path in sorted(self.spill_dir.glob(SEGMENT_GLOB)):
+            with self._lock:
+                if self._segment is not None and path == self._segment.path:
+                    continue
+            try:
+                handle = open(path, "r", encoding="utf-8")
+            except OSError:
+                continue  # Already recovered by another worker
+            with handle:
+                if HAS_FLOCK:
+                    try:
+                        fcntl.flock(handle.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+                    except OSError:
+                        continue  # Its worker is alive
+                if not path.exists():
+                    continue
+                events = _read_segment(handle)
+                if events:
+                    self._insert(events)
+                path.unlink()
+            recovered += len(events)
+        if recovered:
+            logger.info(f"♻️ Recovered {recovered} attempts from spill files")
+        return recovered
+
+    # -- background thread -----------------------------------------------
+
+    def _ensure_thread(self) -> None:
+        if self._thread is None and not self._stop.is_set():
+            self._thread = threading.Thread(target=self._run, name="attempt-flusher", daemon=True)
+            self._thread.start()
+
+    def _run(self) -> None:
+        while not self._stop.is_set():
+            self._wake.wait(self.flush_seconds)
+            self._wake.clear()
+            try:
+                self.flush()
+            except Exception as exc:  # noqa: BLE001 - the flusher must keep running
+                logger.error(f"❌ Attempt flush failed: {exc}")
+
+    def close(self) -> None:
+        """Stop the flusher and write what is left (on shutdown)."""
+        self._stop.set()
+        self._wake.set()
+        thread, self._thread = self._thread, None
+        if thread is not None:
+            thread.join(timeout=self.flush_seconds + 5)
+        self.flush()
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            waiting = len(self._pending) + (len(self._segment.events) if self._segment else 0)
+            waiting += sum(len(events) for _, events in self._unflushed)
+        return {
+            "pending": waiting,
+            "flushed": self.flushed,
+            "failed_flushes": self.failed_flushes,
+            "dropped": self.dropped,
+        }
+
+
+attempt_buffer = AttemptBuffer()
@@ -0,0 +1,247 @@
+"""Batch ingestion: several PDFs, or ZIPs of PDFs, extracted concurrently as one job.
+
+``POST /upload/batch`` spools every file into a job directory and returns an
+:class:`IngestJob` handle at once. A shared pool of ``BATCH_UPLOAD_WORKERS``
+threads then extracts the files in parallel, so a term's papers take about as
+long as the slowest one. Groq calls from every worker share
+``groq_ai.GROQ_SYNC_MAX_CONCURRENCY``. ``GET /upload/batch/{job_id}`` reports
+per-file progress and results.
+
+Jobs are kept in process memory for ``BATCH_JOB_RETENTION_SECONDS`` after they
+finish. With several uvicorn workers, a poll must reach the worker that
+accepted the job.
+"""
+
+import contextvars
+import logging
+import os
+import shutil
+import tempfile
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, List, Optional, Tuple
+
+from fastapi import HTTPException, UploadFile, status
+from fastapi.concurrency import run_in_threadpool
+
+from uploads import UPLOAD_TMP_DIR, SpooledUpload, save_upload, unpack_zip
+
+logger = logging.getLogger(__name__)
+
+# Not tied to CPU count: much of a paper's time is Groq round-trips and MuPDF/tesseract
+# work that runs outside the GIL.
+BATCH_UPLOAD_WORKERS = int(os.getenv("BATCH_UPLOAD_WORKERS", "4"))
+BATCH_MAX_FILES = int(os.getenv("BATCH_MAX_FILES", "50"))
+# Whole-request cap for /upload/batch; each PDF is still held to MAX_UPLOAD_SIZE_MB.
+BATCH_MAX_UPLOAD_BYTES = int(os.getenv("BATCH_MAX_UPLOAD_MB", "200")) * 1024 * 1024
+# Cap on the PDFs of a batch once ZIPs are unpacked, so compressed archives can't fill the disk.
+BATCH_MAX_INFLATED_BYTES = int(os.getenv("BATCH_MAX_INFLATED_MB", "750")) * 1024 * 1024
+JOB_RETENTION_SECONDS = float(os.getenv("BATCH_JOB_RETENTION_SECONDS", "3600"))
+
+QUEUED, EXTRACTING, SAVING, DONE, FAILED = "queued", "extracting", "saving", "done", "failed"
+
+# ingest(path, file_name, report) -> (saved_count, total_parsed), where
+# report(status=None, **progress) updates the file's status and counters as it goes.
+IngestFn = Callable[..., Tuple[int, int]]
+
+
+class FileProgress:
+    __slots__ = (
+        "name", "path", "size", "sha256", "status", "saved_count", "total_parsed",
+        "duplicate_count", "pages_done", "total_pages", "seconds", "error",
+    )
+
+    def __init__(self, name: str, upload: SpooledUpload):
+        self.name = name
+        self.path = upload.path
+        self.size = upload.size
+        self.sha256 = upload.sha256
+        self.status = QUEUED
+        self.saved_count = 0
+        self.total_parsed = 0
+        self.duplicate_count = 0
+        self.pages_done = 0
+        self.total_pages: Optional[int] = None
+        self.seconds: Optional[float] = None
+        self.error: Optional[str] = None
+
+    @property
+    def finished(self) -> bool:
+        return self.status in (DONE, FAILED)
+
+    def as_dict(self) -> Dict:
+        return {
+            "file_name": self.name,
+            "status": self.status,
+            "size": self.size,
+            "sha256": self.sha256,
+            "saved_count": self.saved_count,
+            "total_parsed": self.total_parsed,
+            "duplicate_count": self.duplicate_count,
+            "pages_done": self.pages_done,
+            "total_pages": self.total_pages,
+            "seconds": self.seconds,
+            "error": self.error,
+        }
+
+
+class IngestJob:
+    def __init__(self, job_id: str, files: List[FileProgress], workdir: str):
+        self.id = job_id
+        self.files = files
+        self.workdir = workdir
+        self.created_at = time.time()
+        self.finished_at: Optional[float] = None
+
+    @property
+    def status(self) -> str:
+        if self.finished_at is not None:
+            return DONE
+        if all(item.status == QUEUED for item in self.files):
+            return QUEUED
+        return "running"
+
+    def as_dict(self) -> Dict:
+        return {
+            "job_id": self.id,
+            "status": self.status,
+            "total_files": len(self.files),
+            "completed_files": sum(1 for item in self.files if item.status == DONE),
+            "failed_files": sum(1 for item in self.files if item.status == FAILED),
+            "saved_count": sum(item.saved_count for item in self.files),
+            "files": [item.as_dict() for item in self.files],
+        }
+
+
+async def spool_batch(files: List[UploadFile]) -> Tuple[str, List[FileProgress]]:
+    """Save the uploaded PDFs, unpacking ZIPs, into a new job directory."""
+    workdir = tempfile.mkdtemp(prefix="batch-", dir=UPLOAD_TMP_DIR)
+    entries: List[FileProgress] = []
+    try:
+        for file in files:
+            name = file.filename or ""
+            lowered = name.lower()
+            if lowered.endswith(".zip"):
+                archive = await save_upload(file, BATCH_MAX_UPLOAD_BYTES, workdir, suffix=".zip")
+                try:
+                    members = await run_in_threadpool(
+                        unpack_zip,
+                        archive.path,
+                        workdir,
+                        max_files=BATCH_MAX_FILES - len(entries),
+                        max_total_bytes=BATCH_MAX_INFLATED_BYTES - sum(entry.size for entry in entries),
+                    )
+                finally:
+                    os.unlink(archive.path)
+                entries.extend(FileProgress(member, upload) for member, upload in members)
+            elif lowered.endswith(".pdf"):
+                entries.append(FileProgress(name, await save_upload(file, directory=workdir)))
+            else:
+                raise HTTPException(
+                    status_code=status.HTTP_400_BAD_REQUEST, detail=f"Only PDF or ZIP files are allowed: {name}"
+                )
+            if len(entries) > BATCH_MAX_FILES:
+                raise HTTPException(
+                    status_code=status.HTTP_400_BAD_REQUEST,
+                    detail=f"A batch can contain at most {BATCH_MAX_FILES} PDFs",
+                )
+        if not entries:
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="No PDF files found in the upload")
+    except BaseException:
+        shutil.rmtree(workdir, ignore_errors=True)
+        raise
+    return workdir, entries
+
+
+class IngestJobs:
+    """Registry of batch jobs and the worker pool that runs them."""
+
+    def __init__(self, workers: int = BATCH_UPLOAD_WORKERS, retention_seconds: float = JOB_RETENTION_SECONDS):
+        self.workers = max(1, workers)
+        self.retention_seconds = retention_seconds
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._jobs: Dict[str, IngestJob] = {}
+        self._lock = threading.Lock()
+
+    def _pool(self) -> ThreadPoolExecutor:
+        with self._lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="batch-ingest")
+            return self._executor
+
+    def get(self, job_id: str) -> Optional[IngestJob]:
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def start(
+        self,
+        files: List[FileProgress],
+        workdir: str,
+        ingest: IngestFn,
+        followup: Optional[Callable[[str], None]] = None,
+    ) -> IngestJob:
+        """Queue every file on the pool; ``followup(file_name)`` runs after each successful file."""
+        job = IngestJob(uuid.uuid4().hex, files, workdir)
+        with self._lock:
+            self._prune()
+            self._jobs[job.id] = job
+        logger.info(f"📦 Batch {job.id[:8]}: {len(files)} PDFs queued on {self.workers} workers")
+        pool = self._pool()
+        for item in files:
+            # A copy of the caller's context per file, so each file's spans join the request's trace.
+            pool.submit(contextvars.copy_context().run, self._run, job, item, ingest, followup)
+        return job
+
+    def _run(self, job: IngestJob, item: FileProgress, ingest: IngestFn, followup) -> None:
+        started = time.perf_counter()
+
+        def report(stage: Optional[str] = None, **progress) -> None:
+            if stage is not None:
+                item.status = stage
+            for field, value in progress.items():
+                setattr(item, field, value)
+
+        try:
+            item.saved_count, item.total_parsed = ingest(item.path, item.name, report)
+            item.status = DONE
+        except Exception as exc:  # noqa: BLE001 - recorded on the file, the batch goes on
+            item.error = str(exc) or exc.__class__.__name__
+            item.status = FAILED
+            logger.error(f"Batch {job.id[:8]}: {item.name} failed: {item.error}")
+        finally:
+            item.seconds = round(time.perf_counter() - started, 3)
+            try:
+                os.unlink(item.path)
+            except OSError:
+                pass
+
+        with self._lock:
+            if all(other.finished for other in job.files) and job.finished_at is None:
+                job.finished_at = time.time()
+                shutil.rmtree(job.workdir, ignore_errors=True)
+                logger.info(
+                    f"✅ Batch {job.id[:8]} finished: {sum(f.status == DONE for f in job.files)}/{len(job.files)} "
+                    f"PDFs in {job.finished_at - job.created_at:.1f}s"
+                )
+        if item.status == DONE and followup is not None:
+            # Queued behind the remaining extractions rather than holding this worker.
+            self._pool().submit(contextvars.copy_context().run, followup, item.name)
+
+    def _prune(self) -> None:
+        cutoff = time.time() - self.retention_seconds
+        expired = [
+            job_id for job_id, job in self._jobs.items() if job.finished_at is not None and job.finished_at < cutoff
+        ]
+        for job_id in expired:
+            del self._jobs[job_id]
+
+    def shutdown(self) -> None:
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=False, cancel_futures=True)
+
+
+ingest_jobs = IngestJobs()
@@ -0,0 +1,292 @@
+"""Benchmark PDF question extraction over a corpus of text, scanned and mixed PDFs.
+
+Each document is extracted in a fresh subprocess, so peak RSS belongs to that
+document alone. Groq is stubbed out, which keeps runs offline and repeatable.
+For every document the script reports:
+
+* pages/sec and questions/sec (median of ``--runs``);
+* time until the first questions are yielded (``iter_questions_from_pdf``);
+* peak RSS;
+* per-stage timings (pymupdf, pdfminer, OCR, layout, images, parsers).
+
+Stage timings come from the same ``stage_timer`` hooks that feed ``/metrics``.
+
+Without ``--corpus`` the script builds a synthetic corpus of text-based (one and
+two columns), scanned (image-only) and mixed PDFs, plus the sample paper from the
+repository root.
+With ``--corpus DIR``, documents are classified by subdirectory (``text/``,
+``scanned/``, ``mixed/``) or by filename prefix.
+
+Scanned and mixed documents need the tesseract binary. Without it they are
+reported as skipped rather than as zero-question runs, and ``--compare``
+leaves them out.
+
+Usage (from backend/):
+    python benchmarks/extraction.py
+    python benchmarks/extraction.py --runs 3 --output extraction.json
+    python benchmarks/extraction.py --corpus ~/exam-pdfs --compare extraction.json
+"""
+
+import argparse
+import json
+import resource
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from contextlib import contextmanager
+from pathlib import Path
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+SAMPLE_PAPER = BACKEND_DIR.parent / "Physics-X-Paper-I-2025.pdf"
+KINDS = ("text", "scanned", "mixed")
+# Kinds whose questions are (partly) on image-only pages.
+OCR_KINDS = ("scanned", "mixed")
+
+QUESTION_TEMPLATES = [
+    ("What is the SI unit of {q}?", ["Newton", "Joule", "Watt", "Pascal"]),
+    ("Which of the following best describes {q}?", ["A scalar", "A vector", "A tensor", "None of these"]),
+    ("The dimensional formula of {q} is:", ["[MLT^-2]", "[ML^2T^-2]", "[MT^-2]", "[M^0L^0T^0]"]),
+    ("Which instrument is used to measure {q}?", ["Ammeter", "Voltmeter", "Galvanometer", "Barometer"]),
+]
+QUANTITIES = ["force", "work", "power", "pressure", "momentum", "impulse", "current", "potential difference"]
+
+
+def _peak_rss_mb() -> float:
+    # ru_maxrss is reported in kilobytes on Linux.
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def _mcq_lines(count: int):
+    # Same layout as the board papers: numbered stem, options inline on the next line.
+    yield "PHYSICS - Paper I (Objective Type)"
+    for number in range(1, count + 1):
+        template, options = QUESTION_TEMPLATES[number % len(QUESTION_TEMPLATES)]
+        quantity = QUANTITIES[number % len(QUANTITIES)]
+        yield f"{number}. {template.format(q=quantity)}"
+        yield "  ".join(f"{letter}. {option}" for letter, option in zip("ABCD", options))
+
+
+def _text_pdf(pages: int, questions_per_page: int) -> bytes:
+    import fitz
+
+    doc = fitz.open()
+    lines = list(_mcq_lines(pages * questions_per_page))
+    per_page = -(-len(lines) // pages)
+    for index in range(pages):
+        page = doc.new_page()
+        page.insert_text((50, 60), "\n".join(lines[index * per_page:(index + 1) * per_page]), fontsize=10)
+    return doc.tobytes()
+
+
+def _two_column_pdf(pages: int, questions_per_page: int) -> bytes:
+    """Two columns drawn row by row (left line, right line, ...), so plain text output interleaves them."""
+    import fitz
+
+    doc = fitz.open()
+    lines = list(_mcq_lines(pages * questions_per_page))[1:]
+    per_page = -(-len(lines) // pages)
+    for index in range(pages):
+        page = doc.new_page()
+        page.insert_text((50, 40), "PHYSICS - Paper I (Objective Type)", fontsize=10)
+        chunk = lines[index * per_page:(index + 1) * per_page]
+        half = -(-len(chunk) // 2)
+        for row, (left, right) in enumerate(zip(chunk[:half], chunk[half:] + [""])):
+            y = 70 + row * 16
+            page.insert_text((40, y), left.replace("  ", "   "), fontsize=8)
+            if right:
+                page.insert_text((310, y), right.replace("  ", "   "), fontsize=8)
+    return doc.tobytes()
+
+
+def _rasterize(pdf_bytes: bytes, scanned_pages, dpi: int = 150) -> bytes:
+    """Replace ``scanned_pages`` with page-sized images of themselves (no text layer)."""
+    import fitz
+
+    source = fitz.open(stream=pdf_bytes, filetype="pdf")
+    out = fitz.open()
+    for index, page in enumerate(source):
+        if index in scanned_pages:
+            pix = page.get_pixmap(dpi=dpi)
+            new_page = out.new_page(width=page.rect.width, height=page.rect.height)
+            new_page.insert_image(new_page.rect, stream=pix.tobytes("png"))
+        else:
+            out.insert_pdf(source, from_page=index, to_page=index)
+    return out.tobytes()
+
+
+def build_synthetic_corpus(directory: Path, pages: int = 6, questions_per_page: int = 8) -> None:
+    text = _text_pdf(pages, questions_per_page)
+    (directory / "text-synthetic.pdf").write_bytes(text)
+    (directory / "scanned-synthetic.pdf").write_bytes(_rasterize(text, set(range(pages))))
+    (directory / "mixed-synthetic.pdf").write_bytes(_rasterize(text, set(range(0, pages, 2))))
+    (directory / "text-two-column.pdf").write_bytes(_two_column_pdf(pages, questions_per_page))
+    if SAMPLE_PAPER.exists():
+        (directory / "text-sample-paper.pdf").write_bytes(SAMPLE_PAPER.read_bytes())
+
+
+def _classify(path: Path, root: Path) -> str:
+    for part in path.relative_to(root).parts[:-1] + (path.stem.split("-")[0],):
+        if part in KINDS:
+            return part
+    return "text"
+
+
+def _ocr_unavailable() -> str:
+    """Why OCR cannot run here, or ``""`` if it can."""
+    try:
+        import pytesseract
+
+        pytesseract.get_tesseract_version()
+    except ImportError:
+        return "pytesseract is not installed"
+    except Exception as exc:  # noqa: BLE001 - usually TesseractNotFoundError
+        return f"tesseract is not available ({type(exc).__name__})"
+    return ""
+
+
+def run_worker(path: Path, runs: int) -> dict:
+    sys.path.insert(0, str(BACKEND_DIR))
+    import fitz
+
+    import extractor
+    import parser_registry
+
+    # Keep runs offline and repeatable: no Groq structuring or answer lookup.
+    extractor.validate_and_structure_with_groq = lambda text: []
+    extractor.identify_correct_answer_with_groq = lambda question, options: None
+
+    stages = {}
+    real_stage_timer = extractor.stage_timer
+
+    @contextmanager
+    def recording_stage_timer(stage, **attributes):
+        started = time.perf_counter()
+        try:
+            with real_stage_timer(stage, **attributes):
+                yield
+        finally:
+            entry = stages.setdefault(stage, [0.0, 0])
+            entry[0] += time.perf_counter() - started
+            entry[1] += 1
+
+    # Both modules imported stage_timer by name, so each needs patching.
+    extractor.stage_timer = recording_stage_timer
+    parser_registry.stage_timer = recording_stage_timer
+
+    pages = len(fitz.open(path))
+    timings = []
+    first_batch = []
+    questions = 0
+    for _ in range(runs):
+        stages.clear()
+        questions = 0
+        first = None
+        started = time.perf_counter()
+        # By path, as /upload passes its spooled file.
+        for batch in extractor.iter_questions_from_pdf(str(path)):
+            if batch.questions and first is None:
+                first = time.perf_counter() - started
+            questions += len(batch.questions)
+        timings.append(time.perf_counter() - started)
+        if first is not None:
+            first_batch.append(first)
+
+    seconds = statistics.median(timings)
+    return {
+        "pages": pages,
+        "bytes": path.stat().st_size,
+        "questions": questions,
+        "seconds_p50": round(seconds, 4),
+        "seconds_max": round(max(timings), 4),
+        "first_questions_seconds": round(statistics.median(first_batch), 4) if first_batch else None,
+        "pages_per_sec": round(pages / seconds, 2) if seconds else None,
+        "questions_per_sec": round(questions / seconds, 2) if seconds else None,
+        "peak_rss_mb": round(_peak_rss_mb(), 1),
+        # Stage totals from the last run.
+        "stages": {name: {"seconds": round(total, 4), "calls": calls} for name, (total, calls) in stages.items()},
+    }
+
+
+def run_document(path: Path, kind: str, runs: int, skip_reason: str = "") -> dict:
+    if skip_reason:
+        return {"document": path.name, "kind": kind, "skipped": skip_reason}
+    proc = subprocess.run(
+        [sys.executable, __file__, "--worker", str(path), "--runs", str(runs)],
+        cwd=BACKEND_DIR,
+        capture_output=True,
+        text=True,
+    )
+    row = {"document": path.name, "kind": kind}
+    if proc.returncode != 0:
+        row["error"] = (proc.stderr.strip().splitlines() or ["failed"])[-1]
+        return row
+    row.update(json.loads(proc.stdout.strip().splitlines()[-1]))
+    return row
+
+
+def _git_commit() -> str:
+    proc = subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=BACKEND_DIR, capture_output=True, text=True)
+    return proc.stdout.strip() or "unknown"
+
+
+def _print_comparison(results: list, baseline_path: Path) -> None:
+    baseline = {row["document"]: row for row in json.loads(baseline_path.read_text())["documents"]}
+    print(f"\nvs {baseline_path}:")
+    for row in results:
+        before = baseline.get(row["document"])
+        if not before or any(field in entry for entry in (row, before) for field in ("error", "skipped")):
+            continue
+        change = (row["seconds_p50"] - before["seconds_p50"]) / before["seconds_p50"] * 100
+        print(f"  {row['document']:<28} {before['seconds_p50']:>8.3f}s -> {row['seconds_p50']:>8.3f}s  ({change:+.1f}%)")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--corpus", type=Path, help="Directory of PDFs (default: synthetic corpus + sample paper)")
+    parser.add_argument("--runs", type=int, default=3)
+    parser.add_argument("--output", type=Path, help="Write results as JSON to this file")
+    parser.add_argument("--compare", type=Path, help="Previous --output file to compare p50 timings against")
+    parser.add_argument("--worker", type=Path, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        print(json.dumps(run_worker(args.worker, args.runs)))
+        return
+
+    corpus = args.corpus
+    if corpus is None:
+        corpus = Path(tempfile.mkdtemp(prefix="extraction-bench-"))
+        build_synthetic_corpus(corpus)
+
+    no_ocr = _ocr_unavailable()
+    results = []
+    for path in sorted(corpus.rglob("*.pdf")):
+        kind = _classify(path, corpus)
+        results.append(run_document(path, kind, args.runs, no_ocr if kind in OCR_KINDS else ""))
+    for row in results:
+        if "error" in row:
+            print(f"{row['document']:<28} {row['kind']:<8} FAILED: {row['error']}")
+            continue
+        if "skipped" in row:
+            print(f"{row['document']:<28} {row['kind']:<8} SKIPPED: {row['skipped']}")
+            continue
+        slowest = sorted(row["stages"].items(), key=lambda item: -item[1]["seconds"])[:3]
+        print(
+            f"{row['document']:<28} {row['kind']:<8} {row['pages']:>3}p {row['questions']:>4}q  "
+            f"p50 {row['seconds_p50']:>7.3f}s  first {row['first_questions_seconds'] or 0:>7.3f}s  "
+            f"{row['pages_per_sec']:>7.1f} pages/s  "
+            f"{row['questions_per_sec']:>7.1f} q/s  RSS {row['peak_rss_mb']:>6.1f}MB  "
+            + ", ".join(f"{name} {stage['seconds']:.3f}s" for name, stage in slowest)
+        )
+
+    if args.compare:
+        _print_comparison(results, args.compare)
+    if args.output:
+        report = {"commit": _git_commit(), "python": sys.version.split()[0], "runs": args.runs, "documents": results}
+        args.output.write_text(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,314 @@
+"""Load test for the quiz-serving API with simulated student sessions.
+
+For each ``--bank-size`` the script does the following:
+
+1. Seeds a question bank: a fresh SQLite file, or ``--database-url`` for Postgres.
+2. Starts ``uvicorn main:app`` with ``--workers`` processes.
+3. Points the app's Groq client at a local stub server. The stub answers chat
+   completions after ``--groq-latency-ms``, so hint and explain traffic is real
+   HTTP without hitting the network.
+
+An async httpx driver then runs virtual students, stepping through each
+``--concurrency`` level for ``--duration`` seconds. One session looks like this:
+
+* ``GET /quiz``, then ``GET /questions/{id}`` for each question;
+* an optional ``POST /assistant/hint`` per question (``--hint-rate``);
+* ``POST /assistant/feedback``, plus ``POST /assistant/explain`` for wrong answers.
+
+For every endpoint the report gives p50/p95/p99 latency, throughput and errors
+at each level, plus the highest throughput reached. It is printed and can be
+written as JSON.
+
+Usage (from backend/):
+    python benchmarks/load_test.py
+    python benchmarks/load_test.py --bank-size 200 5000 --concurrency 10 50 200 --duration 20 --output load.json
+    python benchmarks/load_test.py --database-url postgresql://quiz@localhost/quiz_bench --workers 4
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def _percentile(values, fraction: float) -> float:
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, round(fraction * (len(ordered) - 1))))
+    return ordered[index]
+
+
+# -- Groq stub -----------------------------------------------------------------
+
+
+def run_groq_stub(port: int, latency_ms: float) -> None:
+    """Serve an OpenAI-compatible ``chat/completions`` endpoint with fixed latency."""
+    import uvicorn
+    from starlette.applications import Starlette
+    from starlette.responses import JSONResponse
+    from starlette.routing import Route
+
+    async def completions(request):
+        body = await request.json()
+        await asyncio.sleep(latency_ms / 1000)
+        return JSONResponse({
+            "id": "stub",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": body.get("model", "stub"),
+            "choices": [{
+                "index": 0,
+                "finish_reason": "stop",
+                "message": {"role": "assistant", "content": "Think about how the quantity is defined."},
+            }],
+            "usage": {"prompt_tokens": 120, "completion_tokens": 24, "total_tokens": 144},
+        })
+
+    app = Starlette(routes=[Route("/openai/v1/chat/completions", completions, methods=["POST"])])
+    uvicorn.run(app, host="127.0.0.1", port=port, log_level="warning")
+
+
+# -- bank seeding and server ---------------------------------------------------
+
+
+def seed_bank(database_url: str, size: int, image_kb: int) -> None:
+    from sqlalchemy import create_engine, delete
+    from sqlalchemy.orm import Session
+
+    sys.path.insert(0, str(BACKEND_DIR))
+    from db import Base
+    from models import Question, QuestionBankVersion
+
+    engine = create_engine(database_url)
+    Base.metadata.create_all(engine)
+    image = os.urandom(image_kb * 1024) if image_kb else None
+    with Session(engine) as session:
+        session.execute(delete(Question))
+        session.execute(delete(QuestionBankVersion))
+        session.add_all(
+            Question(
+                question=f"Question {i}: which of the following best describes simple harmonic motion?",
+                options=["Random motion", "Translatory motion", "Circulatory motion", "Simple harmonic motion"],
+                correct_option=i % 4,
+                source_file=f"bank-{i // 50}.pdf",
+                page_no=1 + (i % 50) // 4,
+                question_no=1 + i % 50,
+                image_data=image if i % 5 == 0 else None,
+                image_type="webp" if image and i % 5 == 0 else None,
+            )
+            for i in range(size)
+        )
+        session.add(QuestionBankVersion(id=1, version=1))
+        session.commit()
+    engine.dispose()
+
+
+def _wait_until_up(url: str, timeout: float = 30.0) -> None:
+    import httpx
+
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            if httpx.get(url, timeout=1.0).status_code < 500:
+                return
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.2)
+    raise RuntimeError(f"{url} did not come up within {timeout:.0f}s")
+
+
+def start_process(args, env=None) -> subprocess.Popen:
+    return subprocess.Popen(
+        [sys.executable, *args],
+        cwd=BACKEND_DIR,
+        env=env,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.PIPE,
+        text=True,
+    )
+
+
+# -- driver --------------------------------------------------------------------
+
+
+class Recorder:
+    def __init__(self) -> None:
+        self.samples = {}
+
+    def add(self, endpoint: str, seconds: float, ok: bool) -> None:
+        latencies, errors = self.samples.setdefault(endpoint, ([], [0]))
+        latencies.append(seconds)
+        if not ok:
+            errors[0] += 1
+
+    def summary(self, elapsed: float) -> dict:
+        report = {}
+        for endpoint, (latencies, errors) in sorted(self.samples.items()):
+            report[endpoint] = {
+                "requests": len(latencies),
+                "rps": round(len(latencies) / elapsed, 1),
+                "errors": errors[0],
+                "p50_ms": round(_percentile(latencies, 0.50) * 1000, 2),
+                "p95_ms": round(_percentile(latencies, 0.95) * 1000, 2),
+                "p99_ms": round(_percentile(latencies, 0.99) * 1000, 2),
+            }
+        total = sum(len(latencies) for latencies, _ in self.samples.values())
+        report["total"] = {"requests": total, "rps": round(total / elapsed, 1)}
+        return report
+
+
+async def _timed(client, recorder: Recorder, label: str, method: str, url: str, **params):
+    started = time.perf_counter()
+    try:
+        response = await client.request(method, url, params=params)
+        ok = response.status_code < 400
+    except Exception:  # noqa: BLE001 - counted as an error
+        response, ok = None, False
+    recorder.add(label, time.perf_counter() - started, ok)
+    return response
+
+
+async def student_session(client, recorder: Recorder, options: argparse.Namespace, rng: random.Random) -> None:
+    async def think() -> None:
+        if options.think_ms:
+            await asyncio.sleep(rng.expovariate(1000 / options.think_ms))
+
+    quiz = await _timed(client, recorder, "GET /quiz", "GET", "/quiz", limit=options.quiz_size)
+    if quiz is None or quiz.status_code != 200:
+        return
+    for question in quiz.json()["questions"]:
+        question_id = question["id"]
+        await _timed(client, recorder, "GET /questions/{id}", "GET", f"/questions/{question_id}")
+        if rng.random() < options.hint_rate:
+            await _timed(client, recorder, "POST /assistant/hint", "POST", "/assistant/hint", question_id=question_id)
+        await think()
+        answer = rng.randrange(len(question["options"]))
+        await _timed(
+            client, recorder, "POST /assistant/feedback", "POST", "/assistant/feedback",
+            question_id=question_id, student_answer=answer,
+        )
+        if answer != question["correct_option"] and rng.random() < options.explain_rate:
+            await _timed(client, recorder, "POST /assistant/explain", "POST", "/assistant/explain", question_id=question_id)
+
+
+async def run_level(base_url: str, concurrency: int, options: argparse.Namespace) -> dict:
+    import httpx
+
+    recorder = Recorder()
+    deadline = time.monotonic() + options.duration
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+
+    async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=60.0) as client:
+        async def student(index: int) -> None:
+            rng = random.Random(options.seed * 100003 + index)
+            while time.monotonic() < deadline:
+                await student_session(client, recorder, options, rng)
+
+        started = time.perf_counter()
+        await asyncio.gather(*(student(index) for index in range(concurrency)))
+        elapsed = time.perf_counter() - started
+    return recorder.summary(elapsed)
+
+
+def run_bank(size: int, options: argparse.Namespace, groq_url: str) -> dict:
+    database_url = options.database_url or f"sqlite:///{tempfile.mkdtemp(prefix='load-test-')}/bank.db"
+    seed_bank(database_url, size, options.image_kb)
+
+    port = _free_port()
+    env = dict(
+        os.environ,
+        DATABASE_URL=database_url,
+        GROQ_API_KEY="stub",
+        GROQ_BASE_URL=groq_url,
+        TRACE_EXPORTER="",
+    )
+    server = start_process(
+        ["-m", "uvicorn", "main:app", "--port", str(port), "--workers", str(options.workers), "--log-level", "warning"],
+        env,
+    )
+    base_url = f"http://127.0.0.1:{port}"
+    try:
+        _wait_until_up(f"{base_url}/health")
+        levels = {}
+        for concurrency in options.concurrency:
+            levels[str(concurrency)] = asyncio.run(run_level(base_url, concurrency, options))
+            _print_level(size, concurrency, levels[str(concurrency)])
+    finally:
+        server.terminate()
+        server.wait(timeout=10)
+
+    endpoints = {name for level in levels.values() for name in level if name != "total"}
+    max_rps = {
+        name: max(level[name]["rps"] for level in levels.values() if name in level) for name in sorted(endpoints)
+    }
+    max_rps["total"] = max(level["total"]["rps"] for level in levels.values())
+    return {"bank_size": size, "levels": levels, "max_rps": max_rps}
+
+
+def _print_level(size: int, concurrency: int, report: dict) -> None:
+    print(f"\nbank={size} concurrency={concurrency}: {report['total']['rps']} req/s total")
+    for endpoint, row in report.items():
+        if endpoint == "total":
+            continue
+        print(
+            f"  {endpoint:<26} {row['rps']:>8.1f} req/s  p50 {row['p50_ms']:>8.2f}ms  "
+            f"p95 {row['p95_ms']:>8.2f}ms  p99 {row['p99_ms']:>8.2f}ms  errors {row['errors']}"
+        )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--bank-size", type=int, nargs="+", default=[500])
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[10, 50, 100])
+    parser.add_argument("--duration", type=float, default=15.0, help="Seconds per concurrency level")
+    parser.add_argument("--workers", type=int, default=1, help="uvicorn worker processes")
+    parser.add_argument("--database-url", help="Seed and serve this database instead of a temp SQLite file")
+    parser.add_argument("--image-kb", type=int, default=30, help="Image size on every 5th question (0 = none)")
+    parser.add_argument("--quiz-size", type=int, default=10)
+    parser.add_argument("--hint-rate", type=float, default=0.3)
+    parser.add_argument("--explain-rate", type=float, default=0.5)
+    parser.add_argument("--think-ms", type=float, default=0.0, help="Mean pause per question (0 = closed loop)")
+    parser.add_argument("--groq-latency-ms", type=float, default=300.0)
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--output", type=Path, help="Write results as JSON to this file")
+    parser.add_argument("--groq-stub", type=int, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.groq_stub:
+        run_groq_stub(args.groq_stub, args.groq_latency_ms)
+        return
+
+    groq_port = _free_port()
+    stub = start_process([__file__, "--groq-stub", str(groq_port), "--groq-latency-ms", str(args.groq_latency_ms)])
+    try:
+        # Any HTTP response means the stub is listening.
+        _wait_until_up(f"http://127.0.0.1:{groq_port}/openai/v1/chat/completions")
+        results = [run_bank(size, args, f"http://127.0.0.1:{groq_port}") for size in args.bank_size]
+    finally:
+        stub.terminate()
+        stub.wait(timeout=10)
+
+    print()
+    for result in results:
+        print(f"bank={result['bank_size']}: max {result['max_rps']['total']} req/s")
+    if args.output:
+        settings = {key: value for key, value in vars(args).items() if key not in ("output", "groq_stub")}
+        args.output.write_text(json.dumps({"settings": settings, "results": results}, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,104 @@
+"""Compare local_ai inference backends on cold-load time, latency and memory.
+
+Each backend is measured in a fresh subprocess so load time and peak RSS are
+not skewed by models loaded earlier in the run.
+
+Usage (from backend/):
+    python benchmarks/local_ai_backends.py
+    python benchmarks/local_ai_backends.py --backends torch onnx-int8 --runs 10 --output bench.json
+"""
+
+import argparse
+import json
+import os
+import resource
+import statistics
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+
+SAMPLE_QUESTION = "A body moves in a circle at constant speed. Which quantity is constant?"
+SAMPLE_OPTIONS = ["Velocity", "Acceleration", "Kinetic energy", "Momentum"]
+
+
+def _peak_rss_mb() -> float:
+    # ru_maxrss is reported in kilobytes on Linux.
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def run_worker(runs: int) -> dict:
+    sys.path.insert(0, str(BACKEND_DIR))
+    import local_ai
+
+    # Measure the model itself, not the Groq path or the batching thread.
+    local_ai._GROQ_AVAILABLE = False
+    local_ai.BATCHING_ENABLED = False
+
+    started = time.perf_counter()
+    local_ai._ensure_model_ready()
+    load_seconds = time.perf_counter() - started
+
+    results = {"backend": local_ai.BACKEND, "model": local_ai.MODEL_NAME, "load_seconds": round(load_seconds, 3)}
+    for kind, call in (
+        ("explanation", lambda: local_ai.generate_explanation(SAMPLE_QUESTION, SAMPLE_OPTIONS, 2)),
+        ("hint", lambda: local_ai.generate_hint(SAMPLE_QUESTION, SAMPLE_OPTIONS)),
+    ):
+        call()  # warm-up
+        timings = []
+        for _ in range(runs):
+            started = time.perf_counter()
+            call()
+            timings.append(time.perf_counter() - started)
+        results[f"{kind}_p50_ms"] = round(statistics.median(timings) * 1000, 1)
+        results[f"{kind}_max_ms"] = round(max(timings) * 1000, 1)
+
+    results["peak_rss_mb"] = round(_peak_rss_mb(), 1)
+    return results
+
+
+def run_backend(backend: str, runs: int) -> dict:
+    env = dict(os.environ, LOCAL_AI_BACKEND=backend)
+    proc = subprocess.run(
+        [sys.executable, __file__, "--worker", "--runs", str(runs)],
+        cwd=BACKEND_DIR,
+        env=env,
+        capture_output=True,
+        text=True,
+    )
+    if proc.returncode != 0:
+        return {"backend": backend, "error": proc.stderr.strip().splitlines()[-1:] or ["failed"]}
+    return json.loads(proc.stdout.strip().splitlines()[-1])
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--backends", nargs="+", default=["torch", "torch-int8", "onnx", "onnx-int8"])
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--output", type=Path, help="Write results as JSON to this file")
+    parser.add_argument("--worker", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        print(json.dumps(run_worker(args.runs)))
+        return
+
+    results = [run_backend(backend, args.runs) for backend in args.backends]
+    for row in results:
+        if "error" in row:
+            print(f"{row['backend']:<12} FAILED: {row['error'][0]}")
+            continue
+        print(
+            f"{row['backend']:<12} load {row['load_seconds']:>6.2f}s  "
+            f"explain p50 {row['explanation_p50_ms']:>8.1f}ms  "
+            f"hint p50 {row['hint_p50_ms']:>8.1f}ms  "
+            f"peak RSS {row['peak_rss_mb']:>7.1f}MB"
+        )
+    if args.output:
+        args.output.write_text(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,100 @@
+"""Microbenchmark: per-request CPU of building list/quiz response bodies.
+
+Compares the previous path (ORM objects -> QuestionDTO (orm_mode) ->
+jsonable_encoder -> stdlib json) with the current one (column tuples ->
+prebuilt dicts -> orjson) on a seeded SQLite bank with inline images.
+
+Usage (from backend/):
+    python benchmarks/serialization.py
+    python benchmarks/serialization.py --rows 200 --image-kb 40 --runs 50 --output serialization.json
+"""
+
+import argparse
+import json
+import os
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=200, help="Rows per page (the /questions maximum)")
+    parser.add_argument("--image-kb", type=int, default=40, help="Size of the inline image on each row")
+    parser.add_argument("--runs", type=int, default=30)
+    parser.add_argument("--output", type=Path, help="Write results as JSON to this file")
+    args = parser.parse_args()
+
+    os.environ["DATABASE_URL"] = f"sqlite:///{tempfile.mkdtemp(prefix='serialization-bench-')}/bench.db"
+    sys.path.insert(0, str(BACKEND_DIR))
+
+    import orjson
+    from fastapi.encoders import jsonable_encoder
+
+    import main as app_main
+    from db import SessionLocal, init_db
+    from models import Question
+
+    init_db()
+    db = SessionLocal()
+    image = os.urandom(args.image_kb * 1024)
+    db.add_all(
+        Question(
+            question=f"Question {i}: which of the following best describes simple harmonic motion?",
+            options=["Random motion", "Translatory motion", "Circulatory motion", "Simple harmonic motion"],
+            correct_option=3,
+            explanation="Acceleration is proportional to displacement and directed towards the mean position.",
+            source_file="bench.pdf",
+            page_no=i // 10,
+            question_no=i + 1,
+            image_data=image,
+            image_type="png",
+        )
+        for i in range(args.rows)
+    )
+    db.commit()
+
+    def orm_pydantic_stdlib() -> bytes:
+        records = db.query(Question).order_by(Question.id).limit(args.rows).all()
+        dtos = [app_main.QuestionDTO.from_orm(record) for record in records]
+        return json.dumps(jsonable_encoder(dtos)).encode()
+
+    def tuples_orjson() -> bytes:
+        rows = db.query(*app_main.QUESTION_COLUMNS).order_by(Question.id).limit(args.rows).all()
+        return orjson.dumps([app_main._question_payload(row) for row in rows])
+
+    results = {}
+    for name, fn in (("orm_pydantic_stdlib", orm_pydantic_stdlib), ("tuples_orjson", tuples_orjson)):
+        fn()  # warm-up
+        timings = []
+        for _ in range(args.runs):
+            db.expunge_all()
+            started = time.process_time()
+            body = fn()
+            timings.append(time.process_time() - started)
+        results[name] = {
+            "cpu_ms_p50": round(statistics.median(timings) * 1000, 2),
+            "cpu_ms_min": round(min(timings) * 1000, 2),
+            "body_bytes": len(body),
+        }
+    db.close()
+
+    speedup = results["orm_pydantic_stdlib"]["cpu_ms_p50"] / max(results["tuples_orjson"]["cpu_ms_p50"], 1e-6)
+    results["speedup"] = round(speedup, 2)
+    results["rows"] = args.rows
+    results["image_kb"] = args.image_kb
+
+    for name in ("orm_pydantic_stdlib", "tuples_orjson"):
+        row = results[name]
+        print(f"{name:<22} p50 {row['cpu_ms_p50']:8.2f} ms CPU/request  ({row['body_bytes'] / 1024:.0f} KiB)")
+    print(f"speedup                {speedup:8.2f}x")
+    if args.output:
+        args.output.write_text(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
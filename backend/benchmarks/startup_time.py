@@ -0,0 +1,138 @@
+"""Measure backend cold-start time and enforce a startup budget.
+
+Runs ``python -X importtime -c "import main"`` in fresh subprocesses, reports
+the median cumulative import time of ``main`` and its heaviest imports, and
+times the FastAPI startup hooks (database init). Exits non-zero when the
+median exceeds ``--budget-ms`` or a heavy optional dependency is imported
+eagerly, so it can gate CI.
+
+Usage (from backend/):
+    python benchmarks/startup_time.py
+    python benchmarks/startup_time.py --runs 10 --budget-ms 600 --output startup.json
+"""
+
+import argparse
+import json
+import os
+import re
+import statistics
+import subprocess
+import sys
+import tempfile
+from pathlib import Path
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+
+# Modules that must only be imported on first use, never while importing the app.
+LAZY_MODULES = ("fitz", "pdfminer", "pdf2image", "pytesseract", "PIL", "groq", "torch", "transformers")
+
+IMPORTTIME_LINE = re.compile(r"import time:\s+(\d+) \|\s+(\d+) \|( +)(\S+)")
+
+STARTUP_SNIPPET = """
+import asyncio, json, sys, time
+started = time.perf_counter()
+import main
+imported = time.perf_counter()
+asyncio.run(main.app.router.startup())
+ready = time.perf_counter()
+print(json.dumps({
+    "import_ms": (imported - started) * 1000,
+    "startup_hooks_ms": (ready - imported) * 1000,
+    "eager_modules": sorted(m for m in %r if m in sys.modules),
+}))
+""" % (LAZY_MODULES,)
+
+
+def _env() -> dict:
+    env = dict(os.environ)
+    env.setdefault("DATABASE_URL", f"sqlite:///{tempfile.mkdtemp(prefix='startup-bench-')}/bench.db")
+    return env
+
+
+def measure_importtime() -> dict:
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import main"],
+        cwd=BACKEND_DIR,
+        env=_env(),
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    main_us = 0
+    children = []
+    for line in proc.stderr.splitlines():
+        match = IMPORTTIME_LINE.match(line)
+        if not match:
+            continue
+        _, cumulative, indent, name = match.groups()
+        if name == "main" and len(indent) == 1:
+            main_us = int(cumulative)
+        elif len(indent) == 3:
+            # Direct imports of main (plus anything the interpreter imports at startup).
+            children.append((name, int(cumulative)))
+    return {"main_ms": main_us / 1000, "children": children}
+
+
+def measure_startup() -> dict:
+    proc = subprocess.run(
+        [sys.executable, "-c", STARTUP_SNIPPET],
+        cwd=BACKEND_DIR,
+        env=_env(),
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    return json.loads(proc.stdout.strip().splitlines()[-1])
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--budget-ms", type=float, default=800.0, help="Max median import+startup time")
+    parser.add_argument("--top", type=int, default=8, help="How many of the heaviest imports to list")
+    parser.add_argument("--output", type=Path, help="Write results as JSON to this file")
+    args = parser.parse_args()
+
+    import_runs = [measure_importtime() for _ in range(args.runs)]
+    startup_runs = [measure_startup() for _ in range(args.runs)]
+
+    import_ms = statistics.median(run["main_ms"] for run in import_runs)
+    hooks_ms = statistics.median(run["startup_hooks_ms"] for run in startup_runs)
+    eager = sorted({m for run in startup_runs for m in run["eager_modules"]})
+
+    heaviest = {}
+    for run in import_runs:
+        for name, cumulative in run["children"]:
+            heaviest.setdefault(name, []).append(cumulative / 1000)
+    top = sorted(((statistics.median(v), k) for k, v in heaviest.items()), reverse=True)[: args.top]
+
+    total_ms = import_ms + hooks_ms
+    print(f"import main      {import_ms:8.1f} ms (median of {args.runs})")
+    print(f"startup hooks    {hooks_ms:8.1f} ms")
+    print(f"total            {total_ms:8.1f} ms (budget {args.budget_ms:.0f} ms)")
+    print("heaviest imports:")
+    for ms, name in top:
+        print(f"  {name:<28} {ms:8.1f} ms")
+
+    if args.output:
+        args.output.write_text(json.dumps({
+            "import_ms": import_ms,
+            "startup_hooks_ms": hooks_ms,
+            "total_ms": total_ms,
+            "budget_ms": args.budget_ms,
+            "eager_modules": eager,
+            "heaviest_imports": [{"module": name, "ms": ms} for ms, name in top],
+        }, indent=2))
+
+    failed = False
+    if eager:
+        print(f"FAIL: heavy modules imported at startup: {', '.join(eager)}")
+        failed = True
+    if total_ms > args.budget_ms:
+        print(f"FAIL: startup {total_ms:.1f} ms exceeds budget {args.budget_ms:.0f} ms")
+        failed = True
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
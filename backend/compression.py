@@ -0,0 +1,34 @@
+"""Response compression middleware."""
+
+import importlib.util
+
+from starlette.middleware.gzip import GZipMiddleware
+from starlette.types import ASGIApp, Receive, Scope, Send
+
+# Paths whose bodies are already compressed (PNG/JPEG/WebP); compressing them
+# again only burns CPU.
+BINARY_PATH_SUFFIXES = ("/image", "/thumbnail")
+
+
+class CompressionMiddleware:
+    """Compress responses above ``minimum_size`` bytes.
+
+    Uses Brotli when ``brotli-asgi`` is installed (falling back to gzip for
+    clients that do not accept ``br``), otherwise Starlette's gzip middleware.
+    Binary image routes are passed through untouched.
+    """
+
+    def __init__(self, app: ASGIApp, minimum_size: int = 1024) -> None:
+        self.app = app
+        if importlib.util.find_spec("brotli_asgi") is not None:
+            from brotli_asgi import BrotliMiddleware
+
+            self.compressed_app = BrotliMiddleware(app, minimum_size=minimum_size, gzip_fallback=True)
+        else:
+            self.compressed_app = GZipMiddleware(app, minimum_size=minimum_size)
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] == "http" and not scope["path"].endswith(BINARY_PATH_SUFFIXES):
+            await self.compressed_app(scope, receive, send)
+        else:
+            await self.app(scope, receive, send)
@@ -7,7 +7,7 @@ class Settings(BaseSettings):
     app_name: str = "ACCA MCQ API"
     environment: str = "development"
 
-    database_url: str
+    database_url: str = "sqlite:///./questions.db"
     allowed_origins: List[AnyHttpUrl] = []
 
     hf_api_key: Optional[str] = None
@@ -27,13 +27,21 @@ SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 Base = declarative_base()
 metadata = MetaData()
 
-# Create all tables on startup
 def init_db():
-    """Initialize database tables"""
+    """Initialize database tables.
+
+    Called from the application's startup hook (not on import) so importing the
+    app stays cheap and the schema work runs once per process.
+    """
     try:
         Base.metadata.create_all(bind=engine)
         # Run migrations to add new columns
         run_migrations()
+        # Seed the bank version row now, so first writes only ever UPDATE it
+        from http_cache import seed_bank_version
+
+        with engine.begin() as conn:
+            seed_bank_version(conn)
     except Exception as e:
         print(f"Warning: Could not create tables: {e}")
 
@@ -69,12 +77,50 @@ def run_migrations():
                 except Exception as e:
                     if "already exists" not in str(e) and "duplicate" not in str(e).lower():
                         print(f"Note adding image_type: {e}")
+
+            # Add question_no if missing
+            if 'question_no' not in columns:
+                try:
+                    conn.execute(text("ALTER TABLE questions ADD COLUMN question_no INTEGER DEFAULT NULL"))
+                    print("✅ Added question_no column")
+                except Exception as e:
+                    if "already exists" not in str(e) and "duplicate" not in str(e).lower():
+                        print(f"Note adding question_no: {e}")
+
+            # Add thumbnail columns if missing
+            if 'thumbnail_data' not in columns:
+                try:
+                    if "postgresql" in DATABASE_URL or "postgres" in DATABASE_URL:
+                        conn.execute(text("ALTER TABLE questions ADD COLUMN thumbnail_data BYTEA DEFAULT NULL"))
+                    else:
+                        conn.execute(text("ALTER TABLE questions ADD COLUMN thumbnail_data BLOB DEFAULT NULL"))
+                    print("✅ Added thumbnail_data column")
+                except Exception as e:
+                    if "already exists" not in str(e) and "duplicate" not in str(e).lower():
+                        print(f"Note adding thumbnail_data: {e}")
+
+            if 'thumbnail_type' not in columns:
+                try:
+                    conn.execute(text("ALTER TABLE questions ADD COLUMN thumbnail_type VARCHAR(50) DEFAULT NULL"))
+                    print("✅ Added thumbnail_type column")
+                except Exception as e:
+                    if "already exists" not in str(e) and "duplicate" not in str(e).lower():
+                        print(f"Note adding thumbnail_type: {e}")
+
+        # Adaptive quiz sessions belong to a learner
+        if 'quiz_sessions' in inspector.get_table_names():
+            session_columns = {col['name'] for col in inspector.get_columns('quiz_sessions')}
+            if 'learner_id' not in session_columns:
+                with engine.begin() as conn:
+                    try:
+                        conn.execute(text("ALTER TABLE quiz_sessions ADD COLUMN learner_id VARCHAR(64) DEFAULT NULL"))
+                        print("✅ Added quiz_sessions.learner_id column")
+                    except Exception as e:
+                        if "already exists" not in str(e) and "duplicate" not in str(e).lower():
+                            print(f"Note adding learner_id: {e}")
     except Exception as e:
         print(f"Migration note: {e}")  # Don't fail if columns already exist
 
-# Call on import
-init_db()
-
 
 def get_db() -> Generator:
     db = SessionLocal()
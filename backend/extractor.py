@@ -1,3 +1,5 @@
+import contextvars
+import importlib.util
 import io
 import os
 import re
@@ -5,57 +7,21 @@ import logging
 import json
 import time
 import base64
-from typing import List, Dict, Tuple, Optional, Union, Any
+from typing import Any, BinaryIO, Dict, Iterator, List, NamedTuple, Optional, Tuple, Union
 from pathlib import Path
 from concurrent.futures import ThreadPoolExecutor, as_completed
 
-# Third-party imports - make them optional
-PDF_LIBS_AVAILABLE = True
-try:
-    import fitz  # PyMuPDF
-except ImportError:
-    PDF_LIBS_AVAILABLE = False
+from groq_ai import sync_slot
+from metrics import llm_call, stage_timer
+from parser_registry import PARSER_CONFIDENCE_THRESHOLD, Candidate, register_parser, run_parsers
+from tracing import annotate, span
 
-try:
-    from pdfminer.high_level import extract_text
-except ImportError:
-    PDF_LIBS_AVAILABLE = False
-
-try:
-    from pdf2image import convert_from_bytes
-except ImportError:
-    PDF_LIBS_AVAILABLE = False
-
-try:
-    import pytesseract
-except ImportError:
-    PDF_LIBS_AVAILABLE = False
-
-try:
-    from PIL import Image, UnidentifiedImageError
-except ImportError:
-    PDF_LIBS_AVAILABLE = False
-
-# Optional imports that don't break if missing
-try:
-    import pdfplumber
-except ImportError:
-    pdfplumber = None
-
-try:
-    import pdftotext
-except ImportError:
-    pdftotext = None
-
-try:
-    from pdfminer.pdfdocument import PDFDocument
-    from pdfminer.pdfparser import PDFParser
-    from pdfminer.pdfinterp import PDFPageInterpreter, PDFResourceManager
-    from pdfminer.converter import TextConverter
-    from pdfminer.layout import LAParams
-    from pdfminer.pdfpage import PDFPage
-except ImportError:
-    pass
+# Third-party PDF/OCR libraries are heavy (PyMuPDF, pdfminer, PIL, ...), so they
+# are only located here and imported on first use inside the functions below.
+PDF_LIBS_AVAILABLE = all(
+    importlib.util.find_spec(name) is not None
+    for name in ("fitz", "pdfminer", "pdf2image", "pytesseract", "PIL")
+)
 
 # Configure logging
 logger = logging.getLogger(__name__)
@@ -64,6 +30,28 @@ class PDFExtractionError(Exception):
     """Custom exception for PDF extraction errors."""
     pass
 
+# Uploads arrive as a path to the spooled file on disk; scripts and tests may pass raw bytes.
+PdfSource = Union[bytes, str, "os.PathLike[str]"]
+
+def open_pdf(source: PdfSource):
+    """Open ``source`` with PyMuPDF. A path is read from disk on demand, not copied into memory."""
+    import fitz
+
+    if isinstance(source, (bytes, bytearray)):
+        return fitz.open(stream=source, filetype="pdf")
+    return fitz.open(os.fspath(source), filetype="pdf")
+
+def open_pdf_stream(source: PdfSource) -> BinaryIO:
+    """Binary file object over ``source`` for pdfminer."""
+    if isinstance(source, (bytes, bytearray)):
+        return io.BytesIO(source)
+    return open(source, "rb")
+
+def pdf_size(source: PdfSource) -> int:
+    if isinstance(source, (bytes, bytearray)):
+        return len(source)
+    return os.path.getsize(source)
+
 def detect_paper_type(text: str) -> str:
     """Detect the type of exam paper"""
     text_lower = text.lower()
@@ -77,7 +65,7 @@ def detect_paper_type(text: str) -> str:
     else:
         return "GENERAL"
 
-def parse_english_mcqs(text: str) -> List[Dict]:
+def parse_english_mcqs(text: str, resolve_answers: bool = True) -> List[Dict]:
     """
     Parse MCQs from English exam PDF.
     Excludes listening questions (no audio).
@@ -206,18 +194,20 @@ def parse_english_mcqs(text: str) -> List[Dict]:
         if question_text and len(options) >= 2:
             # Try to identify correct answer using Groq (with retry logic)
             correct_option = None
-            logger.info(f"🔍 Calling Groq for English Q{q_num}...")
-            try:
-                correct_option = identify_correct_answer_with_groq(question_text, options[:4])
-                logger.info(f"✅ Groq returned: {correct_option}")
-            except Exception as e:
-                logger.error(f"❌ Groq exception for English Q{q_num}: {str(e)}")
+            if resolve_answers:
+                logger.info(f"🔍 Calling Groq for English Q{q_num}...")
+                try:
+                    correct_option = identify_correct_answer_with_groq(question_text, options[:4])
+                    logger.info(f"✅ Groq returned: {correct_option}")
+                except Exception as e:
+                    logger.error(f"❌ Groq exception for English Q{q_num}: {str(e)}")
             
             results.append({
                 'question': question_text,
                 'options': options[:4],
                 'correct_option': correct_option,
-                'explanation': ''
+                'explanation': '',
+                'question_no': q_num,
             })
             logger.info(f"✅ Q{q_num}: {question_text[:60]}... | {len(options)} options | Answer: {correct_option}")
         else:
@@ -228,7 +218,7 @@ def parse_english_mcqs(text: str) -> List[Dict]:
     logger.info(f"✅ English parser extracted {len(results)} questions (reading + writing, excluded listening)")
     return results
 
-def parse_physics_mcqs_improved(text: str) -> List[Dict]:
+def parse_physics_mcqs_improved(text: str, resolve_answers: bool = True) -> List[Dict]:
     """
     Parse MCQs from Physics exam PDF where options are embedded in question text.
     
@@ -335,18 +325,20 @@ def parse_physics_mcqs_improved(text: str) -> List[Dict]:
         if question_text and len(options) >= 2:
             # Try to identify correct answer using Groq (with retry logic)
             correct_option = None
-            logger.info(f"🔍 Calling Groq for Physics Q{q_num}...")
-            try:
-                correct_option = identify_correct_answer_with_groq(question_text, options[:4])
-                logger.info(f"✅ Groq returned: {correct_option}")
-            except Exception as e:
-                logger.error(f"❌ Groq exception for Physics Q{q_num}: {str(e)}")
+            if resolve_answers:
+                logger.info(f"🔍 Calling Groq for Physics Q{q_num}...")
+                try:
+                    correct_option = identify_correct_answer_with_groq(question_text, options[:4])
+                    logger.info(f"✅ Groq returned: {correct_option}")
+                except Exception as e:
+                    logger.error(f"❌ Groq exception for Physics Q{q_num}: {str(e)}")
             
             results.append({
                 'question': question_text,
                 'options': options[:4],  # Max 4 options
                 'correct_option': correct_option,
-                'explanation': ''
+                'explanation': '',
+                'question_no': q_num,
             })
             logger.info(f"✅ Q{q_num}: {question_text[:60]}... | {len(options)} options | Answer: {correct_option}")
         else:
@@ -357,12 +349,11 @@ def parse_physics_mcqs_improved(text: str) -> List[Dict]:
     logger.info(f"✅ Physics parser extracted {len(results)} questions")
     return results
 
-def is_pdf_corrupted(file_bytes: bytes) -> bool:
+def is_pdf_corrupted(source: PdfSource) -> bool:
     """Check if the PDF is corrupted."""
     try:
-        with io.BytesIO(file_bytes) as f:
-            # Try to open with PyMuPDF
-            doc = fitz.open(stream=f, filetype="pdf")
+        # Try to open with PyMuPDF
+        with open_pdf(source) as doc:
             # Check if document is encrypted
             if doc.is_encrypted:
                 return True
@@ -373,13 +364,21 @@ def is_pdf_corrupted(file_bytes: bytes) -> bool:
         logger.warning(f"PDF validation failed: {str(e)}")
         return True
 
-def try_pdfminer_extract(file_bytes: bytes) -> str:
+def try_pdfminer_extract(source: PdfSource) -> str:
     """Extract text from PDF using pdfminer.six with improved error handling."""
     if not PDF_LIBS_AVAILABLE:
         raise ImportError("PDF processing libraries are not installed")
-        
+
+    from pdfminer.converter import TextConverter
+    from pdfminer.high_level import extract_text
+    from pdfminer.layout import LAParams
+    from pdfminer.pdfdocument import PDFDocument
+    from pdfminer.pdfinterp import PDFPageInterpreter, PDFResourceManager
+    from pdfminer.pdfpage import PDFPage
+    from pdfminer.pdfparser import PDFParser
+
     try:
-        with io.BytesIO(file_bytes) as file_stream:
+        with open_pdf_stream(source) as file_stream:
             # Try with layout analysis first
             try:
                 # Create a PDF parser object
@@ -436,24 +435,30 @@ def try_pdfminer_extract(file_bytes: bytes) -> str:
         logger.error(f"PDF extraction failed: {str(e)}")
         raise PDFExtractionError(f"Failed to extract text from PDF: {str(e)}")
 
-def ocr_from_pdf_bytes(file_bytes: bytes, dpi: int = 300) -> str:
+def ocr_from_pdf(source: PdfSource, dpi: int = 300) -> str:
     """Extract text from PDF using OCR with improved error handling and performance."""
     if not PDF_LIBS_AVAILABLE:
         raise ImportError("PDF processing libraries are not installed")
-    
+
+    from pdf2image import convert_from_bytes, convert_from_path
+    from PIL import Image
+
     text_pages = []
     try:
         # Try to convert PDF to images
         try:
             logger.info(f"Converting PDF to images at {dpi} DPI...")
-            images = convert_from_bytes(
-                file_bytes,
-                dpi=dpi,
-                fmt='png',
-                thread_count=4,
-                grayscale=False  # Keep color for better OCR
-            )
+            with stage_timer("ocr_render"):
+                convert = convert_from_bytes if isinstance(source, (bytes, bytearray)) else convert_from_path
+                images = convert(
+                    source,
+                    dpi=dpi,
+                    fmt='png',
+                    thread_count=4,
+                    grayscale=False  # Keep color for better OCR
+                )
             logger.info(f"Successfully converted {len(images)} pages to images")
+            annotate(**{"pdf.pages": len(images), "ocr.dpi": dpi})
         except Exception as pdf_convert_err:
             # Poppler might not be installed, try without it
             logger.warning(f"PDF conversion with poppler failed: {str(pdf_convert_err)}")
@@ -462,45 +467,24 @@ def ocr_from_pdf_bytes(file_bytes: bytes, dpi: int = 300) -> str:
             # Try using PyMuPDF instead
             try:
                 import fitz
-                doc = fitz.open(stream=io.BytesIO(file_bytes), filetype="pdf")
+
                 images = []
                 zoom_factor = dpi / 72  # Convert DPI to zoom factor
-                for page_num in range(len(doc)):
-                    page = doc[page_num]
-                    pix = page.get_pixmap(matrix=fitz.Matrix(zoom_factor, zoom_factor))
-                    img = Image.frombytes("RGB", [pix.width, pix.height], pix.samples)
-                    images.append(img)
+                with open_pdf(source) as doc:
+                    for page_num in range(len(doc)):
+                        page = doc[page_num]
+                        pix = page.get_pixmap(matrix=fitz.Matrix(zoom_factor, zoom_factor))
+                        img = Image.frombytes("RGB", [pix.width, pix.height], pix.samples)
+                        images.append(img)
                 logger.info(f"Successfully converted {len(images)} pages using PyMuPDF")
             except Exception as fitz_err:
                 logger.error(f"PyMuPDF conversion also failed: {str(fitz_err)}")
                 raise PDFExtractionError(f"Could not convert PDF to images: {str(pdf_convert_err)}")
         
-        # Configure Tesseract for better MCQ extraction
-        custom_config = r'--oem 3 --psm 6 -c preserve_interword_spaces=1'
-        
         for page_num, img in enumerate(images):
             try:
                 logger.info(f"Processing page {page_num + 1} with OCR...")
-                
-                # Preprocess image for better OCR
-                img_rgb = img.convert('RGB')
-                
-                # Enhance image for better OCR
-                from PIL import ImageEnhance, ImageFilter
-                
-                # Increase contrast
-                enhancer = ImageEnhance.Contrast(img_rgb)
-                img_rgb = enhancer.enhance(2.5)
-                
-                # Increase brightness slightly
-                enhancer = ImageEnhance.Brightness(img_rgb)
-                img_rgb = enhancer.enhance(1.1)
-                
-                # Sharpen image
-                img_rgb = img_rgb.filter(ImageFilter.SHARPEN)
-                
-                # Perform OCR
-                txt = pytesseract.image_to_string(img_rgb, config=custom_config)
+                txt = _ocr_image(img, page_num + 1)
                 if txt.strip():
                     text_pages.append(txt.strip())
                     logger.info(f"Page {page_num + 1}: Extracted {len(txt)} characters")
@@ -523,6 +507,26 @@ def ocr_from_pdf_bytes(file_bytes: bytes, dpi: int = 300) -> str:
         logger.error(f"OCR processing failed: {str(e)}")
         raise PDFExtractionError(f"OCR processing failed: {str(e)}")
 
+# Configure Tesseract for better MCQ extraction
+TESSERACT_CONFIG = r'--oem 3 --psm 6 -c preserve_interword_spaces=1'
+
+def _ocr_image(img, page_number: int) -> str:
+    """OCR one rendered page after boosting contrast and sharpness."""
+    import pytesseract
+    from PIL import ImageEnhance, ImageFilter
+
+    # Preprocess image for better OCR
+    img_rgb = img.convert('RGB')
+    # Increase contrast
+    img_rgb = ImageEnhance.Contrast(img_rgb).enhance(2.5)
+    # Increase brightness slightly
+    img_rgb = ImageEnhance.Brightness(img_rgb).enhance(1.1)
+    # Sharpen image
+    img_rgb = img_rgb.filter(ImageFilter.SHARPEN)
+
+    with stage_timer("ocr_page", page=page_number):
+        return pytesseract.image_to_string(img_rgb, config=TESSERACT_CONFIG)
+
 def clean_text(text: str) -> str:
     """Clean and normalize text for better parsing - preserves structure."""
     if not text:
@@ -720,86 +724,340 @@ def aggressive_parser(text: str) -> List[Dict]:
     
     return results
 
-def extract_images_from_pdf(file_bytes: bytes) -> Dict[int, Tuple[bytes, str]]:
+def _image_png(doc, xref: int) -> Optional[bytes]:
+    import fitz
+
+    try:
+        pix = fitz.Pixmap(doc, xref)
+        # Convert to PNG
+        if pix.n - pix.alpha >= 4:  # CMYK
+            pix = fitz.Pixmap(fitz.csRGB, pix)
+        return pix.tobytes("png")
+    except Exception as e:
+        logger.debug(f"Error extracting image xref {xref}: {str(e)}")
+        return None
+
+def attach_images_to_questions(source: PdfSource, mcqs: List[Dict]) -> None:
     """
-    Extract images from PDF and return as dict: {page_number: (image_bytes, image_type)}
+    Record each question's page_no/bbox and attach the images printed in its region.
+
+    Only images assigned to a question are decoded; several images for one
+    question are stacked into a single picture. Everything is re-encoded by
+    :func:`image_pipeline.process_images` (downsampled, metadata stripped, thumbnailed).
     """
-    images_by_page = {}
-    
+    if not mcqs:
+        return
+
+    from image_pipeline import process_images
+    from pdf_layout import assign_images, locate_questions, read_layout
+
     try:
-        doc = fitz.open(stream=io.BytesIO(file_bytes), filetype="pdf")
-        
-        for page_num in range(len(doc)):
-            page = doc[page_num]
-            image_list = page.get_images()
-            
-            if image_list:
-                for img_index, img in enumerate(image_list):
-                    try:
-                        xref = img[0]
-                        pix = fitz.Pixmap(doc, xref)
-                        
-                        # Convert to PNG
-                        if pix.n - pix.alpha < 4:  # GRAY or RGB
-                            img_bytes = pix.tobytes("png")
-                        else:  # CMYK
-                            pix = fitz.Pixmap(fitz.csRGB, pix)
-                            img_bytes = pix.tobytes("png")
-                        
-                        images_by_page[page_num] = (img_bytes, "png")
-                        logger.info(f"✅ Extracted image from page {page_num + 1}")
-                        break  # Take first image per page
-                    except Exception as e:
-                        logger.debug(f"Error extracting image from page {page_num}: {str(e)}")
-                        continue
-        
-        logger.info(f"✅ Extracted {len(images_by_page)} images from PDF")
-        return images_by_page
-    
+        with open_pdf(source) as doc:
+            with stage_timer("layout"):
+                layout = read_layout(doc)
+            located = locate_questions(mcqs, layout.blocks)
+            assignments = assign_images(mcqs, layout.images)
+            annotate(questions_located=located, candidate_images=len(layout.images))
+            logger.info(
+                f"📐 Located {located}/{len(mcqs)} questions on their pages; "
+                f"{len(layout.images)} candidate images"
+            )
+
+            # PyMuPDF objects are not thread-safe, so only the re-encoding runs in parallel.
+            owners, groups = [], []
+            with stage_timer("images"):
+                for index in sorted(assignments):
+                    pngs = [png for png in (_image_png(doc, img.xref) for img in assignments[index]) if png]
+                    if pngs:
+                        owners.append(index)
+                        groups.append(pngs)
+                processed = process_images(groups)
+
+        raw_size = stored_size = 0
+        for index, pngs, result in zip(owners, groups, processed):
+            if result is None:
+                result = {"image_data": pngs[0], "image_type": "png"}
+            mcqs[index].update(result)
+            raw_size += sum(len(png) for png in pngs)
+            stored_size += len(result["image_data"])
+
+        logger.info(
+            f"✅ Attached images to {len(owners)} questions "
+            f"({raw_size // 1024} KB -> {stored_size // 1024} KB)"
+        )
     except Exception as e:
         logger.warning(f"Image extraction failed: {str(e)}")
-        return {}
 
-def extract_questions_from_pdf(file_bytes: bytes, skip_ocr: bool = False) -> List[Dict]:
+def _english_sections(text: str) -> str:
+    """The reading and writing sections: the part of an English paper its parser covers."""
+    kept = []
+    include = False
+    for line in text.split('\n'):
+        lowered = line.lower()
+        if 'section' in lowered and any(name in lowered for name in ('listening', 'reading', 'writing')):
+            include = 'listening' not in lowered
+            continue
+        if include:
+            kept.append(line)
+    return '\n'.join(kept)
+
+# Local parsers, scored against each other by parser_registry. Registration
+# order breaks ties, so the Physics parser stays the default for numbered papers.
+# Answers are looked up once for the winning candidate, never inside a parser.
+register_parser(
+    "physics",
+    lambda text: parse_physics_mcqs_improved(text, resolve_answers=False),
+    paper_types=("PHYSICS", "MATHEMATICS", "GENERAL"),
+)
+register_parser(
+    "english",
+    lambda text: parse_english_mcqs(text, resolve_answers=False),
+    paper_types=("ENGLISH",),
+    scope=_english_sections,
+)
+register_parser("generic", parse_mcqs_from_text)
+register_parser("block", fallback_block_parser)
+register_parser("aggressive", aggressive_parser)
+
+def parse_locally(text: str, paper_type: Optional[str] = None, names: Optional[List[str]] = None) -> Candidate:
+    """Run the registered local parsers on ``text`` and return the most confident candidate."""
+    best = run_parsers(text, paper_type, names)[0]
+    annotate(parser=best.name, parser_confidence=best.confidence)
+    return best
+
+def resolve_answers_with_groq(mcqs: List[Dict]) -> None:
+    """Fill in missing ``correct_option`` values, asking Groq about several questions at once.
+
+    Concurrency is bounded by ``groq_ai.GROQ_SYNC_MAX_CONCURRENCY``.
+    """
+    pending = [mcq for mcq in mcqs if mcq.get("correct_option") is None]
+    if not pending or not os.getenv("GROQ_API_KEY"):
+        return
+
+    def resolve(mcq: Dict) -> None:
+        try:
+            mcq["correct_option"] = identify_correct_answer_with_groq(mcq["question"], mcq["options"][:4])
+        except Exception as e:
+            logger.error(f"❌ Groq exception for Q{mcq.get('question_no')}: {str(e)}")
+
+    with ThreadPoolExecutor(max_workers=min(len(pending), ANSWER_WORKERS)) as pool:
+        # Each task gets a copy of the caller's context so its Groq span nests under the current trace.
+        futures = [pool.submit(contextvars.copy_context().run, resolve, mcq) for mcq in pending]
+        for future in futures:
+            future.result()
+
+def extract_questions_from_pdf(source: PdfSource, skip_ocr: bool = False) -> List[Dict]:
     """Main function to extract questions from PDF using multiple methods."""
+    with span("extract_questions", **{"pdf.bytes": pdf_size(source), "pdf.skip_ocr": skip_ocr}):
+        mcqs = [mcq for batch in iter_questions_from_pdf(source, skip_ocr) for mcq in batch.questions]
+        annotate(questions=len(mcqs), questions_with_images=sum(1 for mcq in mcqs if mcq.get("image_data")))
+        return mcqs
+
+# Pages read between parses of the streamed text (see iter_questions_from_pdf).
+STREAM_PAGES_PER_BATCH = int(os.getenv("EXTRACT_PAGES_PER_BATCH", "2"))
+OCR_DPI = 300
+# Threads asking Groq for answers within one streamed batch.
+ANSWER_WORKERS = 8
+
+class ExtractionBatch(NamedTuple):
+    """Questions that became final after ``pages_done`` of ``total_pages`` pages were read.
+
+    The last batch has ``layout_done`` set: by then every question yielded earlier
+    has been updated in place with its ``page_no``/``bbox`` and any images.
+    """
+    questions: List[Dict]
+    pages_done: int
+    total_pages: int
+    layout_done: bool = False
+
+def _layout_text(reader, page) -> str:
+    """Page text in reading order (columns, option rows) from ``pdf_layout``; plain text if that fails."""
+    try:
+        return reader.text(page)
+    except Exception as e:
+        logger.warning(f"Layout analysis failed on page {page.number + 1}, using plain text: {str(e)}")
+        return page.get_text("text")
+
+def _page_texts(source: PdfSource, skip_ocr: bool) -> Iterator[Tuple[int, int, str]]:
+    """Yield ``(page_index, page_count, text)`` one page at a time, OCR'ing pages with no text layer."""
+    import fitz
+
+    from pdf_layout import PageReader
+
+    ocr = not skip_ocr
+    reader = PageReader()
+    with open_pdf(source) as doc:
+        count = len(doc)
+        for index in range(count):
+            page = doc[index]
+            with stage_timer("pymupdf"):
+                text = _layout_text(reader, page).strip()
+            # A page left empty by layout filtering (only a watermark or footer) still has a text layer.
+            if not text and ocr and not page.get_text("text").strip():
+                try:
+                    from PIL import Image
+
+                    zoom = OCR_DPI / 72
+                    with stage_timer("ocr_render"):
+                        pix = page.get_pixmap(matrix=fitz.Matrix(zoom, zoom))
+                        img = Image.frombytes("RGB", [pix.width, pix.height], pix.samples)
+                    text = _ocr_image(img, index + 1).strip()
+                except Exception as e:
+                    # Usually a missing tesseract binary: don't retry it on every page.
+                    logger.warning(f"OCR unavailable, skipping it for the remaining pages: {str(e)}")
+                    ocr = False
+            yield index, count, text
+
+def _question_key(mcq: Dict) -> str:
+    return clean_text(mcq.get("question") or "")[:100].lower()
+
+def _occurrence_keys(mcqs: List[Dict]) -> List[Tuple[str, int]]:
+    """``(text key, nth occurrence)`` per question, stable as more text is appended.
+
+    Papers can legitimately repeat a stem, so the occurrence number is part of the key.
+    """
+    counts: Dict[str, int] = {}
+    keys = []
+    for mcq in mcqs:
+        key = _question_key(mcq)
+        counts[key] = counts.get(key, 0) + 1
+        keys.append((key, counts[key]))
+    return keys
+
+def iter_questions_from_pdf(
+    source: PdfSource, skip_ocr: bool = False, pages_per_batch: int = STREAM_PAGES_PER_BATCH
+) -> Iterator[ExtractionBatch]:
+    """Extract questions page by page, yielding each batch as soon as it is final.
+
+    Every ``pages_per_batch`` pages the text read so far is re-parsed by the
+    local parsers (see ``parser_registry``). They take milliseconds, so
+    re-parsing is cheap next to reading and OCR'ing pages, and a question that
+    runs onto the next page is simply completed by the next parse. The last
+    parsed question is held back until more text arrives, since its options may
+    still be on the next page.
+
+    Questions are only yielded once a parser clears
+    ``PARSER_CONFIDENCE_THRESHOLD``; that parser is then kept for the rest of
+    the document, so earlier batches are never re-parsed differently. If no
+    parser is confident by the last page, the whole text goes through
+    ``_extract_questions``, which asks Groq. Images and page numbers are filled
+    in once every page has been read.
+
+    A failure part-way raises :class:`PDFExtractionError` after the batches
+    already yielded; no ``layout_done`` batch follows.
+    """
+    if not PDF_LIBS_AVAILABLE:
+        logger.error("Required PDF processing libraries are not installed")
+        return
+
+    pages: List[str] = []
+    emitted: List[Dict] = []
+    seen = set()
+    paper_type = None
+    parser = None
+    total_pages = read = 0
+    try:
+        for index, total_pages, text in _page_texts(source, skip_ocr):
+            read = index + 1
+            if text:
+                pages.append(text)
+            last = index + 1 == total_pages
+            if not last and (index + 1) % max(1, pages_per_batch):
+                continue
+            doc_text = clean_text("\n\n".join(pages))
+            if not doc_text:
+                yield ExtractionBatch([], index + 1, total_pages)
+                continue
+            if paper_type is None:
+                with stage_timer("paper_type"):
+                    paper_type = detect_paper_type(doc_text)
+                logger.info(f"📋 Detected paper type: {paper_type}")
+                annotate(paper_type=paper_type)
+
+            best = parse_locally(doc_text, paper_type, [parser] if parser else None)
+            if parser is None:
+                if best.confidence < PARSER_CONFIDENCE_THRESHOLD:
+                    yield ExtractionBatch([], index + 1, total_pages)
+                    continue
+                parser = best.name
+                logger.info(f"🧩 Using the {parser} parser (confidence {best.confidence:.2f})")
+            ready = best.questions if last else best.questions[:-1]
+            batch = []
+            for mcq, key in zip(ready, _occurrence_keys(ready)):
+                if key[0] and key not in seen:
+                    seen.add(key)
+                    batch.append(mcq)
+            # Answers are looked up once per new question, not on every re-parse.
+            resolve_answers_with_groq(batch)
+            emitted.extend(batch)
+            if batch:
+                logger.info(f"📄 {index + 1}/{total_pages} pages read: {len(batch)} new questions ({len(emitted)} so far)")
+            yield ExtractionBatch(batch, index + 1, total_pages)
+
+        annotate(**{"pdf.pages": total_pages})
+        if parser is None:
+            logger.info("No local parser is confident about the streamed text, running the full cascade...")
+            text = "\n\n".join(pages)
+            # Pages without a text layer were already OCR'd above.
+            emitted = _extract_questions(source, True, text=text if len(text) >= 100 else None, images=False)
+            if emitted:
+                yield ExtractionBatch(emitted, total_pages, total_pages)
+
+        attach_images_to_questions(source, emitted)
+        yield ExtractionBatch([], total_pages, total_pages, layout_done=True)
+    except PDFExtractionError:
+        raise
+    except Exception as e:
+        # Batches already yielded may have been saved: the caller decides how to report that.
+        logger.error(f"❌ Extraction failed after {read} pages: {str(e)}", exc_info=e)
+        raise PDFExtractionError(f"Extraction failed after {read} of {total_pages} pages: {str(e)}") from e
+
+def _extract_questions(
+    source: PdfSource, skip_ocr: bool, text: Optional[str] = None, images: bool = True
+) -> List[Dict]:
     if not PDF_LIBS_AVAILABLE:
         logger.error("Required PDF processing libraries are not installed")
         return []
-        
-    def extract_with_pymupdf(file_bytes: bytes) -> str:
+
+    def extract_with_pymupdf(source: PdfSource) -> str:
         """Extract text from PDF using PyMuPDF with improved text extraction."""
+        from pdf_layout import PageReader
+
         try:
-            doc = fitz.open(stream=io.BytesIO(file_bytes), filetype="pdf")
-            text_pages = []
+            with open_pdf(source) as doc:
+                annotate(**{"pdf.pages": len(doc)})
+                text_pages = []
+                reader = PageReader()
             
-            for page_num in range(len(doc)):
-                try:
-                    page = doc[page_num]
-                    # Try different text extraction methods
-                    text = page.get_text("text")  # 'text' mode for better layout
-                    if not text.strip():
-                        # Fallback to raw text extraction
-                        text = page.get_text("blocks")
-                        if text:
-                            text = "\n".join(block[4] for block in text if block[4].strip())
+                for page_num in range(len(doc)):
+                    try:
+                        page = doc[page_num]
+                        # Reading order: columns, option rows, no running headers
+                        text = _layout_text(reader, page)
+                        if not text.strip():
+                            # Fallback to raw text extraction
+                            text = page.get_text("blocks")
+                            if text:
+                                text = "\n".join(block[4] for block in text if block[4].strip())
                     
-                    if text.strip():
-                        text_pages.append(text.strip())
+                        if text.strip():
+                            text_pages.append(text.strip())
                         
-                except Exception as e:
-                    logger.warning(f"Error processing page {page_num + 1} with PyMuPDF: {str(e)}")
-                    continue
+                    except Exception as e:
+                        logger.warning(f"Error processing page {page_num + 1} with PyMuPDF: {str(e)}")
+                        continue
             
-            return "\n\n".join(text_pages) if text_pages else ""
+                return "\n\n".join(text_pages) if text_pages else ""
         except Exception as e:
             logger.error(f"PyMuPDF extraction failed: {str(e)}")
             return ""
 
-    def extract_with_pdfminer(file_bytes: bytes) -> str:
+    def extract_with_pdfminer(source: PdfSource) -> str:
         """Fallback extraction using pdfminer.six."""
         try:
             from pdfminer.high_level import extract_text
-            return extract_text(io.BytesIO(file_bytes))
+            with open_pdf_stream(source) as stream:
+                return extract_text(stream)
         except Exception as e:
             logger.error(f"PDFMiner extraction failed: {str(e)}")
             return ""
@@ -807,26 +1065,29 @@ def extract_questions_from_pdf(file_bytes: bytes, skip_ocr: bool = False) -> Lis
     try:
         logger.info("Starting PDF extraction process...")
         
-        # Initialize text variable
-        text = ""
-        
-        # Try PyMuPDF first (fastest and most reliable)
-        logger.info("Trying PyMuPDF extraction...")
-        try:
-            text = extract_with_pymupdf(file_bytes)
-        except Exception as e:
-            logger.warning(f"PyMuPDF extraction failed, will try other methods: {str(e)}")
-            text = ""  # Ensure text is reset if extraction fails
+        # Text already read page by page (iter_questions_from_pdf) goes straight to parsing.
+        if text is None:
+            text = ""
+
+            # Try PyMuPDF first (fastest and most reliable)
+            logger.info("Trying PyMuPDF extraction...")
+            try:
+                with stage_timer("pymupdf"):
+                    text = extract_with_pymupdf(source)
+            except Exception as e:
+                logger.warning(f"PyMuPDF extraction failed, will try other methods: {str(e)}")
+                text = ""  # Ensure text is reset if extraction fails
         
-        # If text is too short or seems incomplete, try pdfminer
-        if not text or len(text.strip()) < 100:
-            logger.info("Text too short, trying PDFMiner...")
-            text = extract_with_pdfminer(file_bytes)
+            # If text is too short or seems incomplete, try pdfminer
+            if not text or len(text.strip()) < 100:
+                logger.info("Text too short, trying PDFMiner...")
+                with stage_timer("pdfminer"):
+                    text = extract_with_pdfminer(source)
         
-        # If still no luck, try OCR (unless skipped)
-        if (not text or len(text.strip()) < 50) and not skip_ocr:
-            logger.info("All text extraction methods failed, trying OCR...")
-            text = ocr_from_pdf_bytes(file_bytes)
+            # If still no luck, try OCR (unless skipped)
+            if (not text or len(text.strip()) < 50) and not skip_ocr:
+                logger.info("All text extraction methods failed, trying OCR...")
+                text = ocr_from_pdf(source)
         
         if not text or not text.strip():
             logger.error("❌ Failed to extract text from PDF")
@@ -835,64 +1096,40 @@ def extract_questions_from_pdf(file_bytes: bytes, skip_ocr: bool = False) -> Lis
         # Clean and normalize the extracted text
         logger.info("Cleaning and normalizing extracted text...")
         text = clean_text(text)
-        
-        # Extract images from PDF
-        logger.info("Extracting images from PDF...")
-        images_by_page = extract_images_from_pdf(file_bytes)
+        annotate(text_chars=len(text))
         
         # Detect paper type
-        paper_type = detect_paper_type(text)
+        with stage_timer("paper_type"):
+            paper_type = detect_paper_type(text)
         logger.info(f"📋 Detected paper type: {paper_type}")
+        annotate(paper_type=paper_type)
         
-        # Use appropriate parser based on paper type
-        extracted_mcqs = []
+        # Every local parser runs on the text; the most confident one wins.
+        best = parse_locally(text, paper_type)
+        logger.info(
+            f"🧩 Best local parser: {best.name} with {len(best.questions)} MCQs "
+            f"(confidence {best.confidence:.2f})"
+        )
         
-        if paper_type == "ENGLISH":
-            logger.info("Using English parser (excludes listening/writing)...")
-            extracted_mcqs = parse_english_mcqs(text)
-        elif paper_type == "PHYSICS":
-            logger.info("Using Physics parser...")
-            extracted_mcqs = parse_physics_mcqs_improved(text)
-        else:
-            logger.info("Using Physics parser as default...")
-            extracted_mcqs = parse_physics_mcqs_improved(text)
-        
-        if extracted_mcqs and len(extracted_mcqs) >= 5:
-            logger.info(f"✅ Parser found {len(extracted_mcqs)} MCQs - using this")
-            # Attach images to questions (if available)
-            for i, mcq in enumerate(extracted_mcqs):
-                if i in images_by_page:
-                    img_bytes, img_type = images_by_page[i]
-                    mcq['image_data'] = img_bytes
-                    mcq['image_type'] = img_type
-            return extracted_mcqs
-        
-        # Fallback: Try Groq-based extraction if specialized parser didn't find enough
-        logger.info("Specialized parser found < 5 questions, trying Groq...")
-        groq_mcqs = validate_and_structure_with_groq(text)
-        
-        if groq_mcqs and len(groq_mcqs) >= 5:
+        if best.confidence >= PARSER_CONFIDENCE_THRESHOLD:
+            resolve_answers_with_groq(best.questions)
+            if images:
+                attach_images_to_questions(source, best.questions)
+            return best.questions
+        
+        # No local parser is confident: let Groq structure the text
+        logger.info(f"Confidence below {PARSER_CONFIDENCE_THRESHOLD}, trying Groq...")
+        with stage_timer("parser_groq"):
+            groq_mcqs = validate_and_structure_with_groq(text)
+        
+        if groq_mcqs and len(groq_mcqs) >= len(best.questions):
             logger.info(f"✅ Extracted {len(groq_mcqs)} questions using Groq")
-            # Attach images to questions (if available)
-            for i, mcq in enumerate(groq_mcqs):
-                if i in images_by_page:
-                    img_bytes, img_type = images_by_page[i]
-                    mcq['image_data'] = img_bytes
-                    mcq['image_type'] = img_type
+            if images:
+                attach_images_to_questions(source, groq_mcqs)
             return groq_mcqs
         
-        # Final fallback: Try primary parser only (NOT fallback parser - it adds garbage)
-        logger.info("Groq found < 5 questions, trying primary parser...")
-        all_mcqs = []
-        
-        try:
-            logger.info("Trying Primary Parser...")
-            parsed_mcqs = parse_mcqs_from_text(text)
-            if parsed_mcqs:
-                logger.info(f"✅ Primary Parser found {len(parsed_mcqs)} MCQs")
-                all_mcqs.extend(parsed_mcqs)
-        except Exception as e:
-            logger.warning(f"Primary Parser failed: {str(e)}")
+        # Final fallback: the best local result, cleaned up
+        all_mcqs = best.questions
         
         # If we found MCQs with any parser, use them
         if all_mcqs:
@@ -931,12 +1168,8 @@ def extract_questions_from_pdf(file_bytes: bytes, skip_ocr: bool = False) -> Lis
                         logger.warning(f"Failed to identify correct answer: {str(e)}")
                         mcq['correct_option'] = 0  # Default to first option
             
-            # Attach images to questions (if available)
-            for i, mcq in enumerate(mcqs):
-                if i in images_by_page:
-                    img_bytes, img_type = images_by_page[i]
-                    mcq['image_data'] = img_bytes
-                    mcq['image_type'] = img_type
+            if images:
+                attach_images_to_questions(source, mcqs)
             
             return mcqs
         
@@ -967,6 +1200,7 @@ def validate_and_structure_with_groq(text: str) -> List[Dict]:
         # Split text into chunks to avoid token limits
         max_chunk_size = 3000
         chunks = [text[i:i+max_chunk_size] for i in range(0, len(text), max_chunk_size)]
+        annotate(chunks=len(chunks), chunk_chars=max_chunk_size, text_chars=len(text))
         all_questions = []
         
         for chunk_idx, text_chunk in enumerate(chunks):
@@ -1038,12 +1272,15 @@ FINAL INSTRUCTIONS:
         max_retries = 3
         for attempt in range(max_retries):
             try:
-                message = client.chat.completions.create(
-                    messages=[{"role": "user", "content": prompt}],
-                    model="llama-3.3-70b-versatile",
-                    max_tokens=4096,
-                    temperature=0.3,  # Lower temperature for more consistent extraction
-                )
+                with sync_slot(), llm_call("extract_mcqs") as call:
+                    annotate(**{"llm.attempt": attempt + 1, "llm.prompt_chars": len(prompt)})
+                    message = client.chat.completions.create(
+                        messages=[{"role": "user", "content": prompt}],
+                        model="llama-3.3-70b-versatile",
+                        max_tokens=4096,
+                        temperature=0.3,  # Lower temperature for more consistent extraction
+                    )
+                    call.record(message)
                 response = message.choices[0].message.content
                 logger.info(f"📥 Groq response length: {len(response)} chars")
                 logger.debug(f"Groq response preview: {response[:300]}...")
@@ -1164,48 +1401,189 @@ FINAL INSTRUCTIONS:
         return []
 
 
-def extract_answer_key_from_pdf(file_bytes: bytes) -> dict:
-    """Extract and validate answer key from PDF using Groq AI."""
+ANSWER_LETTERS = "ABCDE"
+# Answer key text is sent to Groq in pieces of this size, like question text is.
+ANSWER_KEY_CHUNK_CHARS = 3000
+
+# "1. A", "1) b", "Q1: C", "Question 12 - (d)", "7 A" ... A pair never spans lines, and a
+# lowercase letter needs a separator or brackets, so "12 a" in prose is not an answer.
+_ANSWER_PAIR_PATTERN = re.compile(
+    r"(?<![\w.])(?:Q(?:uestion)?\.?[ \t]*)?(\d{1,3})"
+    r"(?:[ \t]*[\.\)\:\-][ \t]*\(?([A-Ea-e])\)?|[ \t]*\(([A-Ea-e])\)|[ \t]*([A-E]))(?![\w])"
+)
+_GRID_LABEL_PATTERN = re.compile(r"^(?:Q(?:uestion)?s?|No\.?|Ans(?:wers?)?|Key)\s*[\.\:]?\s*", re.IGNORECASE)
+
+
+def _grid_row(line: str) -> List[str]:
+    return _GRID_LABEL_PATTERN.sub("", line).split()
+
+
+def parse_answer_key_text(text: str) -> Dict[int, str]:
+    """Parse an answer key locally into ``{question_number: letter}``.
+
+    Handles inline pairs ("1. A  2. C", "Q3: b", one pair per line), table
+    cells with the number and letter on lines of their own, and grid layouts
+    where a row of question numbers is followed by a row of answer letters.
+    The first answer seen for a question number wins.
+    """
+    answers: Dict[int, str] = {}
+    if not text:
+        return answers
+
+    lines = [line.strip() for line in clean_text(text).split("\n") if line.strip()]
+
+    # Grid layout: "1 2 3 4 5" followed by "A C B D A"; a single cell is "1" then "A".
+    grid_lines = set()
+    for idx in range(len(lines) - 1):
+        numbers, letters = _grid_row(lines[idx]), _grid_row(lines[idx + 1])
+        if (
+            (len(numbers) >= 2 or len(numbers) == 1 and len(numbers[0]) <= 3)
+            and len(numbers) == len(letters)
+            and all(n.isdigit() for n in numbers)
+            and all(len(l) == 1 and l.upper() in ANSWER_LETTERS for l in letters)
+        ):
+            for number, letter in zip(numbers, letters):
+                answers.setdefault(int(number), letter.upper())
+            grid_lines.update((idx, idx + 1))
+
+    remaining = "\n".join(line for idx, line in enumerate(lines) if idx not in grid_lines)
+    for match in _ANSWER_PAIR_PATTERN.finditer(remaining):
+        number = int(match.group(1))
+        if number > 0:
+            letter = match.group(2) or match.group(3) or match.group(4)
+            answers.setdefault(number, letter.upper())
+
+    return dict(sorted(answers.items()))
+
+
+def _answer_key_is_plausible(answers: Dict[int, str]) -> bool:
+    """A local parse is trusted when it covers most numbers up to the highest one."""
+    if not answers:
+        return False
+    return len(answers) >= 0.6 * max(answers)
+
+
+def _answer_key_payload(answers: Dict[int, str], format_notes: str) -> dict:
+    return {
+        "answers": [
+            {"question_number": number, "answer": letter, "explanation": ""}
+            for number, letter in answers.items()
+        ],
+        "total_questions": len(answers),
+        "format_notes": format_notes,
+    }
+
+
+def _extract_answer_key_text(source: PdfSource) -> str:
+    try:
+        with open_pdf(source) as doc:
+            return "\n\n".join(
+                text.strip() for text in (page.get_text("text") for page in doc) if text.strip()
+            )
+    except Exception as e:
+        logger.warning(f"PyMuPDF extraction failed: {e}, trying PDFMiner...")
+        try:
+            from pdfminer.high_level import extract_text
+
+            with open_pdf_stream(source) as stream:
+                return extract_text(stream)
+        except Exception as e2:
+            logger.error(f"PDFMiner also failed: {e2}")
+            raise PDFExtractionError("Could not extract text from answer key PDF") from e2
+
+
+def extract_answer_key_from_pdf(source: PdfSource) -> dict:
+    """Extract an answer key from a PDF.
+
+    The key is parsed locally first; Groq is only asked when the local parser
+    cannot make sense of the layout.
+    """
+    try:
+        logger.info("Extracting text from answer key PDF...")
+        try:
+            text = _extract_answer_key_text(source)
+        except PDFExtractionError as e:
+            return {"status": "error", "message": str(e)}
+
+        if not text or len(text.strip()) < 10:
+            return {"status": "error", "message": "Answer key PDF appears to be empty"}
+
+        logger.info(f"Extracted {len(text)} characters from answer key")
+
+        answers = parse_answer_key_text(text)
+        if _answer_key_is_plausible(answers):
+            logger.info(f"✅ Parsed answer key locally: {len(answers)} answers")
+            return {
+                "status": "success",
+                "source": "local",
+                "answer_key": _answer_key_payload(answers, "Parsed locally (inline pairs / grid)"),
+                "message": f"Successfully extracted answer key with {len(answers)} answers",
+            }
+
+        logger.info(f"Local answer key parser found {len(answers)} answers, falling back to Groq...")
+        result = _parse_answer_key_with_groq(text)
+        if result.get("status") != "success" and answers:
+            logger.warning("Groq fallback failed, returning partial local answer key")
+            return {
+                "status": "success",
+                "source": "local",
+                "answer_key": _answer_key_payload(answers, "Parsed locally (partial)"),
+                "message": f"Extracted a partial answer key with {len(answers)} answers",
+            }
+        return result
+
+    except Exception as e:
+        logger.error(f"Answer key extraction failed: {str(e)}")
+        import traceback
+        logger.debug(f"Traceback: {traceback.format_exc()}")
+        return {"status": "error", "message": f"Answer key extraction failed: {str(e)}"}
+
+
+def _answer_key_chunks(text: str, size: int = ANSWER_KEY_CHUNK_CHARS) -> List[str]:
+    """Split ``text`` at line breaks into pieces of at most ``size`` characters.
+
+    Keeping whole lines together keeps "12. C" pairs and grid rows intact; a
+    single line longer than ``size`` is cut.
+    """
+    chunks: List[str] = []
+    current = ""
+    for line in text.splitlines(keepends=True):
+        while len(line) > size:
+            chunks.append(line[:size])
+            line = line[size:]
+        if len(current) + len(line) > size:
+            chunks.append(current)
+            current = ""
+        current += line
+    if current.strip():
+        chunks.append(current)
+    return [chunk for chunk in chunks if chunk.strip()]
+
+
+def _parse_answer_key_with_groq(text: str) -> dict:
+    """Parse an answer key with Groq (fallback for layouts the local parser misses).
+
+    Long keys are sent in ``ANSWER_KEY_CHUNK_CHARS`` pieces; the first answer
+    returned for a question number wins.
+    """
     try:
         from groq import Groq
-        import os
-        
+
         api_key = os.getenv("GROQ_API_KEY")
         if not api_key:
             logger.warning("GROQ_API_KEY not set, cannot validate answer key")
             return {"status": "error", "message": "GROQ_API_KEY not configured"}
-        
+
         client = Groq(api_key=api_key)
-        
-        # Extract text from PDF
-        logger.info("Extracting text from answer key PDF...")
-        text = ""
-        
-        try:
-            doc = fitz.open(stream=io.BytesIO(file_bytes), filetype="pdf")
-            text_pages = []
-            for page_num in range(len(doc)):
-                page = doc[page_num]
-                text = page.get_text("text")
-                if text.strip():
-                    text_pages.append(text.strip())
-            text = "\n\n".join(text_pages)
-        except Exception as e:
-            logger.warning(f"PyMuPDF extraction failed: {e}, trying PDFMiner...")
-            try:
-                from pdfminer.high_level import extract_text
-                text = extract_text(io.BytesIO(file_bytes))
-            except Exception as e2:
-                logger.error(f"PDFMiner also failed: {e2}")
-                return {"status": "error", "message": "Could not extract text from answer key PDF"}
-        
-        if not text or len(text.strip()) < 10:
-            return {"status": "error", "message": "Answer key PDF appears to be empty"}
-        
-        logger.info(f"Extracted {len(text)} characters from answer key")
-        
-        # Use Groq to parse and validate the answer key
-        prompt = f"""You are an expert at parsing answer keys. Analyze this answer key document and extract all answers.
+        chunks = _answer_key_chunks(text)
+        annotate(chunks=len(chunks), chunk_chars=ANSWER_KEY_CHUNK_CHARS, text_chars=len(text))
+
+        answers: Dict[str, dict] = {}
+        format_notes = None
+        raw_response = None
+        for chunk_idx, text_chunk in enumerate(chunks):
+            # Use Groq to parse and validate the answer key
+            prompt = f"""You are an expert at parsing answer keys. Analyze this answer key document and extract all answers.
 
 TASK: Extract the answer key in a structured format.
 
@@ -1228,50 +1606,66 @@ PARSING RULES:
 5. If answer is a number, convert to letter (1->A, 2->B, etc.)
 
 ANSWER KEY TEXT:
-{text[:3000]}
+{text_chunk}
 
 Return ONLY valid JSON. No markdown, no explanations."""
 
-        logger.info("📤 Sending answer key to Groq for validation...")
-        
-        message = client.chat.completions.create(
-            messages=[{"role": "user", "content": prompt}],
-            model="llama-3.3-70b-versatile",
-            max_tokens=2048,
-            temperature=0.2,  # Low temperature for consistent parsing
-        )
-        
-        response = message.choices[0].message.content.strip()
-        logger.info(f"📥 Groq response length: {len(response)} chars")
-        
-        # Parse the JSON response
-        try:
-            # Try to find JSON in response
-            if not response.startswith('{'):
-                json_match = re.search(r'\{[\s\S]*\}', response)
-                if json_match:
-                    response = json_match.group(0)
-            
-            answer_key = json.loads(response)
-            
-            logger.info(f"✅ Successfully parsed answer key: {answer_key.get('total_questions', 0)} questions")
-            logger.info(f"   Format: {answer_key.get('format_notes', 'Unknown')}")
-            
-            return {
-                "status": "success",
-                "answer_key": answer_key,
-                "message": f"Successfully extracted answer key with {answer_key.get('total_questions', 0)} answers"
-            }
-            
-        except json.JSONDecodeError as e:
-            logger.error(f"Failed to parse Groq response as JSON: {e}")
-            logger.debug(f"Response was: {response[:500]}")
+            logger.info(f"📤 Sending answer key part {chunk_idx + 1}/{len(chunks)} to Groq ({len(text_chunk)} chars)...")
+
+            with sync_slot(), llm_call("answer_key") as call:
+                message = client.chat.completions.create(
+                    messages=[{"role": "user", "content": prompt}],
+                    model="llama-3.3-70b-versatile",
+                    max_tokens=2048,
+                    temperature=0.2,  # Low temperature for consistent parsing
+                )
+                call.record(message)
+
+            response = message.choices[0].message.content.strip()
+            logger.info(f"📥 Groq response length: {len(response)} chars")
+
+            # Parse the JSON response
+            try:
+                # Try to find JSON in response
+                if not response.startswith('{'):
+                    json_match = re.search(r'\{[\s\S]*\}', response)
+                    if json_match:
+                        response = json_match.group(0)
+
+                answer_key = json.loads(response)
+            except json.JSONDecodeError as e:
+                logger.error(f"Failed to parse Groq response for part {chunk_idx + 1} as JSON: {e}")
+                logger.debug(f"Response was: {response[:500]}")
+                raw_response = response[:500]
+                continue
+
+            for item in answer_key.get("answers") or []:
+                if isinstance(item, dict):
+                    answers.setdefault(str(item.get("question_number")), item)
+            format_notes = format_notes or answer_key.get("format_notes")
+
+        if not answers and raw_response is not None:
             return {
                 "status": "error",
                 "message": "Could not parse answer key format",
-                "raw_response": response[:500]
+                "raw_response": raw_response
             }
-        
+
+        answer_key = {
+            "answers": list(answers.values()),
+            "total_questions": len(answers),
+            "format_notes": format_notes or "Unknown",
+        }
+        logger.info(f"✅ Successfully parsed answer key: {len(answers)} questions")
+        logger.info(f"   Format: {answer_key['format_notes']}")
+
+        return {
+            "status": "success",
+            "source": "groq",
+            "answer_key": answer_key,
+            "message": f"Successfully extracted answer key with {len(answers)} answers"
+        }
+
     except Exception as e:
         logger.error(f"Answer key extraction failed: {str(e)}")
         import traceback
@@ -1308,12 +1702,14 @@ Options:
 
 Respond with ONLY: ANSWER: A (or B, C, D, etc.)"""
             
-            message = client.chat.completions.create(
-                messages=[{"role": "user", "content": prompt}],
-                model="llama-3.3-70b-versatile",
-                max_tokens=50,
-                temperature=0.1,
-            )
+            with sync_slot(), llm_call("identify_answer") as call:
+                message = client.chat.completions.create(
+                    messages=[{"role": "user", "content": prompt}],
+                    model="llama-3.3-70b-versatile",
+                    max_tokens=50,
+                    temperature=0.1,
+                )
+                call.record(message)
             response = message.choices[0].message.content.strip()
             logger.debug(f"🤖 Groq response: {response}")
             
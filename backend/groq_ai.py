@@ -1,34 +1,105 @@
 """Groq AI integration for fast, free explanations."""
 
+import asyncio
+import importlib.util
 import logging
 import os
-from typing import List, Optional
+import threading
+from contextlib import contextmanager
+from typing import TYPE_CHECKING, Iterator, List, Optional
+
+from metrics import llm_call
+
+if TYPE_CHECKING:
+    from groq import AsyncGroq, Groq
 
 logger = logging.getLogger(__name__)
 
-try:
-    from groq import Groq
-    _GROQ_AVAILABLE = True
-except ImportError:
-    _GROQ_AVAILABLE = False
+# The SDK pulls in httpx and its pydantic models; import it on first client use.
+_GROQ_AVAILABLE = importlib.util.find_spec("groq") is not None
+
+GROQ_MODEL = "llama-3.3-70b-versatile"
+GROQ_TIMEOUT_SECONDS = float(os.getenv("GROQ_TIMEOUT_SECONDS", "20"))
+GROQ_MAX_CONCURRENCY = int(os.getenv("GROQ_MAX_CONCURRENCY", "200"))
+# Blocking calls (PDF extraction, background explanations) share one process-wide
+# cap, so a batch of uploads extracting in parallel can't flood Groq with requests.
+GROQ_SYNC_MAX_CONCURRENCY = int(os.getenv("GROQ_SYNC_MAX_CONCURRENCY", "8"))
+
+_async_client: Optional["AsyncGroq"] = None
+_async_semaphore: Optional[asyncio.Semaphore] = None
+_sync_semaphore = threading.BoundedSemaphore(GROQ_SYNC_MAX_CONCURRENCY)
 
 
 class GroqAIUnavailable(RuntimeError):
     """Raised when Groq API is not available."""
 
 
-def _get_groq_client() -> Optional[Groq]:
-    """Get Groq client if API key is configured."""
+def _get_api_key() -> str:
     if not _GROQ_AVAILABLE:
         raise GroqAIUnavailable("Groq SDK not installed. Run: pip install groq")
-    
+
     api_key = os.getenv("GROQ_API_KEY")
     if not api_key:
         raise GroqAIUnavailable("GROQ_API_KEY not set in .env")
-    
+    return api_key
+
+
+def _get_groq_client() -> "Groq":
+    """Get Groq client if API key is configured."""
+    api_key = _get_api_key()
+    from groq import Groq
+
     return Groq(api_key=api_key)
 
 
+def _get_async_groq_client() -> "AsyncGroq":
+    """Get the shared async Groq client, creating it on first use.
+
+    The client is reused across requests so its httpx connection pool is shared.
+    """
+    global _async_client
+    if _async_client is None:
+        api_key = _get_api_key()
+        from groq import AsyncGroq
+
+        _async_client = AsyncGroq(
+            api_key=api_key,
+            timeout=GROQ_TIMEOUT_SECONDS,
+            max_retries=1,
+        )
+    return _async_client
+
+
+def _get_async_semaphore() -> asyncio.Semaphore:
+    global _async_semaphore
+    if _async_semaphore is None:
+        _async_semaphore = asyncio.Semaphore(GROQ_MAX_CONCURRENCY)
+    return _async_semaphore
+
+
+@contextmanager
+def sync_slot() -> Iterator[None]:
+    """Hold one of the ``GROQ_SYNC_MAX_CONCURRENCY`` slots for a blocking Groq call."""
+    with _sync_semaphore:
+        yield
+
+
+def inflight_requests() -> int:
+    """Groq calls (async and blocking) currently holding a concurrency slot."""
+    inflight = GROQ_SYNC_MAX_CONCURRENCY - _sync_semaphore._value
+    if _async_semaphore is not None:
+        inflight += GROQ_MAX_CONCURRENCY - _async_semaphore._value
+    return inflight
+
+
+async def close_async_client() -> None:
+    """Close the shared async client (called on application shutdown)."""
+    global _async_client
+    if _async_client is not None:
+        await _async_client.close()
+        _async_client = None
+
+
 def _format_options(options: List[str]) -> str:
     """Format options with labels."""
     labels = "ABCDEFGHIJKLMNOPQRSTUVWXYZ"
@@ -39,30 +110,59 @@ def _format_options(options: List[str]) -> str:
     return "\n".join(formatted)
 
 
+def _option_text(options: List[str], index: Optional[int]) -> str:
+    if index is not None and 0 <= index < len(options):
+        return options[index]
+    return "Unknown"
+
+
+def _explanation_prompt(question: str, options: List[str], correct_index: Optional[int]) -> str:
+    return (
+        "You are an expert tutor. Explain why the correct MCQ option is right in 2-3 sentences.\n"
+        f"Question: {question}\n"
+        f"Options:\n{_format_options(options)}\n"
+        f"Correct option: {_option_text(options, correct_index)}\n"
+        "Explain clearly and concisely."
+    )
+
+
+def _hint_prompt(question: str, options: List[str]) -> str:
+    return (
+        "Provide a helpful hint (2 sentences) for this multiple-choice question without revealing the answer. "
+        "Focus on key concepts the student should think about.\n"
+        f"Question: {question}\n"
+        f"Options:\n{_format_options(options)}\n"
+    )
+
+
+def _feedback_prompt(
+    question: str,
+    options: List[str],
+    student_index: int,
+    correct_index: Optional[int],
+) -> str:
+    return (
+        "Provide constructive feedback (2-3 sentences) for a student's MCQ answer. "
+        "Mention if they are correct or not and why.\n"
+        f"Question: {question}\n"
+        f"Options:\n{_format_options(options)}\n"
+        f"Student answer: {_option_text(options, student_index)}\n"
+        f"Correct answer: {_option_text(options, correct_index)}\n"
+    )
+
+
 def generate_explanation(question: str, options: List[str], correct_index: Optional[int]) -> str:
     """Generate explanation using Groq API."""
     try:
         client = _get_groq_client()
-        correct_option = (
-            options[correct_index]
-            if correct_index is not None and 0 <= correct_index < len(options)
-            else "Unknown"
-        )
-
-        prompt = (
-            "You are an expert tutor. Explain why the correct MCQ option is right in 2-3 sentences.\n"
-            f"Question: {question}\n"
-            f"Options:\n{_format_options(options)}\n"
-            f"Correct option: {correct_option}\n"
-            "Explain clearly and concisely."
-        )
-
-        message = client.chat.completions.create(
-            messages=[{"role": "user", "content": prompt}],
-            model="llama-3.3-70b-versatile",
-            max_tokens=200,
-            temperature=0.7,
-        )
+        with sync_slot(), llm_call("explanation") as call:
+            message = client.chat.completions.create(
+                messages=[{"role": "user", "content": _explanation_prompt(question, options, correct_index)}],
+                model=GROQ_MODEL,
+                max_tokens=200,
+                temperature=0.7,
+            )
+            call.record(message)
 
         return message.choices[0].message.content.strip()
     except Exception as exc:
@@ -74,19 +174,14 @@ def generate_hint(question: str, options: List[str]) -> str:
     """Generate hint using Groq API."""
     try:
         client = _get_groq_client()
-        prompt = (
-            "Provide a helpful hint (2 sentences) for this multiple-choice question without revealing the answer. "
-            "Focus on key concepts the student should think about.\n"
-            f"Question: {question}\n"
-            f"Options:\n{_format_options(options)}\n"
-        )
-
-        message = client.chat.completions.create(
-            messages=[{"role": "user", "content": prompt}],
-            model="llama-3.3-70b-versatile",
-            max_tokens=120,
-            temperature=0.7,
-        )
+        with sync_slot(), llm_call("hint") as call:
+            message = client.chat.completions.create(
+                messages=[{"role": "user", "content": _hint_prompt(question, options)}],
+                model=GROQ_MODEL,
+                max_tokens=120,
+                temperature=0.7,
+            )
+            call.record(message)
 
         return message.choices[0].message.content.strip()
     except Exception as exc:
@@ -103,34 +198,81 @@ def generate_feedback(
     """Generate feedback using Groq API."""
     try:
         client = _get_groq_client()
-        student_option = (
-            options[student_index]
-            if 0 <= student_index < len(options)
-            else "Unknown"
-        )
-        correct_option = (
-            options[correct_index]
-            if correct_index is not None and 0 <= correct_index < len(options)
-            else "Unknown"
-        )
+        with sync_slot(), llm_call("feedback") as call:
+            message = client.chat.completions.create(
+                messages=[{"role": "user", "content": _feedback_prompt(question, options, student_index, correct_index)}],
+                model=GROQ_MODEL,
+                max_tokens=160,
+                temperature=0.7,
+            )
+            call.record(message)
+
+        return message.choices[0].message.content.strip()
+    except Exception as exc:
+        logger.error(f"Groq feedback failed: {exc}")
+        raise
+
+
+async def complete_async(
+    prompt: str, max_tokens: int = 200, temperature: float = 0.7, call_site: str = "completion"
+) -> str:
+    """Run a single chat completion on the shared async client.
+
+    Waiting on Groq does not hold a worker thread. In-flight calls are capped by
+    ``GROQ_MAX_CONCURRENCY`` and each call is bounded by ``GROQ_TIMEOUT_SECONDS``.
+    Cancelling the awaiting task cancels the underlying HTTP request.
+    ``call_site`` labels the call in the LLM metrics.
+    """
+    client = _get_async_groq_client()
+    async with _get_async_semaphore():
+        with llm_call(call_site) as call:
+            try:
+                message = await asyncio.wait_for(
+                    client.chat.completions.create(
+                        messages=[{"role": "user", "content": prompt}],
+                        model=GROQ_MODEL,
+                        max_tokens=max_tokens,
+                        temperature=temperature,
+                    ),
+                    timeout=GROQ_TIMEOUT_SECONDS,
+                )
+                call.record(message)
+            except asyncio.TimeoutError as exc:
+                raise GroqAIUnavailable(f"Groq request timed out after {GROQ_TIMEOUT_SECONDS:g}s") from exc
+    return message.choices[0].message.content.strip()
 
-        prompt = (
-            "Provide constructive feedback (2-3 sentences) for a student's MCQ answer. "
-            "Mention if they are correct or not and why.\n"
-            f"Question: {question}\n"
-            f"Options:\n{_format_options(options)}\n"
-            f"Student answer: {student_option}\n"
-            f"Correct answer: {correct_option}\n"
-        )
 
-        message = client.chat.completions.create(
-            messages=[{"role": "user", "content": prompt}],
-            model="llama-3.3-70b-versatile",
-            max_tokens=160,
-            temperature=0.7,
+async def generate_explanation_async(question: str, options: List[str], correct_index: Optional[int]) -> str:
+    """Async variant of :func:`generate_explanation`."""
+    try:
+        return await complete_async(
+            _explanation_prompt(question, options, correct_index), max_tokens=200, call_site="explanation"
         )
+    except Exception as exc:
+        logger.error(f"Groq explanation failed: {exc}")
+        raise
 
-        return message.choices[0].message.content.strip()
+
+async def generate_hint_async(question: str, options: List[str]) -> str:
+    """Async variant of :func:`generate_hint`."""
+    try:
+        return await complete_async(_hint_prompt(question, options), max_tokens=120, call_site="hint")
+    except Exception as exc:
+        logger.error(f"Groq hint failed: {exc}")
+        raise
+
+
+async def generate_feedback_async(
+    question: str,
+    options: List[str],
+    student_index: int,
+    correct_index: Optional[int],
+) -> str:
+    """Async variant of :func:`generate_feedback`."""
+    try:
+        return await complete_async(
+            _feedback_prompt(question, options, student_index, correct_index), max_tokens=160, call_site="feedback"
+        )
     except Exception as exc:
         logger.error(f"Groq feedback failed: {exc}")
         raise
@@ -0,0 +1,124 @@
+"""ETag / Last-Modified helpers for conditional GETs on question reads."""
+
+from datetime import datetime, timezone
+from email.utils import format_datetime, parsedate_to_datetime
+from typing import Dict, Optional, Tuple
+
+from fastapi import Request, Response
+from sqlalchemy import event, text, update
+from sqlalchemy.orm import Session
+
+from models import QuestionBankVersion
+from question_cache import question_cache
+
+BANK_VERSION_ROW_ID = 1
+
+# Clients may keep a copy but must revalidate it; a 304 is nearly free.
+CACHE_CONTROL = "no-cache"
+
+# Supported by SQLite (3.24+) and PostgreSQL alike; a second seeder is a no-op, never an IntegrityError.
+_SEED_BANK_VERSION = text(
+    "INSERT INTO question_bank_version (id, version, updated_at) VALUES (:id, 0, :now) ON CONFLICT (id) DO NOTHING"
+)
+
+
+def seed_bank_version(bind) -> None:
+    """Create the bank version row if it is missing (``bind`` is a session or connection)."""
+    bind.execute(_SEED_BANK_VERSION, {"id": BANK_VERSION_ROW_ID, "now": datetime.utcnow()})
+
+
+def _count_local_bumps(session: Session) -> None:
+    question_cache.note_local_bumps(session.info.pop("bank_version_bumps", 0))
+
+
+def _forget_local_bumps(session: Session) -> None:
+    session.info.pop("bank_version_bumps", None)
+
+
+def bump_bank_version(db: Session) -> None:
+    """Increment the bank-wide version in the caller's transaction.
+
+    Call this before committing any write that changes what the list endpoints return,
+    and invalidate the cached questions or pools the write touched. Once the
+    transaction commits, the bump is credited to this process's question cache,
+    so it is not mistaken for another worker's write.
+    """
+    if not db.info.get("bank_version_listeners"):
+        # Once per session, not per transaction. The listeners stay for the session's life (SQLAlchemy
+        # cannot remove a listener while it runs); with no bumps pending they do nothing.
+        db.info["bank_version_listeners"] = True
+        event.listen(db, "after_commit", _count_local_bumps)
+        event.listen(db, "after_rollback", _forget_local_bumps)
+    db.info["bank_version_bumps"] = db.info.get("bank_version_bumps", 0) + 1
+    bump = (
+        update(QuestionBankVersion)
+        .where(QuestionBankVersion.id == BANK_VERSION_ROW_ID)
+        .values(version=QuestionBankVersion.version + 1, updated_at=datetime.utcnow())
+    )
+    if db.execute(bump).rowcount == 0:
+        # init_db seeds the row; this covers databases it never ran against.
+        seed_bank_version(db)
+        db.execute(bump)
+
+
+def get_bank_version(db: Session) -> Tuple[int, Optional[datetime]]:
+    row = (
+        db.query(QuestionBankVersion.version, QuestionBankVersion.updated_at)
+        .filter(QuestionBankVersion.id == BANK_VERSION_ROW_ID)
+        .first()
+    )
+    if row is None:
+        return 0, None
+    return row.version, row.updated_at
+
+
+def version_stamp(updated_at: Optional[datetime]) -> str:
+    return updated_at.strftime("%Y%m%d%H%M%S%f") if updated_at else "0"
+
+
+def question_etag(question_id: int, updated_at: Optional[datetime], variant: str = "") -> str:
+    suffix = f"-{variant}" if variant else ""
+    return f'W/"q{question_id}-{version_stamp(updated_at)}{suffix}"'
+
+
+def bank_etag(version: int, *parts: object) -> str:
+    suffix = "-".join(str(part) for part in parts)
+    return f'W/"bank{version}-{suffix}"' if suffix else f'W/"bank{version}"'
+
+
+def _http_date(value: datetime) -> str:
+    return format_datetime(value.replace(tzinfo=timezone.utc, microsecond=0), usegmt=True)
+
+
+def cache_headers(etag: str, last_modified: Optional[datetime], cache_control: str = CACHE_CONTROL) -> Dict[str, str]:
+    headers = {"ETag": etag, "Cache-Control": cache_control}
+    if last_modified is not None:
+        headers["Last-Modified"] = _http_date(last_modified)
+    return headers
+
+
+def is_not_modified(request: Request, etag: str, last_modified: Optional[datetime]) -> bool:
+    """Evaluate If-None-Match (preferred) or If-Modified-Since against the current validators."""
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match is not None:
+        candidates = {tag.strip() for tag in if_none_match.split(",")}
+        # Weak comparison: W/"x" matches "x".
+        bare = etag[2:] if etag.startswith("W/") else etag
+        return "*" in candidates or etag in candidates or bare in candidates
+
+    if_modified_since = request.headers.get("if-modified-since")
+    if if_modified_since and last_modified is not None:
+        try:
+            since = parsedate_to_datetime(if_modified_since)
+        except (TypeError, ValueError):
+            return False
+        if since.tzinfo is None:
+            since = since.replace(tzinfo=timezone.utc)
+        return last_modified.replace(tzinfo=timezone.utc, microsecond=0) <= since
+    return False
+
+
+def not_modified_response(
+    etag: str, last_modified: Optional[datetime], cache_control: str = CACHE_CONTROL
+) -> Response:
+    return Response(status_code=304, headers=cache_headers(etag, last_modified, cache_control))
@@ -0,0 +1,199 @@
+"""Ingest-time processing for images pulled out of uploaded PDFs.
+
+Embedded images come out of PyMuPDF as full-resolution PNGs. Before they are
+stored, each one is downsampled to ``IMAGE_MAX_DIMENSION`` and re-encoded with
+metadata stripped:
+
+* line art (few distinct colours or transparency) stays lossless, so diagram
+  edges and labels stay sharp;
+* photos and scans go lossy at ``IMAGE_QUALITY``.
+
+``IMAGE_FORMAT`` selects WebP (the default) or the JPEG/PNG pair for old
+clients. A ``IMAGE_THUMBNAIL_DIMENSION`` thumbnail is made next to every image.
+"""
+
+import importlib.util
+import io
+import logging
+import os
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+from typing import Dict, List, Optional, Sequence, Tuple, Union
+
+logger = logging.getLogger(__name__)
+
+PIL_AVAILABLE = importlib.util.find_spec("PIL") is not None
+
+IMAGE_FORMAT = os.getenv("IMAGE_FORMAT", "webp").lower()  # "webp" or "jpeg"
+IMAGE_MAX_DIMENSION = int(os.getenv("IMAGE_MAX_DIMENSION", "1280"))
+IMAGE_THUMBNAIL_DIMENSION = int(os.getenv("IMAGE_THUMBNAIL_DIMENSION", "240"))
+IMAGE_QUALITY = int(os.getenv("IMAGE_QUALITY", "80"))
+IMAGE_WORKERS = int(os.getenv("IMAGE_WORKERS", str(min(4, os.cpu_count() or 1))))
+
+# Images with at most this many colours are treated as line art.
+LINE_ART_MAX_COLORS = 64
+THUMBNAIL_QUALITY = 70
+
+
+def _is_line_art(img) -> bool:
+    if img.mode in ("RGBA", "LA") or "transparency" in img.info:
+        return True
+    # getcolors() returns None once the limit is exceeded; sample a small copy.
+    sample = img.copy()
+    sample.thumbnail((256, 256))
+    return sample.getcolors(LINE_ART_MAX_COLORS) is not None
+
+
+@lru_cache(maxsize=1)
+def _webp_supported() -> bool:
+    from PIL import features
+
+    return bool(features.check("webp"))
+
+
+def _encode(img, lossless: bool, quality: int) -> Tuple[bytes, str]:
+    """Encode ``img`` without metadata; returns ``(bytes, image_type)``."""
+    out = io.BytesIO()
+    if IMAGE_FORMAT == "webp" and _webp_supported():
+        if lossless:
+            img.save(out, format="WEBP", lossless=True, method=4)
+        else:
+            img.save(out, format="WEBP", quality=quality, method=4)
+        return out.getvalue(), "webp"
+    if lossless:
+        img.save(out, format="PNG", optimize=True)
+        return out.getvalue(), "png"
+    img.convert("RGB").save(out, format="JPEG", quality=quality, optimize=True, progressive=True)
+    return out.getvalue(), "jpeg"
+
+
+# JPEG segments kept when the original is stored: JFIF/JFXX, the ICC profile and Adobe's colour transform.
+_JPEG_KEPT_APP_MARKERS = {0xE0, 0xE2, 0xEE}
+
+
+def _strip_jpeg_metadata(data: bytes) -> Optional[bytes]:
+    """``data`` without its EXIF, XMP, IPTC and comment segments; the scan is copied untouched.
+
+    Returns ``None`` if the marker layout cannot be followed.
+    """
+    if data[:2] != b"\xff\xd8":
+        return None
+    out = bytearray(data[:2])
+    pos = 2
+    while pos + 4 <= len(data):
+        if data[pos] != 0xFF:
+            return None
+        marker = data[pos + 1]
+        if marker == 0xFF:  # Fill byte
+            pos += 1
+            continue
+        length = int.from_bytes(data[pos + 2 : pos + 4], "big")
+        end = pos + 2 + length
+        if length < 2 or end > len(data):
+            return None
+        if marker == 0xDA:  # Start of scan: the rest is image data
+            out += data[pos:]
+            return bytes(out)
+        if not (0xE0 <= marker <= 0xEF or marker == 0xFE) or marker in _JPEG_KEPT_APP_MARKERS:
+            out += data[pos:end]
+        pos = end
+    return None
+
+
+def _without_metadata(img, data: bytes, original_format: str) -> Optional[Tuple[bytes, str]]:
+    """The original image without metadata, losslessly, or ``None`` for other formats."""
+    if original_format in ("jpeg", "jpg"):
+        stripped = _strip_jpeg_metadata(data)
+        return (stripped, "jpeg") if stripped else None
+    if original_format == "png":
+        # PNG is lossless, so a plain re-save (no text, eXIf or iTXt chunks) keeps every pixel.
+        out = io.BytesIO()
+        img.save(out, format="PNG", optimize=True)
+        return out.getvalue(), "png"
+    return None
+
+
+def _normalize_mode(img):
+    if img.mode in ("RGB", "RGBA", "L", "LA"):
+        return img
+    if img.mode == "P" and "transparency" in img.info:
+        return img.convert("RGBA")
+    return img.convert("RGB")
+
+
+def _stack(images: list):
+    """Stack several images top to bottom on a white canvas."""
+    from PIL import Image
+
+    width = max(img.width for img in images)
+    canvas = Image.new("RGB", (width, sum(img.height for img in images)), "white")
+    top = 0
+    for img in images:
+        canvas.paste(img.convert("RGB"), (0, top))
+        top += img.height
+    return canvas
+
+
+def process_image(data: Union[bytes, Sequence[bytes]]) -> Optional[Dict[str, object]]:
+    """Downsample and re-encode one image, returning the stored variants.
+
+    ``data`` may also be a sequence of images belonging to the same question; they
+    are stacked into one picture. The result has ``image_data``/``image_type`` and
+    ``thumbnail_data``/``thumbnail_type``. A JPEG or PNG original is kept, with
+    its metadata stripped, when re-encoding would not make it smaller. Returns
+    ``None`` if nothing can be decoded.
+    """
+    from PIL import Image
+
+    parts = [data] if isinstance(data, bytes) else list(data)
+    decoded, sources = [], []
+    for part in parts:
+        try:
+            decoded.append(Image.open(io.BytesIO(part)))
+            sources.append(part)
+        except Exception as exc:  # noqa: BLE001
+            logger.debug(f"Could not decode image: {exc}")
+    if not decoded:
+        return None
+    try:
+        if len(decoded) == 1:
+            original_format = (decoded[0].format or "png").lower()
+            img = _normalize_mode(decoded[0])
+        else:
+            original_format = None
+            img = _stack(decoded)
+    except Exception as exc:  # noqa: BLE001
+        logger.debug(f"Could not decode image: {exc}")
+        return None
+
+    lossless = _is_line_art(img)
+    resized = max(img.size) > IMAGE_MAX_DIMENSION
+    if resized:
+        img.thumbnail((IMAGE_MAX_DIMENSION, IMAGE_MAX_DIMENSION), Image.LANCZOS)
+
+    image_data, image_type = _encode(img, lossless, IMAGE_QUALITY)
+    if original_format and not resized:
+        original = _without_metadata(decoded[0], sources[0], original_format)
+        if original and len(original[0]) <= len(image_data):
+            image_data, image_type = original
+
+    thumb = img.copy()
+    thumb.thumbnail((IMAGE_THUMBNAIL_DIMENSION, IMAGE_THUMBNAIL_DIMENSION), Image.LANCZOS)
+    thumbnail_data, thumbnail_type = _encode(thumb, lossless, THUMBNAIL_QUALITY)
+
+    return {
+        "image_data": image_data,
+        "image_type": image_type,
+        "thumbnail_data": thumbnail_data,
+        "thumbnail_type": thumbnail_type,
+    }
+
+
+def process_images(images: List[Union[bytes, Sequence[bytes]]]) -> List[Optional[Dict[str, object]]]:
+    """Process several images in parallel (Pillow releases the GIL while encoding)."""
+    if not PIL_AVAILABLE:
+        return [None] * len(images)
+    if len(images) <= 1 or IMAGE_WORKERS <= 1:
+        return [process_image(data) for data in images]
+    with ThreadPoolExecutor(max_workers=IMAGE_WORKERS) as pool:
+        return list(pool.map(process_image, images))
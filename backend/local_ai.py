@@ -2,10 +2,18 @@
 
 from __future__ import annotations
 
+import importlib.util
 import logging
 import os
+import queue
+import threading
+import time
+from concurrent.futures import Future, TimeoutError as FutureTimeoutError
 from functools import lru_cache
-from typing import List, Optional
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+from metrics import LOCAL_AI_BATCH_SECONDS
 
 logger = logging.getLogger(__name__)
 
@@ -21,22 +29,95 @@ try:
 except ImportError:
     _GROQ_AVAILABLE = False
 
-try:  # pragma: no cover - import side effects checked at runtime
-    import torch
-    from transformers import AutoModelForSeq2SeqLM, AutoTokenizer
-
-    _TRANSFORMERS_AVAILABLE = True
-except ImportError:  # pragma: no cover - handled gracefully
-    _TRANSFORMERS_AVAILABLE = False
+# torch/transformers take seconds to import; only check they exist here and
+# import them when the model is first loaded.
+_TRANSFORMERS_AVAILABLE = all(
+    importlib.util.find_spec(name) is not None for name in ("torch", "transformers")
+)
 
 MODEL_NAME = os.getenv("LOCAL_AI_MODEL", "google/flan-t5-base")
 DEFAULT_MAX_NEW_TOKENS = int(os.getenv("LOCAL_AI_MAX_TOKENS", "256"))
 
+# Inference backend: "torch" (full precision), "torch-int8" (dynamic int8
+# quantization of Linear layers), "onnx" or "onnx-int8" (ONNX Runtime via optimum).
+BACKENDS = ("torch", "torch-int8", "onnx", "onnx-int8")
+BACKEND = os.getenv("LOCAL_AI_BACKEND", "torch").lower()
+# Exported ONNX graphs are cached here so only the first cold start pays for export.
+ONNX_CACHE_DIR = Path(os.getenv("LOCAL_AI_ONNX_DIR", str(Path.home() / ".cache" / "quiz-local-ai")))
+
+# Micro-batching for the inference worker thread.
+BATCHING_ENABLED = os.getenv("LOCAL_AI_BATCHING", "1").lower() not in ("0", "false", "no")
+MAX_BATCH_SIZE = int(os.getenv("LOCAL_AI_MAX_BATCH_SIZE", "8"))
+MAX_BATCH_WAIT_MS = float(os.getenv("LOCAL_AI_MAX_BATCH_WAIT_MS", "25"))
+REQUEST_TIMEOUT_SECONDS = float(os.getenv("LOCAL_AI_REQUEST_TIMEOUT", "120"))
+
+# Decoding settings per request type. Requests are only batched with others of
+# the same type, because ``generate`` takes one set of kwargs per call. The
+# token limits are the ones each helper passed before requests were batched.
+GENERATION_PROFILES: Dict[str, Dict[str, Any]] = {
+    "explanation": {"max_new_tokens": 180, "num_beams": 4, "early_stopping": True, "no_repeat_ngram_size": 2},
+    "feedback": {"max_new_tokens": 160, "num_beams": 2, "early_stopping": True, "no_repeat_ngram_size": 2},
+    "hint": {"max_new_tokens": 120, "num_beams": 1, "do_sample": False, "no_repeat_ngram_size": 2},
+    "default": {"max_new_tokens": DEFAULT_MAX_NEW_TOKENS, "num_beams": 4, "early_stopping": True, "no_repeat_ngram_size": 2},
+}
+
 
 class LocalAIUnavailable(RuntimeError):
     """Raised when the local AI model is not available."""
 
 
+def _load_torch_model(quantize: bool):
+    import torch
+    from transformers import AutoModelForSeq2SeqLM
+
+    model = AutoModelForSeq2SeqLM.from_pretrained(MODEL_NAME)
+    model.eval()
+    if quantize:
+        model = torch.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8)
+    return model
+
+
+def _onnx_export_dir() -> Path:
+    return ONNX_CACHE_DIR / MODEL_NAME.replace("/", "--")
+
+
+def _load_onnx_model(quantize: bool):
+    try:
+        from optimum.onnxruntime import ORTModelForSeq2SeqLM
+    except ImportError as exc:
+        raise LocalAIUnavailable(
+            "The ONNX backend requires 'optimum[onnxruntime]'. "
+            "Install it with: pip install optimum[onnxruntime]"
+        ) from exc
+
+    export_dir = _onnx_export_dir()
+    if not any(export_dir.glob("*.onnx")):
+        logger.info("Exporting %s to ONNX in %s (one-time)", MODEL_NAME, export_dir)
+        ORTModelForSeq2SeqLM.from_pretrained(MODEL_NAME, export=True).save_pretrained(export_dir)
+
+    if not quantize:
+        return ORTModelForSeq2SeqLM.from_pretrained(export_dir)
+
+    quantized_dir = export_dir / "int8"
+    if not any(quantized_dir.glob("*_quantized.onnx")):
+        from optimum.onnxruntime import ORTQuantizer
+        from optimum.onnxruntime.configuration import AutoQuantizationConfig
+
+        logger.info("Applying dynamic int8 quantization to %s", export_dir)
+        qconfig = AutoQuantizationConfig.avx2(is_static=False, per_channel=False)
+        for onnx_file in export_dir.glob("*.onnx"):
+            quantizer = ORTQuantizer.from_pretrained(export_dir, file_name=onnx_file.name)
+            quantizer.quantize(save_dir=quantized_dir, quantization_config=qconfig)
+
+    file_names = {
+        "encoder_file_name": "encoder_model_quantized.onnx",
+        "decoder_file_name": "decoder_model_quantized.onnx",
+    }
+    if (quantized_dir / "decoder_with_past_model_quantized.onnx").exists():
+        file_names["decoder_with_past_file_name"] = "decoder_with_past_model_quantized.onnx"
+    return ORTModelForSeq2SeqLM.from_pretrained(quantized_dir, **file_names)
+
+
 @lru_cache(maxsize=1)
 def _load_model():
     if not _TRANSFORMERS_AVAILABLE:
@@ -44,11 +125,19 @@ def _load_model():
             "Local AI model requires 'transformers', 'torch', and 'sentencepiece'. "
             "Install them with: pip install transformers sentencepiece accelerate torch"
         )
+    if BACKEND not in BACKENDS:
+        raise LocalAIUnavailable(
+            f"Unknown LOCAL_AI_BACKEND '{BACKEND}'. Expected one of: {', '.join(BACKENDS)}"
+        )
 
-    logger.info("Loading local AI model: %s", MODEL_NAME)
+    from transformers import AutoTokenizer
+
+    logger.info("Loading local AI model: %s (backend=%s)", MODEL_NAME, BACKEND)
     tokenizer = AutoTokenizer.from_pretrained(MODEL_NAME)
-    model = AutoModelForSeq2SeqLM.from_pretrained(MODEL_NAME)
-    model.eval()
+    if BACKEND.startswith("onnx"):
+        model = _load_onnx_model(quantize=BACKEND.endswith("int8"))
+    else:
+        model = _load_torch_model(quantize=BACKEND.endswith("int8"))
     return tokenizer, model
 
 
@@ -62,22 +151,175 @@ def _ensure_model_ready():
         raise LocalAIUnavailable(str(exc)) from exc
 
 
-def _generate_response(prompt: str, max_new_tokens: Optional[int] = None) -> str:
-    tokenizer, model = _ensure_model_ready()
-    tokens = tokenizer(prompt, return_tensors="pt")
+def _profile_kwargs(kind: str, max_new_tokens: Optional[int] = None) -> Dict[str, Any]:
+    kwargs = dict(GENERATION_PROFILES.get(kind, GENERATION_PROFILES["default"]))
+    if max_new_tokens is not None:
+        kwargs["max_new_tokens"] = max_new_tokens
+    kwargs["max_new_tokens"] = min(kwargs["max_new_tokens"], 512)
+    return kwargs
 
-    kwargs = {
-        "max_new_tokens": min(max_new_tokens or DEFAULT_MAX_NEW_TOKENS, 512),
-        "num_beams": 4,
-        "early_stopping": True,
-        "no_repeat_ngram_size": 2,
-    }
+
+def _run_batch(prompts: List[str], kwargs: Dict[str, Any]) -> List[str]:
+    """Run one padded, batched ``generate`` call and decode every sequence."""
+    import torch
+
+    tokenizer, model = _ensure_model_ready()
+    tokens = tokenizer(prompts, return_tensors="pt", padding=True, truncation=True)
 
     with torch.no_grad():
         outputs = model.generate(**tokens, **kwargs)
 
-    text = tokenizer.decode(outputs[0], skip_special_tokens=True)
-    return text.strip()
+    texts = tokenizer.batch_decode(outputs, skip_special_tokens=True)
+    return [text.strip() for text in texts]
+
+
+class _PendingRequest:
+    __slots__ = ("prompt", "kind", "kwargs", "future")
+
+    def __init__(self, prompt: str, kind: str, kwargs: Dict[str, Any]):
+        self.prompt = prompt
+        self.kind = kind
+        self.kwargs = kwargs
+        self.future: Future = Future()
+
+
+class LocalInferenceServer:
+    """Dedicated worker thread that groups concurrent prompts into micro-batches.
+
+    The worker blocks for the first request, then keeps collecting until the
+    batch is full or ``max_wait_ms`` has passed. Collected requests are grouped
+    by generation settings and each group runs as one batched ``generate`` call.
+    """
+
+    def __init__(self, max_batch_size: int = MAX_BATCH_SIZE, max_wait_ms: float = MAX_BATCH_WAIT_MS):
+        self.max_batch_size = max(1, max_batch_size)
+        self.max_wait = max(0.0, max_wait_ms) / 1000.0
+        self._queue: "queue.Queue[Optional[_PendingRequest]]" = queue.Queue()
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+
+    def start(self) -> None:
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive():
+                return
+            self._thread = threading.Thread(target=self._run, name="local-ai-inference", daemon=True)
+            self._thread.start()
+
+    def stop(self, timeout: Optional[float] = None) -> None:
+        """Stop the worker and fail every request still queued, so no caller waits out its timeout."""
+        with self._lock:
+            thread = self._thread
+            self._thread = None
+        if thread is not None:
+            self._fail_pending()
+            self._queue.put(None)
+            thread.join(timeout)
+
+    def _fail_pending(self) -> None:
+        """Fail every queued request; a stop sentinel found here is put back for the worker."""
+        while True:
+            try:
+                request = self._queue.get_nowait()
+            except queue.Empty:
+                return
+            if request is None:
+                self._queue.put(None)
+                return
+            if request.future.set_running_or_notify_cancel():
+                request.future.set_exception(LocalAIUnavailable("Local AI inference server stopped"))
+
+    def submit(self, prompt: str, kind: str = "default", max_new_tokens: Optional[int] = None) -> Future:
+        self.start()
+        request = _PendingRequest(prompt, kind, _profile_kwargs(kind, max_new_tokens))
+        self._queue.put(request)
+        return request.future
+
+    def generate(self, prompt: str, kind: str = "default", max_new_tokens: Optional[int] = None) -> str:
+        future = self.submit(prompt, kind, max_new_tokens)
+        try:
+            return future.result(timeout=REQUEST_TIMEOUT_SECONDS)
+        except FutureTimeoutError as exc:
+            # A request still queued is dropped; one already running finishes unread.
+            future.cancel()
+            raise LocalAIUnavailable(
+                f"Local AI did not answer within {REQUEST_TIMEOUT_SECONDS:g}s ({self.queue_depth()} prompts queued)"
+            ) from exc
+
+    def queue_depth(self) -> int:
+        return self._queue.qsize()
+
+    def _collect_batch(self, first: _PendingRequest) -> Tuple[List[_PendingRequest], bool]:
+        batch = [first]
+        deadline = time.monotonic() + self.max_wait
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                item = self._queue.get(timeout=remaining)
+            except queue.Empty:
+                break
+            if item is None:
+                return batch, True
+            batch.append(item)
+        return batch, False
+
+    def _run(self) -> None:
+        while True:
+            first = self._queue.get()
+            if first is None:
+                self._fail_pending()  # Requests queued behind the stop sentinel
+                return
+            batch, stopping = self._collect_batch(first)
+
+            groups: Dict[Tuple, List[_PendingRequest]] = {}
+            for request in batch:
+                key = tuple(sorted(request.kwargs.items()))
+                groups.setdefault(key, []).append(request)
+
+            for requests in groups.values():
+                live = [r for r in requests if r.future.set_running_or_notify_cancel()]
+                if not live:
+                    continue
+                try:
+                    with LOCAL_AI_BATCH_SECONDS.labels(live[0].kind).time():
+                        texts = _run_batch([r.prompt for r in live], live[0].kwargs)
+                except BaseException as exc:  # noqa: BLE001 - forwarded to callers
+                    for request in live:
+                        request.future.set_exception(exc)
+                    continue
+                logger.debug("Local AI batch of %s %s prompt(s) done", len(live), live[0].kind)
+                for request, text in zip(live, texts):
+                    request.future.set_result(text)
+
+            if stopping:
+                self._fail_pending()
+                return
+
+
+_server: Optional[LocalInferenceServer] = None
+_server_lock = threading.Lock()
+
+
+def get_inference_server() -> LocalInferenceServer:
+    global _server
+    with _server_lock:
+        if _server is None:
+            _server = LocalInferenceServer()
+        return _server
+
+
+def queue_depth() -> int:
+    """Prompts waiting for the inference worker (0 before the server starts)."""
+    return _server.queue_depth() if _server is not None else 0
+
+
+def _generate_response(prompt: str, max_new_tokens: Optional[int] = None, kind: str = "default") -> str:
+    # Load eagerly so a missing model raises LocalAIUnavailable in the caller.
+    _ensure_model_ready()
+    if BATCHING_ENABLED:
+        return get_inference_server().generate(prompt, kind, max_new_tokens)
+    return _run_batch([prompt], _profile_kwargs(kind, max_new_tokens))[0]
 
 
 def _format_options(options: List[str]) -> str:
@@ -113,7 +355,7 @@ def generate_explanation(question: str, options: List[str], correct_index: Optio
         "Explain clearly and concisely."
     )
 
-    return _generate_response(prompt, max_new_tokens=180)
+    return _generate_response(prompt, kind="explanation")
 
 
 def generate_hint(question: str, options: List[str]) -> str:
@@ -132,7 +374,7 @@ def generate_hint(question: str, options: List[str]) -> str:
         f"Question: {question}\n"
         f"Options:\n{_format_options(options)}\n"
     )
-    return _generate_response(prompt, max_new_tokens=120)
+    return _generate_response(prompt, kind="hint")
 
 
 def generate_feedback(
@@ -170,4 +412,4 @@ def generate_feedback(
         f"Correct answer: {correct_option}\n"
     )
 
-    return _generate_response(prompt, max_new_tokens=160)
+    return _generate_response(prompt, kind="feedback")
@@ -1,60 +1,149 @@
 """FastAPI application exposing PDF upload, question listing, and quiz endpoints."""
 
+import asyncio
+import importlib.util
 import json
 import logging
 import os
+import random
 import re
+from collections import defaultdict
 from datetime import datetime
-from typing import List, Optional
+from typing import Dict, List, Optional, Tuple
 
-import requests
 from dotenv import load_dotenv
-from fastapi import BackgroundTasks, Depends, FastAPI, File, HTTPException, UploadFile, status
+from fastapi import BackgroundTasks, Depends, FastAPI, File, HTTPException, Request, UploadFile, status
+from fastapi.concurrency import run_in_threadpool
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, ORJSONResponse, Response
 from pydantic import BaseModel
-from sqlalchemy import func
+from sqlalchemy import case, func, update
 from sqlalchemy.orm import Session
 
-from db import Base, SessionLocal, engine, get_db
-from extractor import PDFExtractionError, extract_questions_from_pdf, extract_answer_key_from_pdf
+from db import SessionLocal, engine, get_db, init_db
+from extractor import PDFExtractionError, extract_answer_key_from_pdf, iter_questions_from_pdf
 from groq_ai import (
+    close_async_client as groq_close_async_client,
+    complete_async as groq_complete_async,
     generate_explanation as groq_generate_explanation,
-    generate_feedback as groq_generate_feedback,
-    generate_hint as groq_generate_hint,
+    generate_explanation_async as groq_generate_explanation_async,
+    generate_feedback_async as groq_generate_feedback_async,
+    generate_hint_async as groq_generate_hint_async,
     GroqAIUnavailable,
+    inflight_requests as groq_inflight_requests,
+)
+from http_cache import (
+    bank_etag,
+    bump_bank_version,
+    cache_headers,
+    get_bank_version,
+    is_not_modified,
+    not_modified_response,
+    question_etag,
+    version_stamp,
+)
+from compression import CompressionMiddleware
+from local_ai import queue_depth as local_ai_queue_depth
+from metrics import (
+    PROMETHEUS_AVAILABLE,
+    MetricsMiddleware,
+    MetricsRoute,
+    gauge,
+    instrument_engine,
+    render as render_metrics,
+)
+from models import (
+    Question,
+    QuestionFingerprint,
+    QuestionLshBucket,
+    QuestionStats,
+    QuizSession,
+    ReviewCard,
+    SourceFileStats,
+    image_data_url,
+)
+from near_duplicates import (
+    DUPLICATE_POLICY,
+    add_fingerprints,
+    duplicate_clusters,
+    find_matches,
+    fingerprint,
+    resolve_duplicate_of,
+)
+from tracing import TracingMiddleware, configure_tracing, install_log_correlation, shutdown_tracing, span
+from uploads import UploadLimitMiddleware, spool_upload
+from attempts import attempt_buffer
+from batch_ingest import BATCH_MAX_UPLOAD_BYTES, EXTRACTING, SAVING, ingest_jobs, spool_batch
+from parser_registry import shutdown_parsers
+from question_cache import parse_timestamp, question_cache, serialize_timestamp
+from question_stats import SORTS as STATS_SORTS, question_stats, question_stats_for, source_file_stats
+from review_schedule import check_learner_id, pick as pick_adaptive, review, summary as schedule_summary
+from quiz_sessions import (
+    MAX_QUESTIONS as QUIZ_SESSION_MAX_QUESTIONS,
+    UNGRADED,
+    create_session,
+    mark_is_correct,
+    load_session,
+    question_id_at,
+    record_answer,
+    upcoming_ids,
 )
-from models import Question
 
 
 load_dotenv()
 
-logging.basicConfig(level=logging.INFO)
+install_log_correlation()
+logging.basicConfig(level=logging.INFO, format="%(levelname)s:%(name)s:[%(trace_id)s] %(message)s")
 logger = logging.getLogger(__name__)
 
 
+# orjson is several times faster than the stdlib encoder on large question
+# payloads; fall back to JSONResponse when it is not installed.
+FastJSONResponse = ORJSONResponse if importlib.util.find_spec("orjson") else JSONResponse
+
 app = FastAPI(
     title="ACCA MCQ API",
     description="API for uploading, storing, and quizzing ACCA MCQs",
     version="1.0.0",
+    default_response_class=FastJSONResponse,
 )
+# Labels the DB statements of sync endpoints from their worker threads.
+app.router.route_class = MetricsRoute
+
+# Endpoints that take a PDF body; see uploads.UploadLimitMiddleware.
+UPLOAD_PATHS = ("/upload", "/upload-answer-key")
 
 raw_origins = os.getenv("ALLOWED_ORIGINS", "http://localhost:3000,http://127.0.0.1:3000,http://localhost:8000,http://127.0.0.1:8000")
 origins = [origin.strip() for origin in raw_origins.split(",") if origin.strip()]
 
+# Added first so it sits inside CORS: browsers can read the 413.
+app.add_middleware(UploadLimitMiddleware, paths=UPLOAD_PATHS)
+app.add_middleware(UploadLimitMiddleware, paths=("/upload/batch",), max_bytes=BATCH_MAX_UPLOAD_BYTES)
 app.add_middleware(
     CORSMiddleware,
     allow_origins=["*"],  # Allow all origins for file:// protocol support
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["ETag", "Last-Modified"],
 )
+app.add_middleware(CompressionMiddleware, minimum_size=int(os.getenv("COMPRESSION_MIN_BYTES", "1024")))
+app.add_middleware(MetricsMiddleware)
+app.add_middleware(TracingMiddleware)
 
+instrument_engine(engine)
+gauge("quiz_question_cache_hit_ratio", "Question cache hit ratio since start", lambda: question_cache.stats()["hit_rate"])
+gauge("quiz_question_cache_entries", "Entries in the question cache", lambda: question_cache.stats()["entries"])
+gauge("quiz_groq_inflight_requests", "Groq calls in flight (async and blocking)", groq_inflight_requests)
+gauge("quiz_local_ai_queue_depth", "Prompts waiting for the local model", local_ai_queue_depth)
+gauge("quiz_attempt_buffer_pending", "Answers waiting to be written to question_attempts", lambda: attempt_buffer.stats()["pending"])
 
-@app.get("/health")
-def health_check():
-    """Health check endpoint"""
-    return {"status": "ok", "message": "Backend is running"}
+# How question images reach the client: "inline" embeds a base64 data URL in
+# every payload; "url" links to /questions/{id}/image, served as binary and
+# cached by the browser. Clients can override per request with ?images=.
+IMAGE_DELIVERY_MODES = ("inline", "url")
+IMAGE_DELIVERY = os.getenv("IMAGE_DELIVERY", "inline")
+IMAGE_CACHE_CONTROL = "public, max-age=86400"
 
 
 class QuestionDTO(BaseModel):
@@ -65,7 +154,9 @@ class QuestionDTO(BaseModel):
     explanation: Optional[str]
     source_file: Optional[str]
     page_no: Optional[int]
-    image_url: Optional[str] = None  # Base64 encoded image data URL
+    question_no: Optional[int] = None
+    image_url: Optional[str] = None  # Base64 encoded image data URL, or a link with ?images=url
+    thumbnail_url: Optional[str] = None  # Only set with ?images=url
 
     class Config:
         orm_mode = True
@@ -76,6 +167,39 @@ class UploadResponse(BaseModel):
     message: str
     saved_count: int
     total_parsed: int
+    duplicate_count: int = 0
+    sha256: Optional[str] = None
+
+
+class BatchFileResult(BaseModel):
+    file_name: str
+    status: str
+    size: int
+    sha256: str
+    saved_count: int = 0
+    total_parsed: int = 0
+    duplicate_count: int = 0
+    pages_done: int = 0
+    total_pages: Optional[int] = None
+    seconds: Optional[float] = None
+    error: Optional[str] = None
+
+
+class BatchJobResponse(BaseModel):
+    job_id: str
+    status: str
+    total_files: int
+    completed_files: int
+    failed_files: int
+    saved_count: int
+    files: List[BatchFileResult]
+
+
+class DuplicateCluster(BaseModel):
+    canonical_id: int
+    question: str
+    question_ids: List[int]
+    source_files: List[str]
 
 
 class QuizResponse(BaseModel):
@@ -83,10 +207,232 @@ class QuizResponse(BaseModel):
     questions: List[QuestionDTO]
 
 
+class QuizSessionCreate(BaseModel):
+    limit: int = 20
+    topic: Optional[str] = None
+    learner_id: Optional[str] = None  # Adaptive session: questions come from the learner's review schedule
+
+
+class QuizAnswerSubmit(BaseModel):
+    position: int
+    answer: Optional[int] = None  # Option index; None skips the question
+
+
+class QuizAnswerResult(BaseModel):
+    position: int
+    question_id: int
+    answer: Optional[int]
+    is_correct: Optional[bool]  # None when the question has no answer key
+    correct_option: Optional[int]
+    explanation: Optional[str] = None
+
+
+class QuizSessionResponse(BaseModel):
+    session_id: str
+    topic: Optional[str]
+    learner_id: Optional[str]
+    total: int
+    answered: int
+    score: int
+    finished: bool
+    expires_at: str
+    position: Optional[int]  # Position of ``question``; None once every question is answered
+    question: Optional[QuestionDTO]  # Served without correct_option and explanation
+
+
+class QuizAnswerResponse(QuizSessionResponse):
+    result: QuizAnswerResult
+
+
+class QuizScoreResponse(BaseModel):
+    session_id: str
+    total: int
+    answered: int
+    score: int
+    graded: int  # Answered questions that have an answer key
+    percentage: float
+    finished: bool
+    results: List[QuizAnswerResult]
+
+
+class LearnerScheduleResponse(BaseModel):
+    learner_id: str
+    cards: int  # Questions the learner has answered
+    due: int
+    next_due_at: Optional[str]  # Earliest card that is not due yet
+
+
+class AnswerStats(BaseModel):
+    attempts: int
+    graded: int  # Attempts made while the question had an answer key
+    correct: int
+    skipped: int
+    accuracy: Optional[float]  # correct / graded, None until an attempt is graded
+    difficulty: Optional[float]  # 1 - accuracy
+    last_answered_at: Optional[str]
+
+
+class QuestionStatsDTO(AnswerStats):
+    question_id: int
+    question: Optional[str]  # None once the question is deleted
+    source_file: Optional[str]
+    option_counts: List[int]  # Times each option (A-E) was chosen
+
+
+class SourceFileStatsDTO(AnswerStats):
+    source_file: str
+
+
+class AnswerKeyRequest(BaseModel):
+    source_file: str
+    answers: Dict[int, str]  # question number -> answer letter
+
+
+class AnswerKeyApplyResponse(BaseModel):
+    status: str
+    source_file: str
+    updated_count: int
+    unmatched: List[int]
+    ambiguous: List[int] = []  # Numbers shared by several questions; all of them were updated
+
+
 @app.on_event("startup")
 def on_startup() -> None:
-    Base.metadata.create_all(bind=engine)
+    init_db()
     logger.info("Database tables ensured")
+    configure_tracing()
+    try:
+        attempt_buffer.recover()
+    except Exception as exc:  # noqa: BLE001 - the spill files are kept for the next start
+        logger.error(f"Could not recover spilled attempts: {exc}")
+
+
+@app.on_event("shutdown")
+async def on_shutdown() -> None:
+    await groq_close_async_client()
+    ingest_jobs.shutdown()
+    shutdown_parsers()
+    await run_in_threadpool(attempt_buffer.close)
+    shutdown_tracing()
+
+
+# How often a pending LLM call checks whether the client has gone away.
+DISCONNECT_POLL_SECONDS = 0.5
+
+
+class ClientDisconnected(Exception):
+    """Raised when the client disconnects while an LLM call is in flight."""
+
+
+async def _await_llm(request: Request, coro):
+    """Await an LLM coroutine, cancelling it if the client disconnects first."""
+    task = asyncio.ensure_future(coro)
+    try:
+        while True:
+            done, _ = await asyncio.wait({task}, timeout=DISCONNECT_POLL_SECONDS)
+            if done:
+                return task.result()
+            if await request.is_disconnected():
+                raise ClientDisconnected()
+    finally:
+        if not task.done():
+            task.cancel()
+
+
+def _load_question(question_id: int) -> Question:
+    """Load a question detached from a short-lived session.
+
+    The assistant endpoints await Groq for seconds; holding a pooled
+    connection across that wait would cap them at the pool size.
+    """
+    db = SessionLocal()
+    try:
+        question = db.query(Question).filter(Question.id == question_id).first()
+        if not question:
+            raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Question not found")
+        db.expunge(question)
+        return question
+    finally:
+        db.close()
+
+
+def _save_explanation(question_id: int, explanation: str) -> None:
+    db = SessionLocal()
+    try:
+        db.query(Question).filter(Question.id == question_id).update(
+            {Question.explanation: explanation}, synchronize_session=False
+        )
+        bump_bank_version(db)
+        db.commit()
+    finally:
+        db.close()
+    question_cache.invalidate_questions([question_id])
+
+
+def _apply_answer_key(db: Session, source_file: str, answers: Dict[int, str]) -> AnswerKeyApplyResponse:
+    """Set ``correct_option`` for every question of ``source_file`` in one transaction.
+
+    Questions are matched on the number printed on the paper (``question_no``).
+    Rows saved before that column existed fall back to their upload order.
+    Every question sharing a number gets its answer, and the number is
+    reported as ambiguous (a re-upload, or a paper numbered per section).
+    """
+    rows = (
+        db.query(Question.id, Question.question_no, Question.options)
+        .filter(Question.source_file == source_file)
+        .order_by(Question.id)
+        .all()
+    )
+    if not rows:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=f"No questions found for {source_file}")
+
+    by_number: Dict[int, List] = defaultdict(list)
+    if any(row.question_no is not None for row in rows):
+        for row in rows:
+            if row.question_no is not None:
+                by_number[row.question_no].append(row)
+    else:
+        for position, row in enumerate(rows, start=1):
+            by_number[position].append(row)
+
+    now = datetime.utcnow()
+    updates = []
+    unmatched = []
+    ambiguous = []
+    for number, letter in sorted(answers.items()):
+        index = ord(letter.strip().upper()[:1] or "?") - ord("A")
+        matched = [row for row in by_number.get(number, ()) if 0 <= index < len(row.options)]
+        if not matched:
+            unmatched.append(number)
+            continue
+        if len(by_number[number]) > 1:
+            ambiguous.append(number)
+        updates.extend({"id": row.id, "correct_option": index, "updated_at": now} for row in matched)
+
+    if updates:
+        db.execute(update(Question), updates)
+        bump_bank_version(db)
+        db.commit()
+        question_cache.invalidate_questions(item["id"] for item in updates)
+
+    logger.info(
+        f"Applied answer key to {len(updates)} questions of {source_file} "
+        f"({len(unmatched)} unmatched, {len(ambiguous)} ambiguous numbers)"
+    )
+    return AnswerKeyApplyResponse(
+        status="success",
+        source_file=source_file,
+        updated_count=len(updates),
+        unmatched=unmatched,
+        ambiguous=ambiguous,
+    )
+
+
+@app.exception_handler(ClientDisconnected)
+async def handle_client_disconnected(_, exc: ClientDisconnected):
+    logger.info("Client disconnected; cancelled pending AI request")
+    # 499 (client closed request); nobody is listening for the body.
+    return JSONResponse(status_code=499, content={"detail": "Client closed request"})
 
 
 @app.exception_handler(ValueError)
@@ -113,40 +459,22 @@ def health_check():
     }
 
 
-@app.post("/upload", response_model=UploadResponse)
-async def upload_pdf(
-    file: UploadFile = File(..., description="PDF file containing MCQs"),
-    db: Session = Depends(get_db),
-    background_tasks: BackgroundTasks = BackgroundTasks(),
-):
-    if not file.filename.lower().endswith(".pdf"):
-        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Only PDF files are allowed")
-
-    contents = await file.read()
-    if not contents:
-        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Uploaded file is empty")
-
-    logger.info(f"Starting PDF extraction for {file.filename} ({len(contents)} bytes)")
-    
-    try:
-        parsed_questions = extract_questions_from_pdf(contents)
-        logger.info(f"Extracted {len(parsed_questions)} questions from {file.filename}")
-    except PDFExtractionError as exc:
-        logger.error(f"PDF extraction error: {str(exc)}")
-        raise HTTPException(status_code=status.HTTP_422_UNPROCESSABLE_ENTITY, detail=str(exc)) from exc
-    except Exception as exc:
-        logger.error(f"Unexpected extraction error: {str(exc)}")
-        raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail="PDF extraction failed") from exc
+def _save_questions(db: Session, records: List[Dict], filename: str) -> int:
+    """Persist extracted questions for ``filename`` in one commit; returns how many were saved.
 
-    if not parsed_questions:
-        logger.warning(f"No questions extracted from {file.filename}")
-        raise HTTPException(
-            status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
-            detail="No MCQs could be extracted from the PDF. Please ensure the PDF contains properly formatted MCQs.",
-        )
+    Each saved record gets its row ``id``, so later layout updates can find it.
+    Near-duplicates of a question in the bank, or earlier in ``records``, get
+    ``duplicate_of``. With ``DUPLICATE_POLICY=skip`` they are not saved.
+    """
+    with span("db.find_duplicates", questions=len(records)):
+        fingerprints = [fingerprint(record.get("question"), record.get("options", [])) for record in records]
+        matches = find_matches(db, fingerprints)
 
     saved = 0
-    for record in parsed_questions:
+    added = []
+    for index, record in enumerate(records):
+        if matches[index] is not None and DUPLICATE_POLICY == "skip":
+            continue
         try:
             # Store all question data INCLUDING image data if available
             question = Question(
@@ -154,55 +482,212 @@ async def upload_pdf(
                 options=record.get("options", []),
                 correct_option=record.get("correct_option"),  # IMPORTANT: Store the answer!
                 explanation=record.get("explanation", ""),
-                source_file=file.filename,
+                source_file=filename,
                 page_no=record.get("page_no"),
+                question_no=record.get("question_no"),
                 image_data=record.get("image_data"),  # Store image if available
                 image_type=record.get("image_type"),  # Store image type if available
+                thumbnail_data=record.get("thumbnail_data"),
+                thumbnail_type=record.get("thumbnail_type"),
             )
             db.add(question)
+            added.append((index, question))
             saved += 1
             has_image = "✓" if record.get("image_data") else "✗"
             logger.debug(f"Saved Q: {record.get('question')[:40]}... Answer: {record.get('correct_option')} Image: {has_image}")
         except Exception as exc:  # noqa: BLE001
             logger.error(f"Failed to persist question: {str(exc)}", exc_info=exc)
 
-    db.commit()
+    with span("db.save_questions", questions=saved):
+        db.flush()
+        ids: List[Optional[int]] = [None] * len(records)
+        for index, question in added:
+            ids[index] = records[index]["id"] = question.id
+        for record, match in zip(records, matches):
+            if match is not None:
+                record["duplicate_of"] = resolve_duplicate_of(match, ids)
+        add_fingerprints(
+            db, [(question.id, fingerprints[index], records[index].get("duplicate_of")) for index, question in added]
+        )
+        bump_bank_version(db)
+        db.commit()
+    duplicates = sum(match is not None for match in matches)
+    if duplicates:
+        logger.info(f"♻️ {duplicates} near-duplicate questions in {filename} ({DUPLICATE_POLICY})")
+    question_cache.invalidate_pools()
+    return saved
+
+
+LAYOUT_FIELDS = ("page_no", "image_data", "image_type", "thumbnail_data", "thumbnail_type")
+
+
+def _save_layout(db: Session, records: List[Dict]) -> None:
+    """Store the page numbers and images found once the whole PDF was read."""
+    rows = [
+        {"id": record["id"], **{field: record[field] for field in LAYOUT_FIELDS if record.get(field) is not None}}
+        for record in records
+        if record.get("id") and any(record.get(field) is not None for field in LAYOUT_FIELDS)
+    ]
+    if not rows:
+        return
+    with span("db.save_layout", questions=len(rows)):
+        db.bulk_update_mappings(Question, rows)
+        bump_bank_version(db)
+        db.commit()
+    question_cache.invalidate_questions([row["id"] for row in rows])
+
+
+def _ingest_pdf(db: Session, path: str, filename: str, report=None) -> Tuple[int, int, int]:
+    """Extract ``path`` page by page, saving each batch of questions as soon as it is parsed.
+
+    Returns ``(saved, parsed, duplicates)``. ``report(**progress)`` is called after every batch.
+    If extraction fails part-way, the :class:`PDFExtractionError` says how many questions were saved.
+    """
+    saved = parsed = duplicates = 0
+    records: List[Dict] = []
+    try:
+        for batch in iter_questions_from_pdf(path):
+            if batch.questions:
+                saved += _save_questions(db, batch.questions, filename)
+                parsed += len(batch.questions)
+                duplicates += sum(1 for record in batch.questions if record.get("duplicate_of"))
+                records.extend(batch.questions)
+            if batch.layout_done:
+                if report:
+                    report(SAVING)
+                _save_layout(db, records)
+            if report:
+                report(
+                    pages_done=batch.pages_done,
+                    total_pages=batch.total_pages,
+                    saved_count=saved,
+                    total_parsed=parsed,
+                    duplicate_count=duplicates,
+                )
+    except PDFExtractionError as exc:
+        if not saved:
+            raise
+        # Earlier batches are committed and quizzable; say so rather than hide them.
+        raise PDFExtractionError(f"{exc} ({saved} questions from the pages before were saved)") from exc
+    return saved, parsed, duplicates
+
+
+@app.post("/upload", response_model=UploadResponse)
+async def upload_pdf(
+    file: UploadFile = File(..., description="PDF file containing MCQs"),
+    db: Session = Depends(get_db),
+    background_tasks: BackgroundTasks = BackgroundTasks(),
+):
+    if not file.filename.lower().endswith(".pdf"):
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Only PDF files are allowed")
+
+    async with spool_upload(file) as upload:
+        logger.info(f"Starting PDF extraction for {file.filename} ({upload.size} bytes, sha256 {upload.sha256[:12]})")
+
+        try:
+            # Questions are saved batch by batch, so early pages are quizzable before the upload returns.
+            saved, parsed, duplicates = await run_in_threadpool(_ingest_pdf, db, upload.path, file.filename)
+            logger.info(f"Extracted {parsed} questions from {file.filename}")
+        except PDFExtractionError as exc:
+            logger.error(f"PDF extraction error: {str(exc)}")
+            raise HTTPException(status_code=status.HTTP_422_UNPROCESSABLE_ENTITY, detail=str(exc)) from exc
+        except Exception as exc:
+            logger.error(f"Unexpected extraction error: {str(exc)}")
+            raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail="PDF extraction failed") from exc
+
+    if not parsed:
+        logger.warning(f"No questions extracted from {file.filename}")
+        raise HTTPException(
+            status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+            detail="No MCQs could be extracted from the PDF. Please ensure the PDF contains properly formatted MCQs.",
+        )
+
     logger.info(f"Saved {saved} questions to database")
     background_tasks.add_task(generate_explanations, file.filename)
 
+    message = f"Successfully processed {saved} questions from {file.filename}"
+    if duplicates:
+        outcome = "skipped" if DUPLICATE_POLICY == "skip" else "saved and flagged"
+        message += f" ({duplicates} near-duplicates of questions already in the bank, {outcome})"
     return UploadResponse(
         status="success",
-        message=f"Successfully processed {saved} questions from {file.filename}",
+        message=message,
         saved_count=saved,
-        total_parsed=len(parsed_questions),
+        total_parsed=parsed,
+        duplicate_count=duplicates,
+        sha256=upload.sha256,
     )
 
 
+def _ingest_batch_file(path: str, filename: str, report) -> Tuple[int, int]:
+    """Extract and save one PDF of a batch (runs on a batch worker thread)."""
+    report(EXTRACTING)
+    db = SessionLocal()
+    try:
+        saved, parsed, _ = _ingest_pdf(db, path, filename, report)
+    finally:
+        db.close()
+    if not parsed:
+        raise PDFExtractionError("No MCQs could be extracted from the PDF")
+    logger.info(f"Saved {saved} questions from {filename}")
+    return saved, parsed
+
+
+@app.post("/upload/batch", response_model=BatchJobResponse, status_code=status.HTTP_202_ACCEPTED)
+async def upload_batch(
+    files: List[UploadFile] = File(..., description="PDF files, or ZIP archives of PDFs"),
+):
+    """Ingest several papers at once; poll ``GET /upload/batch/{job_id}`` for progress."""
+    workdir, entries = await spool_batch(files)
+    job = ingest_jobs.start(entries, workdir, _ingest_batch_file, followup=generate_explanations)
+    return job.as_dict()
+
+
+@app.get("/upload/batch/{job_id}", response_model=BatchJobResponse)
+def get_batch_job(job_id: str):
+    job = ingest_jobs.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Batch job not found")
+    return job.as_dict()
+
+
 @app.post("/upload-answer-key")
 async def upload_answer_key(
     file: UploadFile = File(..., description="PDF file containing answer key"),
+    source_file: Optional[str] = None,
+    db: Session = Depends(get_db),
 ):
-    """Upload and validate an answer key PDF using AI"""
+    """Upload and parse an answer key PDF.
+
+    When ``source_file`` is given, the parsed key is also applied to that paper's questions.
+    """
     if not file.filename.lower().endswith(".pdf"):
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Only PDF files are allowed")
 
-    contents = await file.read()
-    if not contents:
-        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Uploaded file is empty")
-
-    logger.info(f"Processing answer key PDF: {file.filename} ({len(contents)} bytes)")
-    
     try:
-        result = extract_answer_key_from_pdf(contents)
-        
+        async with spool_upload(file) as upload:
+            logger.info(f"Processing answer key PDF: {file.filename} ({upload.size} bytes)")
+            result = await run_in_threadpool(extract_answer_key_from_pdf, upload.path)
+
         if result.get("status") == "success":
             logger.info(f"✅ Answer key validated: {result.get('message')}")
-            return {
+            response = {
                 "status": "success",
                 "message": result.get("message"),
                 "answer_key": result.get("answer_key"),
+                "source": result.get("source"),
                 "file_name": file.filename
             }
+            if source_file:
+                answers = {}
+                for item in result["answer_key"].get("answers", []):
+                    try:
+                        answers[int(item["question_number"])] = str(item["answer"])
+                    except (KeyError, TypeError, ValueError):
+                        continue
+                applied = await run_in_threadpool(_apply_answer_key, db, source_file, answers)
+                response["applied"] = applied.dict()
+            return response
         else:
             logger.warning(f"⚠️ Answer key validation failed: {result.get('message')}")
             raise HTTPException(
@@ -220,12 +705,40 @@ async def upload_answer_key(
         ) from exc
 
 
+@app.put("/questions/answer-key", response_model=AnswerKeyApplyResponse)
+def apply_answer_key(payload: AnswerKeyRequest, db: Session = Depends(get_db)):
+    """Bulk-update ``correct_option`` for one source file from a question-number -> letter map."""
+    if not payload.answers:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="No answers provided")
+    return _apply_answer_key(db, payload.source_file, payload.answers)
+
+
 @app.get("/questions", response_model=List[QuestionDTO])
-def list_questions(skip: int = 0, limit: int = 100, db: Session = Depends(get_db)):
+def list_questions(
+    request: Request,
+    skip: int = 0,
+    limit: int = 100,
+    images: Optional[str] = None,
+    db: Session = Depends(get_db),
+):
+    mode = _image_mode(images)
     try:
         limit = max(1, min(limit, 200))
-        records = db.query(Question).offset(skip).limit(limit).all()
-        return records
+        version, last_modified = get_bank_version(db)
+        etag = bank_etag(version, skip, limit, mode)
+        if is_not_modified(request, etag, last_modified):
+            return not_modified_response(etag, last_modified)
+
+        if mode == "url":
+            rows = db.query(*QUESTION_META_COLUMNS).order_by(Question.id).offset(skip).limit(limit).all()
+            payloads = [_question_payload(row) for row in rows]
+            for row, payload in zip(rows, payloads):
+                if row.has_image:
+                    payload.update(_image_links(request, row.id, row.updated_at))
+        else:
+            rows = db.query(*QUESTION_COLUMNS).order_by(Question.id).offset(skip).limit(limit).all()
+            payloads = [_question_payload(row) for row in rows]
+        return FastJSONResponse(payloads, headers=cache_headers(etag, last_modified))
     except Exception as e:
         logger.error(f"Error fetching questions: {str(e)}")
         # If columns don't exist, try to migrate
@@ -243,6 +756,12 @@ def list_questions(skip: int = 0, limit: int = 100, db: Session = Depends(get_db
         raise HTTPException(status_code=500, detail=str(e))
 
 
+@app.get("/questions/duplicates", response_model=List[DuplicateCluster])
+def list_duplicate_clusters(skip: int = 0, limit: int = 50, db: Session = Depends(get_db)):
+    """Near-duplicate clusters recorded by the dedup index, largest first."""
+    return duplicate_clusters(db, limit=max(1, min(limit, 200)), offset=max(0, skip))
+
+
 @app.delete("/questions/all")
 def delete_all_questions(db: Session = Depends(get_db)):
     """Delete all extracted questions from database"""
@@ -251,8 +770,17 @@ def delete_all_questions(db: Session = Depends(get_db)):
         if count == 0:
             return {"status": "success", "deleted_count": 0}
         
+        db.query(QuestionLshBucket).delete(synchronize_session=False)
+        db.query(QuestionFingerprint).delete(synchronize_session=False)
+        db.query(QuizSession).delete(synchronize_session=False)
+        db.query(ReviewCard).delete(synchronize_session=False)
+        # Attempt history is kept on purpose; stats read as live and would outlast their questions.
+        db.query(QuestionStats).delete(synchronize_session=False)
+        db.query(SourceFileStats).delete(synchronize_session=False)
         db.query(Question).delete(synchronize_session=False)
+        bump_bank_version(db)
         db.commit()
+        question_cache.clear()
         logger.info(f"✅ Deleted {count} questions")
         return {"status": "success", "deleted_count": count}
     except Exception as e:
@@ -264,31 +792,416 @@ def delete_all_questions(db: Session = Depends(get_db)):
         raise HTTPException(status_code=500, detail=str(e))
 
 
+# Columns needed to build a QuestionDTO payload, read as plain tuples so rows
+# skip ORM identity-map and pydantic overhead on the hot read paths.
+QUESTION_COLUMNS = (
+    Question.id,
+    Question.question,
+    Question.options,
+    Question.correct_option,
+    Question.explanation,
+    Question.source_file,
+    Question.page_no,
+    Question.question_no,
+    Question.image_data,
+    Question.image_type,
+    Question.updated_at,
+)
+
+
+# Same columns without the image bytes, for responses that link images by URL.
+QUESTION_META_COLUMNS = tuple(c for c in QUESTION_COLUMNS if c is not Question.image_data) + (
+    Question.image_data.isnot(None).label("has_image"),
+)
+
+
+def _image_mode(images: Optional[str]) -> str:
+    mode = images or IMAGE_DELIVERY
+    if mode not in IMAGE_DELIVERY_MODES:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"images must be one of: {', '.join(IMAGE_DELIVERY_MODES)}",
+        )
+    return mode
+
+
+def _image_link(
+    request: Request, question_id: int, updated_at: Optional[datetime], route: str = "get_question_image"
+) -> str:
+    # ?v= changes whenever the row does, so the image can be cached for a long time.
+    url = request.url_for(route, question_id=question_id)
+    return f"{url}?v={version_stamp(updated_at)}"
+
+
+def _image_links(request: Request, question_id: int, updated_at: Optional[datetime]) -> Dict[str, str]:
+    return {
+        "image_url": _image_link(request, question_id, updated_at),
+        "thumbnail_url": _image_link(request, question_id, updated_at, "get_question_thumbnail"),
+    }
+
+
+def _question_payload(row) -> Dict:
+    """Serialize a ``QUESTION_COLUMNS`` row with the same shape as ``QuestionDTO``.
+
+    Rows from ``QUESTION_META_COLUMNS`` carry no image bytes and get ``image_url=None``.
+    """
+    image_url = image_data_url(row.image_data, row.image_type) if hasattr(row, "image_data") else None
+    return {
+        "id": row.id,
+        "question": row.question,
+        "options": row.options,
+        "correct_option": row.correct_option,
+        "explanation": row.explanation,
+        "source_file": row.source_file,
+        "page_no": row.page_no,
+        "question_no": row.question_no,
+        "image_url": image_url,
+    }
+
+
+def _question_entry(row) -> Dict:
+    return {
+        "payload": _question_payload(row),
+        "updated_at": serialize_timestamp(row.updated_at),
+        "has_image": row.image_data is not None,
+    }
+
+
+def _deliver(entry: Dict, request: Request, mode: str) -> Dict:
+    """Return a cached payload, swapping the inline image for a link in "url" mode."""
+    payload = entry["payload"]
+    if mode == "url" and entry.get("has_image"):
+        updated_at = parse_timestamp(entry["updated_at"])
+        payload = {**payload, **_image_links(request, payload["id"], updated_at)}
+    return payload
+
+
+def _load_question_entry(db: Session, question_id: int) -> Optional[Dict]:
+    row = db.query(*QUESTION_COLUMNS).filter(Question.id == question_id).first()
+    return _question_entry(row) if row else None
+
+
+def _load_question_entries(db: Session, question_ids: List[int]) -> Dict[int, Dict]:
+    rows = db.query(*QUESTION_COLUMNS).filter(Question.id.in_(question_ids)).all()
+    return {row.id: _question_entry(row) for row in rows}
+
+
+def _load_quiz_pool(db: Session, topic: Optional[str]) -> List[int]:
+    query = db.query(Question.id)
+    if topic:
+        query = query.filter(Question.question.ilike(f"%{topic}%"))
+    return [row.id for row in query.all()]
+
+
+def _sync_question_cache(db: Session) -> None:
+    question_cache.sync_version(lambda: get_bank_version(db)[0])
+
+
 @app.get("/questions/{question_id}", response_model=QuestionDTO)
-def get_question(question_id: int, db: Session = Depends(get_db)):
-    record = db.query(Question).filter(Question.id == question_id).first()
-    if not record:
+def get_question(
+    question_id: int,
+    request: Request,
+    images: Optional[str] = None,
+    db: Session = Depends(get_db),
+):
+    mode = _image_mode(images)
+    _sync_question_cache(db)
+    entry = question_cache.get_question(question_id, lambda qid: _load_question_entry(db, qid))
+    if entry is None:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Question not found")
-    return record
+
+    updated_at = parse_timestamp(entry["updated_at"])
+    etag = question_etag(question_id, updated_at, mode)
+    if is_not_modified(request, etag, updated_at):
+        return not_modified_response(etag, updated_at)
+    return FastJSONResponse(_deliver(entry, request, mode), headers=cache_headers(etag, updated_at))
+
+
+def _binary_image_response(request: Request, question_id: int, row, variant: str) -> Response:
+    if not row or not row.data:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Image not found")
+
+    etag = question_etag(question_id, row.updated_at, variant)
+    if is_not_modified(request, etag, row.updated_at):
+        return not_modified_response(etag, row.updated_at, IMAGE_CACHE_CONTROL)
+    return Response(
+        content=row.data,
+        media_type=f"image/{row.type or 'png'}",
+        headers=cache_headers(etag, row.updated_at, IMAGE_CACHE_CONTROL),
+    )
+
+
+@app.get("/questions/{question_id}/image")
+def get_question_image(question_id: int, request: Request, db: Session = Depends(get_db)):
+    """Serve a question's image as binary (used by ``images=url`` payloads)."""
+    row = (
+        db.query(Question.image_data.label("data"), Question.image_type.label("type"), Question.updated_at)
+        .filter(Question.id == question_id)
+        .first()
+    )
+    return _binary_image_response(request, question_id, row, "image")
+
+
+@app.get("/questions/{question_id}/thumbnail")
+def get_question_thumbnail(question_id: int, request: Request, db: Session = Depends(get_db)):
+    """Serve the small preview generated at ingest, falling back to the full image."""
+    row = (
+        db.query(
+            func.coalesce(Question.thumbnail_data, Question.image_data).label("data"),
+            case(
+                (Question.thumbnail_data.isnot(None), Question.thumbnail_type), else_=Question.image_type
+            ).label("type"),
+            Question.updated_at,
+        )
+        .filter(Question.id == question_id)
+        .first()
+    )
+    return _binary_image_response(request, question_id, row, "thumbnail")
 
 
 @app.get("/quiz", response_model=QuizResponse)
-def get_quiz(limit: int = 20, topic: Optional[str] = None, db: Session = Depends(get_db)):
+def get_quiz(
+    request: Request,
+    limit: int = 20,
+    topic: Optional[str] = None,
+    images: Optional[str] = None,
+    learner_id: Optional[str] = None,
+    db: Session = Depends(get_db),
+):
+    """Random quiz questions; with ``learner_id``, the ones the learner's review schedule picks."""
     limit = max(1, min(limit, 50))
-    query = db.query(Question)
+    mode = _image_mode(images)
+    _sync_question_cache(db)
+
+    pool = question_cache.get_pool(topic, lambda t: _load_quiz_pool(db, t))
+    if not pool:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="No questions available for quiz")
+
+    if learner_id is not None:
+        chosen = pick_adaptive(db, check_learner_id(learner_id), pool, limit, restrict_to_pool=bool(topic))
+    else:
+        chosen = random.sample(pool, min(limit, len(pool)))
+    entries = question_cache.get_questions(chosen, lambda ids: _load_question_entries(db, ids))
+    questions = [_deliver(entry, request, mode) for entry in entries]
+    return FastJSONResponse({"total": len(questions), "questions": questions})
+
+
+def _session_state(db: Session, session: QuizSession, request: Request, mode: str) -> Dict:
+    """Session summary plus the next question, prefetching the ones after it into the cache."""
+    question = None
+    if not session.finished:
+        upcoming = upcoming_ids(session)
+        entries = question_cache.get_questions(upcoming, lambda ids: _load_question_entries(db, ids))
+        if not entries or entries[0]["payload"]["id"] != upcoming[0]:
+            raise HTTPException(status_code=status.HTTP_410_GONE, detail="Quiz question no longer exists")
+        question = {**_deliver(entries[0], request, mode), "correct_option": None, "explanation": None}
+    return {
+        "session_id": session.id,
+        "topic": session.topic,
+        "learner_id": session.learner_id,
+        "total": session.total,
+        "answered": session.position,
+        "score": session.score,
+        "finished": session.finished,
+        "expires_at": serialize_timestamp(session.expires_at),
+        "position": None if session.finished else session.position,
+        "question": question,
+    }
+
+
+def _review(
+    db: Session, learner_id: str, question_id: int, answer: Optional[int], is_correct: Optional[bool]
+) -> None:
+    """Update the learner's review schedule; a failure is logged, never surfaced to the quiz."""
+    try:
+        review(db, learner_id, question_id, answer, is_correct)
+        db.commit()
+    except Exception as e:
+        db.rollback()
+        logger.warning(f"Could not update the review schedule of {learner_id}: {str(e)}")
+
+
+def _review_in_new_session(
+    learner_id: str, question_id: int, answer: Optional[int], is_correct: Optional[bool]
+) -> None:
+    db = SessionLocal()
+    try:
+        _review(db, learner_id, question_id, answer, is_correct)
+    finally:
+        db.close()
 
-    if topic:
-        query = query.filter(Question.question.ilike(f"%{topic}%"))
 
-    results = query.order_by(func.random()).limit(limit).all()
-    if not results:
+@app.post("/quiz/sessions", response_model=QuizSessionResponse, status_code=status.HTTP_201_CREATED)
+def create_quiz_session(
+    payload: QuizSessionCreate,
+    request: Request,
+    images: Optional[str] = None,
+    db: Session = Depends(get_db),
+):
+    """Start a quiz: pin a sample of questions (random, or adaptive for a learner) and return the first one."""
+    mode = _image_mode(images)
+    _sync_question_cache(db)
+    pool = question_cache.get_pool(payload.topic, lambda t: _load_quiz_pool(db, t))
+    if not pool:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="No questions available for quiz")
+    limit = max(1, min(payload.limit, QUIZ_SESSION_MAX_QUESTIONS))
+    learner_id = None
+    if payload.learner_id is not None:
+        learner_id = check_learner_id(payload.learner_id)
+        pool = pick_adaptive(db, learner_id, pool, limit, restrict_to_pool=bool(payload.topic))
+    session = create_session(db, pool, limit, payload.topic, learner_id=learner_id)
+    return FastJSONResponse(_session_state(db, session, request, mode), status_code=status.HTTP_201_CREATED)
+
+
+@app.get("/quiz/sessions/{session_id}", response_model=QuizSessionResponse)
+def get_quiz_session(
+    session_id: str,
+    request: Request,
+    images: Optional[str] = None,
+    db: Session = Depends(get_db),
+):
+    """Progress so far and the question to answer next."""
+    mode = _image_mode(images)
+    _sync_question_cache(db)
+    return FastJSONResponse(_session_state(db, load_session(db, session_id), request, mode))
+
+
+@app.post("/quiz/sessions/{session_id}/answers", response_model=QuizAnswerResponse)
+def answer_quiz_question(
+    session_id: str,
+    payload: QuizAnswerSubmit,
+    request: Request,
+    images: Optional[str] = None,
+    db: Session = Depends(get_db),
+):
+    """Mark the answer to the question at ``position`` and return the next question."""
+    mode = _image_mode(images)
+    _sync_question_cache(db)
+    session = load_session(db, session_id, for_update=True)
+    question_id = question_id_at(session, payload.position)
+    entry = question_cache.get_question(question_id, lambda qid: _load_question_entry(db, qid))
+    if entry is None:
+        raise HTTPException(status_code=status.HTTP_410_GONE, detail="Quiz question no longer exists")
+    question = entry["payload"]
+    replay = payload.position < session.position
+    mark = record_answer(
+        db, session, payload.position, payload.answer, len(question["options"]), question["correct_option"]
+    )
+    if not replay:
+        attempt_buffer.record(question_id, payload.answer, mark_is_correct(mark), "session", session_id=session.id)
+        if session.learner_id:
+            _review(db, session.learner_id, question_id, payload.answer, mark_is_correct(mark))
+    state = _session_state(db, session, request, mode)
+    state["result"] = {
+        "position": payload.position,
+        "question_id": question_id,
+        "answer": payload.answer,
+        "is_correct": mark_is_correct(mark),
+        "correct_option": question["correct_option"],
+        "explanation": question["explanation"],
+    }
+    return FastJSONResponse(state)
+
+
+@app.get("/quiz/sessions/{session_id}/score", response_model=QuizScoreResponse)
+def get_quiz_score(session_id: str, db: Session = Depends(get_db)):
+    """Score and per-question results for the questions answered so far."""
+    _sync_question_cache(db)
+    session = load_session(db, session_id)
+    answered = session.question_ids[:session.position]
+    entries = {
+        entry["payload"]["id"]: entry["payload"]
+        for entry in question_cache.get_questions(answered, lambda ids: _load_question_entries(db, ids))
+    }
+    results = []
+    for position, (question_id, answer, mark) in enumerate(zip(answered, session.answers, session.marks)):
+        question = entries.get(question_id, {})
+        results.append({
+            "position": position,
+            "question_id": question_id,
+            "answer": answer,
+            "is_correct": mark_is_correct(mark),
+            "correct_option": question.get("correct_option"),
+            "explanation": question.get("explanation"),
+        })
+    graded = len(session.marks) - session.marks.count(UNGRADED)
+    return FastJSONResponse({
+        "session_id": session.id,
+        "total": session.total,
+        "answered": session.position,
+        "score": session.score,
+        "graded": graded,
+        "percentage": round(100 * session.score / graded, 1) if graded else 0.0,
+        "finished": session.finished,
+        "results": results,
+    })
+
+
+@app.get("/learners/{learner_id}/schedule", response_model=LearnerScheduleResponse)
+def get_learner_schedule(learner_id: str, db: Session = Depends(get_db)):
+    """How many questions the learner has in review and how many are due now."""
+    return FastJSONResponse(schedule_summary(db, check_learner_id(learner_id)))
+
+
+def _stats_sort(sort: str) -> str:
+    if sort not in STATS_SORTS:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST, detail=f"sort must be one of: {', '.join(STATS_SORTS)}"
+        )
+    return sort
+
+
+@app.get("/stats/questions", response_model=List[QuestionStatsDTO])
+def list_question_stats(
+    source_file: Optional[str] = None,
+    sort: str = "attempts",
+    skip: int = 0,
+    limit: int = 50,
+    db: Session = Depends(get_db),
+):
+    """Per-question accuracy and option distribution, read from the precomputed counters."""
+    rows = question_stats(
+        db, source_file, _stats_sort(sort), limit=max(1, min(limit, 200)), offset=max(0, skip)
+    )
+    return FastJSONResponse(rows)
 
-    return QuizResponse(total=len(results), questions=results)
+
+@app.get("/stats/questions/{question_id}", response_model=QuestionStatsDTO)
+def get_question_stats(question_id: int, db: Session = Depends(get_db)):
+    row = question_stats_for(db, question_id)
+    if row is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="No attempts recorded for this question")
+    return FastJSONResponse(row)
+
+
+@app.get("/stats/sources", response_model=List[SourceFileStatsDTO])
+def list_source_file_stats(sort: str = "attempts", skip: int = 0, limit: int = 50, db: Session = Depends(get_db)):
+    """Accuracy and difficulty per source file (one paper), read from the precomputed counters."""
+    return FastJSONResponse(
+        source_file_stats(db, _stats_sort(sort), limit=max(1, min(limit, 200)), offset=max(0, skip))
+    )
+
+
+@app.get("/metrics", include_in_schema=False)
+def metrics():
+    """Prometheus scrape endpoint."""
+    if not PROMETHEUS_AVAILABLE:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="prometheus-client is not installed",
+        )
+    payload, content_type = render_metrics()
+    return Response(content=payload, media_type=content_type)
+
+
+@app.get("/cache/stats")
+def cache_stats():
+    """Hit-rate and size of the question read-through cache."""
+    return question_cache.stats()
 
 
 @app.post("/assistant/validate-raw-text")
-def validate_raw_extraction(raw_text: str):
+async def validate_raw_extraction(raw_text: str, request: Request):
     """AI-FIRST: Validate raw extracted text before parsing into MCQs"""
     try:
         if not raw_text or len(raw_text) < 50:
@@ -312,12 +1225,15 @@ Raw text:
 Return ONLY the JSON array, no other text."""
         
         try:
-            response = groq_generate_explanation(validation_prompt)
+            response = await _await_llm(
+                request, groq_complete_async(
+                    validation_prompt, max_tokens=2048, temperature=0.3, call_site="validate_raw_text"
+                )
+            )
             logger.info(f"✅ AI validation response received")
             
             # Try to parse JSON from response
             try:
-                import json
                 # Extract JSON from response
                 json_match = re.search(r'\[.*\]', response, re.DOTALL)
                 if json_match:
@@ -339,14 +1255,17 @@ Return ONLY the JSON array, no other text."""
         except GroqAIUnavailable:
             logger.warning("⚠️ Groq AI unavailable")
             return {"status": "error", "message": "AI unavailable"}
+    except ClientDisconnected:
+        raise
     except Exception as e:
         logger.error(f"❌ Validation error: {str(e)}")
         raise HTTPException(status_code=500, detail=str(e))
 
 
 @app.post("/assistant/validate")
-def validate_extraction(
+async def validate_extraction(
     questions: List[dict],
+    request: Request,
 ):
     """Validate extracted questions using Groq AI"""
     try:
@@ -369,7 +1288,11 @@ For each question, check:
 Respond with JSON: {{"valid": true/false, "issues": [], "confidence": 0-100}}"""
         
         try:
-            response = groq_generate_explanation(validation_prompt)
+            response = await _await_llm(
+                request, groq_complete_async(
+                    validation_prompt, max_tokens=512, temperature=0.3, call_site="validate_questions"
+                )
+            )
             logger.info(f"Validation response: {response}")
             
             return {
@@ -386,36 +1309,35 @@ Respond with JSON: {{"valid": true/false, "issues": [], "confidence": 0-100}}"""
                 "total_questions": len(questions),
                 "message": "Questions extracted but AI validation failed"
             }
+    except ClientDisconnected:
+        raise
     except Exception as e:
         logger.error(f"Validation error: {str(e)}")
         raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=str(e))
 
 
 @app.post("/assistant/explain")
-def explain_question(
-    question_id: int,
-    db: Session = Depends(get_db),
-    background_tasks: BackgroundTasks = BackgroundTasks(),
-):
+async def explain_question(question_id: int, request: Request):
     """Get AI explanation for a specific question using Groq API."""
     logger.info(f"Explain request for question {question_id}")
-    question = db.query(Question).filter(Question.id == question_id).first()
-    if not question:
-        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Question not found")
+    question = await run_in_threadpool(_load_question, question_id)
 
     if question.explanation:
         return {"explanation": question.explanation, "source": "cached"}
 
     try:
-        explanation = groq_generate_explanation(
-            question.question,
-            question.options,
-            question.correct_option,
+        explanation = await _await_llm(
+            request,
+            groq_generate_explanation_async(
+                question.question,
+                question.options,
+                question.correct_option,
+            ),
         )
-        question.explanation = explanation
-        db.add(question)
-        db.commit()
+        await run_in_threadpool(_save_explanation, question_id, explanation)
         return {"explanation": explanation, "source": "generated"}
+    except ClientDisconnected:
+        raise
     except GroqAIUnavailable as exc:
         logger.warning("Groq AI unavailable: %s", exc)
         return {
@@ -428,26 +1350,34 @@ def explain_question(
 
 
 @app.post("/assistant/feedback")
-def answer_feedback(
+async def answer_feedback(
     question_id: int,
     student_answer: int,
-    db: Session = Depends(get_db),
+    request: Request,
+    learner_id: Optional[str] = None,
 ):
     """Provide feedback on student's answer choice using Groq API."""
-    question = db.query(Question).filter(Question.id == question_id).first()
-    if not question:
-        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Question not found")
-
-    is_correct = student_answer == question.correct_option
+    if learner_id is not None:
+        learner_id = check_learner_id(learner_id)
+    question = await run_in_threadpool(_load_question, question_id)
+    # Plain values: nothing below may lazy-load on the event loop.
+    text, options, correct_option = question.question, question.options, question.correct_option
+
+    is_correct = student_answer == correct_option
+    graded = is_correct if correct_option is not None else None
+    # A spill-file write under a lock the threadpool handlers share: kept off the event loop.
+    await run_in_threadpool(attempt_buffer.record, question_id, student_answer, graded, "feedback")
+    if learner_id:
+        await run_in_threadpool(_review_in_new_session, learner_id, question_id, student_answer, graded)
 
     try:
-        feedback = groq_generate_feedback(
-            question.question,
-            question.options,
-            student_answer,
-            question.correct_option,
+        feedback = await _await_llm(
+            request,
+            groq_generate_feedback_async(text, options, student_answer, correct_option),
         )
         return {"feedback": feedback, "is_correct": is_correct}
+    except ClientDisconnected:
+        raise
     except GroqAIUnavailable as exc:
         logger.warning("Groq AI unavailable: %s", exc)
         return {
@@ -460,18 +1390,15 @@ def answer_feedback(
 
 
 @app.post("/assistant/hint")
-def get_hint(
-    question_id: int,
-    db: Session = Depends(get_db),
-):
+async def get_hint(question_id: int, request: Request):
     """Get a hint for a question without revealing the answer using Groq API."""
-    question = db.query(Question).filter(Question.id == question_id).first()
-    if not question:
-        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Question not found")
+    question = await run_in_threadpool(_load_question, question_id)
 
     try:
-        hint = groq_generate_hint(question.question, question.options)
+        hint = await _await_llm(request, groq_generate_hint_async(question.question, question.options))
         return {"hint": hint}
+    except ClientDisconnected:
+        raise
     except GroqAIUnavailable as exc:
         logger.warning("Groq AI unavailable: %s", exc)
         return {"hint": "AI hints unavailable. Check GROQ_API_KEY in .env."}
@@ -514,7 +1441,11 @@ def generate_explanations(filename: str) -> None:
                     "Failed to generate explanation for question %s", question.id, exc_info=exc
                 )
 
+        pending_ids = [question.id for question in pending]
+        if success_count:
+            bump_bank_version(db)
         db.commit()
+        question_cache.invalidate_questions(pending_ids)
         logger.info("Generated %s/%s explanations for %s", success_count, len(pending), filename)
     except GroqAIUnavailable:
         logger.warning("Groq API unavailable. Check GROQ_API_KEY in .env.")
@@ -0,0 +1,266 @@
+"""Prometheus metrics for the extraction, LLM and database hot paths.
+
+Scraped from ``GET /metrics``. ``stage_timer`` and ``llm_call`` also open a
+tracing span (see ``tracing``), so every timed stage shows up in request
+traces. ``prometheus_client`` is optional: without it every metric below is a
+no-op and the endpoint answers 503.
+"""
+
+import asyncio
+import functools
+import importlib.util
+import time
+from contextlib import contextmanager, nullcontext
+from contextvars import ContextVar
+from typing import Any, Callable, Dict, Iterator, Optional, Tuple
+
+from fastapi.routing import APIRoute
+
+from tracing import annotate, span
+
+PROMETHEUS_AVAILABLE = importlib.util.find_spec("prometheus_client") is not None
+
+# Extraction stages take from milliseconds (parsers) to minutes (OCR, Groq).
+STAGE_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300)
+LLM_BUCKETS = (0.1, 0.25, 0.5, 1, 2, 4, 8, 15, 30, 60)
+DB_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1)
+
+
+class _NoopMetric:
+    def labels(self, *args: Any, **kwargs: Any) -> "_NoopMetric":
+        return self
+
+    def observe(self, value: float) -> None:
+        pass
+
+    def inc(self, amount: float = 1) -> None:
+        pass
+
+    def set_function(self, fn: Callable[[], float]) -> None:
+        pass
+
+    def time(self):
+        return nullcontext()
+
+
+if PROMETHEUS_AVAILABLE:
+    from prometheus_client import CONTENT_TYPE_LATEST, Counter, Gauge, Histogram, generate_latest
+else:  # pragma: no cover - exercised only without the optional dependency
+    CONTENT_TYPE_LATEST = "text/plain; version=0.0.4; charset=utf-8"
+
+    def Counter(*args: Any, **kwargs: Any) -> _NoopMetric:  # noqa: N802
+        return _NoopMetric()
+
+    Gauge = Histogram = Counter
+
+    def generate_latest() -> bytes:
+        return b""
+
+
+EXTRACTION_STAGE_SECONDS = Histogram(
+    "quiz_extraction_stage_seconds",
+    "Time spent in each PDF extraction stage",
+    ["stage"],
+    buckets=STAGE_BUCKETS,
+)
+LLM_REQUEST_SECONDS = Histogram(
+    "quiz_llm_request_seconds",
+    "Groq chat completion latency by call site and outcome",
+    ["call_site", "outcome"],
+    buckets=LLM_BUCKETS,
+)
+LLM_TOKENS = Counter(
+    "quiz_llm_tokens_total",
+    "Tokens reported by Groq usage, by call site",
+    ["call_site", "kind"],
+)
+LLM_RATE_LIMITED = Counter(
+    "quiz_llm_rate_limited_total",
+    "Groq responses with HTTP 429, by call site",
+    ["call_site"],
+)
+LOCAL_AI_BATCH_SECONDS = Histogram(
+    "quiz_local_ai_batch_seconds",
+    "Local model batched generate() time by request kind",
+    ["kind"],
+    buckets=LLM_BUCKETS,
+)
+DB_QUERY_SECONDS = Histogram(
+    "quiz_db_query_seconds",
+    "Database statement latency by API endpoint",
+    ["endpoint"],
+    buckets=DB_BUCKETS,
+)
+HTTP_REQUEST_SECONDS = Histogram(
+    "quiz_http_request_seconds",
+    "HTTP request latency by endpoint and status",
+    ["endpoint", "method", "status"],
+    buckets=STAGE_BUCKETS,
+)
+
+
+def gauge(name: str, documentation: str, fn: Callable[[], float]) -> None:
+    """Register a gauge whose value is read from ``fn`` at scrape time."""
+    Gauge(name, documentation).set_function(fn)
+
+
+@contextmanager
+def stage_timer(stage: str, **attributes: Any) -> Iterator[None]:
+    """Observe the duration of an extraction stage (also on failure) inside an ``extract.<stage>`` span."""
+    start = time.perf_counter()
+    try:
+        with span(f"extract.{stage}", **attributes):
+            yield
+    finally:
+        EXTRACTION_STAGE_SECONDS.labels(stage).observe(time.perf_counter() - start)
+
+
+class _LLMCall:
+    def __init__(self) -> None:
+        self.message: Any = None
+
+    def record(self, message: Any) -> None:
+        """Remember the completion so its token usage is counted."""
+        self.message = message
+
+
+def _is_rate_limited(exc: BaseException) -> bool:
+    return getattr(exc, "status_code", None) == 429 or "429" in str(exc)
+
+
+@contextmanager
+def llm_call(call_site: str) -> Iterator[_LLMCall]:
+    """Time one Groq request and count its tokens and 429s.
+
+    Usage::
+
+        with llm_call("hint") as call:
+            message = client.chat.completions.create(...)
+            call.record(message)
+    """
+    call = _LLMCall()
+    start = time.perf_counter()
+    outcome = "ok"
+    with span(f"groq.{call_site}", **{"llm.call_site": call_site}):
+        try:
+            yield call
+        except BaseException as exc:
+            outcome = "rate_limited" if _is_rate_limited(exc) else "error"
+            if outcome == "rate_limited":
+                LLM_RATE_LIMITED.labels(call_site).inc()
+            raise
+        finally:
+            LLM_REQUEST_SECONDS.labels(call_site, outcome).observe(time.perf_counter() - start)
+            usage = getattr(call.message, "usage", None)
+            if usage is not None:
+                prompt_tokens = getattr(usage, "prompt_tokens", 0) or 0
+                completion_tokens = getattr(usage, "completion_tokens", 0) or 0
+                LLM_TOKENS.labels(call_site, "prompt").inc(prompt_tokens)
+                LLM_TOKENS.labels(call_site, "completion").inc(completion_tokens)
+                annotate(**{"llm.prompt_tokens": prompt_tokens, "llm.completion_tokens": completion_tokens})
+            annotate(**{"llm.outcome": outcome})
+
+
+# -- per-endpoint DB timing ------------------------------------------------
+
+# The ASGI scope of the request being served; the router fills in "endpoint".
+_current_scope: ContextVar[Optional[Dict[str, Any]]] = ContextVar("metrics_scope", default=None)
+# Set by MetricsRoute inside the worker thread that runs a sync endpoint. The
+# scope above is set on the event loop and only reaches that thread if the
+# threadpool copies the caller's context, which not every anyio version does.
+_thread_endpoint: ContextVar[Optional[str]] = ContextVar("metrics_thread_endpoint", default=None)
+
+
+def _endpoint_name(scope: Dict[str, Any]) -> str:
+    return getattr(scope.get("endpoint"), "__name__", "unmatched")
+
+
+def current_endpoint() -> str:
+    name = _thread_endpoint.get()
+    if name is not None:
+        return name
+    scope = _current_scope.get()
+    return _endpoint_name(scope) if scope is not None else "background"
+
+
+def _labelled(call: Callable, name: str) -> Callable:
+    @functools.wraps(call)
+    def run(*args: Any, **kwargs: Any) -> Any:
+        token = _thread_endpoint.set(name)
+        try:
+            return call(*args, **kwargs)
+        finally:
+            _thread_endpoint.reset(token)
+
+    return run
+
+
+class MetricsRoute(APIRoute):
+    """Route that labels the DB statements of a sync endpoint from inside its worker thread.
+
+    Install with ``app.router.route_class = MetricsRoute`` before routes are declared.
+    """
+
+    def get_route_handler(self) -> Callable:
+        call = self.dependant.call
+        if call is not None and not asyncio.iscoroutinefunction(call):
+            self.dependant.call = _labelled(call, self.endpoint.__name__)
+        return super().get_route_handler()
+
+
+def instrument_engine(engine) -> None:
+    """Time every statement on ``engine``, labelled with the endpoint that issued it."""
+    from sqlalchemy import event
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def _before(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("metrics_query_start", []).append(time.perf_counter())
+
+    def _finish(conn) -> None:
+        starts = conn.info.get("metrics_query_start")
+        if starts:
+            DB_QUERY_SECONDS.labels(current_endpoint()).observe(time.perf_counter() - starts.pop())
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def _after(conn, cursor, statement, parameters, context, executemany):
+        _finish(conn)
+
+    # A failing statement never reaches after_cursor_execute; without this its start would stay on the stack.
+    @event.listens_for(engine, "handle_error")
+    def _error(exception_context):
+        if exception_context.connection is not None and exception_context.statement is not None:
+            _finish(exception_context.connection)
+
+
+class MetricsMiddleware:
+    """Record request latency per endpoint and expose the scope to DB timing."""
+
+    def __init__(self, app) -> None:
+        self.app = app
+
+    async def __call__(self, scope, receive, send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        status_holder = {"status": 500}
+
+        async def send_wrapper(message) -> None:
+            if message["type"] == "http.response.start":
+                status_holder["status"] = message["status"]
+            await send(message)
+
+        token = _current_scope.set(scope)
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            _current_scope.reset(token)
+            HTTP_REQUEST_SECONDS.labels(
+                _endpoint_name(scope), scope["method"], str(status_holder["status"])
+            ).observe(time.perf_counter() - start)
+
+
+def render() -> Tuple[bytes, str]:
+    """Return the exposition payload and its content type."""
+    return generate_latest(), CONTENT_TYPE_LATEST
@@ -1,4 +1,6 @@
-from sqlalchemy import Column, Integer, String, JSON, Text, DateTime, LargeBinary
+import base64
+
+from sqlalchemy import BigInteger, Boolean, Column, Float, ForeignKey, Index, Integer, SmallInteger, String, JSON, Text, DateTime, LargeBinary
 from sqlalchemy.orm import validates
 from datetime import datetime
 from typing import List, Dict, Any, Optional
@@ -6,6 +8,14 @@ from typing import List, Dict, Any, Optional
 from db import Base
 
 
+def image_data_url(image_data: Optional[bytes], image_type: Optional[str]) -> Optional[str]:
+    """Build a ``data:`` URL for an embedded question image."""
+    if image_data and image_type:
+        image_b64 = base64.b64encode(image_data).decode('utf-8')
+        return f"data:image/{image_type};base64,{image_b64}"
+    return None
+
+
 class Question(Base):
     """ORM model representing a parsed MCQ."""
 
@@ -18,8 +28,11 @@ class Question(Base):
     explanation = Column(Text, nullable=True)
     source_file = Column(String(255), nullable=True)
     page_no = Column(Integer, nullable=True)
+    question_no = Column(Integer, nullable=True)  # Number printed on the paper, used to apply answer keys
     image_data = Column(LargeBinary, nullable=True)  # Store image as base64 or binary
-    image_type = Column(String(50), nullable=True)  # e.g., 'png', 'jpg'
+    image_type = Column(String(50), nullable=True)  # e.g., 'webp', 'jpeg', 'png'
+    thumbnail_data = Column(LargeBinary, nullable=True)  # Small preview generated at ingest
+    thumbnail_type = Column(String(50), nullable=True)
     created_at = Column(DateTime, default=datetime.utcnow, nullable=False)
     updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, nullable=False)
 
@@ -50,20 +63,11 @@ class Question(Base):
     @property
     def image_url(self) -> Optional[str]:
         """Generate image URL from image_data if available"""
-        if self.image_data and self.image_type:
-            import base64
-            image_b64 = base64.b64encode(self.image_data).decode('utf-8')
-            return f"data:image/{self.image_type};base64,{image_b64}"
-        return None
+        return image_data_url(self.image_data, self.image_type)
 
     def to_dict(self) -> Dict[str, Any]:
-        import base64
-        image_url = None
-        if self.image_data and self.image_type:
-            # Convert binary image to base64 data URL
-            image_b64 = base64.b64encode(self.image_data).decode('utf-8')
-            image_url = f"data:image/{self.image_type};base64,{image_b64}"
-        
+        image_url = image_data_url(self.image_data, self.image_type)
+
         return {
             "id": self.id,
             "question": self.question,
@@ -72,7 +76,153 @@ class Question(Base):
             "explanation": self.explanation,
             "source_file": self.source_file,
             "page_no": self.page_no,
+            "question_no": self.question_no,
             "image_url": image_url,  # Include image as data URL
             "created_at": self.created_at.isoformat() if self.created_at else None,
             "updated_at": self.updated_at.isoformat() if self.updated_at else None,
         }
+
+
+class QuestionBankVersion(Base):
+    """Single-row counter bumped whenever any question changes.
+
+    List endpoints derive their ETag from it, so a conditional GET costs one
+    primary-key lookup instead of re-reading the bank.
+    """
+
+    __tablename__ = "question_bank_version"
+
+    id = Column(Integer, primary_key=True)
+    version = Column(Integer, nullable=False, default=0)
+    updated_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+
+
+class QuestionFingerprint(Base):
+    """Marks a question as indexed for near-duplicate detection (see ``near_duplicates``)."""
+
+    __tablename__ = "question_fingerprints"
+
+    question_id = Column(Integer, ForeignKey("questions.id", ondelete="CASCADE"), primary_key=True)
+    # Canonical question this one duplicates; NULL for originals.
+    duplicate_of = Column(Integer, nullable=True, index=True)
+
+
+class QuestionLshBucket(Base):
+    """One MinHash LSH band of a question: questions sharing a bucket are near-duplicate candidates."""
+
+    __tablename__ = "question_lsh_buckets"
+
+    question_id = Column(Integer, ForeignKey("questions.id", ondelete="CASCADE"), primary_key=True)
+    band = Column(SmallInteger, primary_key=True)
+    bucket = Column(BigInteger, nullable=False, index=True)
+
+
+class QuizSession(Base):
+    """A student's run through a pinned sample of questions (see ``quiz_sessions``).
+
+    Only question ids and the answers given are stored; questions are read
+    through the question cache as they are served.
+    """
+
+    __tablename__ = "quiz_sessions"
+
+    id = Column(String(32), primary_key=True)
+    topic = Column(String(255), nullable=True)
+    learner_id = Column(String(64), nullable=True)  # Set for adaptive sessions; answers update the learner's schedule
+    question_ids = Column(JSON, nullable=False)  # Sampled at creation, in serving order
+    answers = Column(JSON, nullable=False, default=list)  # Option chosen per answered question, null if skipped
+    marks = Column(Text, nullable=False, default="")  # Per answered question: 1 right, 0 wrong, - no answer key
+    created_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+    expires_at = Column(DateTime, nullable=False, index=True)
+    finished_at = Column(DateTime, nullable=True)
+
+    @property
+    def position(self) -> int:
+        """Index of the next question to answer; questions are answered in order."""
+        return len(self.answers or [])
+
+    @property
+    def total(self) -> int:
+        return len(self.question_ids)
+
+    @property
+    def finished(self) -> bool:
+        return self.position >= self.total
+
+    @property
+    def score(self) -> int:
+        return (self.marks or "").count("1")
+
+
+class QuestionAttempt(Base):
+    """One answer to one question, appended in bulk by ``attempts.AttemptBuffer``.
+
+    Append-only: rows are never updated. There is no foreign key to
+    ``questions``, so the history outlives deleted questions.
+    """
+
+    __tablename__ = "question_attempts"
+    __table_args__ = (Index("ix_question_attempts_question_answered", "question_id", "answered_at"),)
+
+    # BIGINT on servers; SQLite only auto-increments an INTEGER primary key.
+    id = Column(BigInteger().with_variant(Integer, "sqlite"), primary_key=True)
+    question_id = Column(Integer, nullable=False)
+    session_id = Column(String(32), nullable=True)  # quiz_sessions.id, when answered in a session
+    answer = Column(SmallInteger, nullable=True)  # Option chosen; null when skipped
+    is_correct = Column(Boolean, nullable=True)  # Null when the question had no answer key
+    source = Column(String(16), nullable=False)  # "session" or "feedback"
+    answered_at = Column(DateTime, nullable=False, index=True)
+
+
+class QuestionStats(Base):
+    """Answer counters for one question, kept up to date as attempts are flushed (see ``question_stats``)."""
+
+    __tablename__ = "question_stats"
+
+    question_id = Column(Integer, primary_key=True)
+    source_file = Column(String(255), nullable=True, index=True)
+    attempts = Column(Integer, nullable=False, default=0)
+    graded = Column(Integer, nullable=False, default=0)  # Attempts made while the question had an answer key
+    correct = Column(Integer, nullable=False, default=0)
+    skipped = Column(Integer, nullable=False, default=0)
+    # How often each option (A-E) was chosen.
+    option_0 = Column(Integer, nullable=False, default=0)
+    option_1 = Column(Integer, nullable=False, default=0)
+    option_2 = Column(Integer, nullable=False, default=0)
+    option_3 = Column(Integer, nullable=False, default=0)
+    option_4 = Column(Integer, nullable=False, default=0)
+    last_answered_at = Column(DateTime, nullable=True)
+
+
+class SourceFileStats(Base):
+    """Answer counters summed over the questions of one source file."""
+
+    __tablename__ = "source_file_stats"
+
+    source_file = Column(String(255), primary_key=True)
+    attempts = Column(Integer, nullable=False, default=0)
+    graded = Column(Integer, nullable=False, default=0)
+    correct = Column(Integer, nullable=False, default=0)
+    skipped = Column(Integer, nullable=False, default=0)
+    last_answered_at = Column(DateTime, nullable=True)
+
+
+class ReviewCard(Base):
+    """When one learner should next see one question (SM-2, see ``review_schedule``).
+
+    Rows exist only for questions the learner has answered. The primary key
+    finds a card on answer; ``ix_review_schedule_learner_due`` serves a
+    learner's cards in due order without reading anyone else's.
+    """
+
+    __tablename__ = "review_schedule"
+    __table_args__ = (Index("ix_review_schedule_learner_due", "learner_id", "due_at", "question_id"),)
+
+    learner_id = Column(String(64), primary_key=True)
+    question_id = Column(Integer, primary_key=True)
+    ease = Column(Float, nullable=False, default=2.5)  # SM-2 easiness factor, at least 1.3
+    interval_days = Column(Float, nullable=False, default=0.0)
+    repetitions = Column(Integer, nullable=False, default=0)  # Passed reviews in a row
+    lapses = Column(Integer, nullable=False, default=0)
+    due_at = Column(DateTime, nullable=False)
+    last_reviewed_at = Column(DateTime, nullable=False)
@@ -0,0 +1,306 @@
+"""Bank-wide near-duplicate detection for questions.
+
+Each question is turned into a set of character 4-gram shingles. The stem and
+each option are shingled separately, after the text is normalized:
+
+* lowercased, with spaces and punctuation dropped;
+* common OCR misreads ("rn" for "m", "1" for "l") folded.
+
+So "S.I. unit" matches "SI unit", and reordered options make no difference.
+
+A MinHash signature of ``BANDS`` x ``ROWS`` values is cut into bands. Each band
+is hashed into a bucket and stored in the indexed ``question_lsh_buckets``
+table. A near-duplicate almost certainly shares a bucket with the original
+(more than 99.9% at Jaccard 0.9), so finding candidates for a new question is
+an index lookup, not a scan of the bank.
+
+A candidate counts as a duplicate only when:
+
+* the exact shingle Jaccard similarity is at least ``DUPLICATE_SIMILARITY``;
+* the numbers and negations ("not", "except", ...) in the stem and options
+  are identical.
+
+"A force of 10 N" and "a force of 20 N" are different questions.
+
+Ingest (``main._save_questions``) checks every batch of new questions against the
+bank and against each other. By default (``DUPLICATE_POLICY=flag``) duplicates
+are stored marked with ``duplicate_of``; ``skip`` drops them. Rows that predate
+the index are fingerprinted, and their clusters recorded, with::
+
+    python near_duplicates.py            # index questions that have no fingerprint yet
+    python near_duplicates.py --rebuild  # drop and rebuild the whole index
+"""
+
+import hashlib
+import logging
+import os
+import random
+import re
+from collections import defaultdict
+from typing import Dict, FrozenSet, Iterable, List, NamedTuple, Optional, Sequence, Tuple
+
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+
+from models import Question, QuestionFingerprint, QuestionLshBucket
+
+logger = logging.getLogger(__name__)
+
+SHINGLE_SIZE = 4
+BANDS = 16
+ROWS = 6
+DUPLICATE_SIMILARITY = float(os.getenv("DUPLICATE_SIMILARITY", "0.9"))
+# "flag" stores near-duplicates marked with duplicate_of; "skip" (opt-in) drops them.
+DUPLICATE_POLICY = os.getenv("DUPLICATE_POLICY", "flag").lower()
+REBUILD_CHUNK = 500
+
+_NON_WORD = re.compile(r"[^a-z0-9]+")
+_NUMBER = re.compile(r"\d+(?:\.\d+)?")
+_QUESTION_NUMBER = re.compile(r"^\s*(?:q(?:uestion)?\s*)?\(?\d+\s*[.):]\s*", re.IGNORECASE)
+# Common OCR misreads inside words; applied to both sides, so real words that contain them still match.
+_OCR_CONFUSIONS = (("rn", "m"), ("|", "l"), ("0", "o"), ("1", "l"))
+# "Which of these is NOT ..." is a different question from "Which of these is ...".
+_NEGATIONS = frozenset({"not", "no", "never", "except", "incorrect", "false", "cannot"})
+# Fixed seed: buckets must stay comparable across processes and restarts.
+_rng = random.Random(0x51A4)
+# One random XOR mask per MinHash function over a 64-bit shingle hash, so each min() runs in C via map().
+_MASKS = [_rng.getrandbits(64) for _ in range(BANDS * ROWS)]
+
+
+class Fingerprint(NamedTuple):
+    shingles: FrozenSet[str]
+    # Numbers and negations: near-identical text that differs in these is a different question.
+    markers: Tuple[str, ...]
+    buckets: Tuple[int, ...]  # one per band
+
+
+class Match(NamedTuple):
+    """A new question's duplicate: a bank row, or an earlier question of the same batch."""
+
+    question_id: Optional[int] = None
+    batch_index: Optional[int] = None
+
+
+def _hash64(value: str) -> int:
+    return int.from_bytes(hashlib.blake2b(value.encode(), digest_size=8).digest(), "big")
+
+
+def _numbers(text: str) -> List[str]:
+    # Digits inside words ("fo11owing", "m/s2") are OCR noise or units, not quantities.
+    tokens = [token for token in text.split() if not any(char.isalpha() for char in token)]
+    return [number for token in tokens for number in _NUMBER.findall(token)]
+
+
+def _words(text: str) -> List[str]:
+    words = []
+    for token in text.lower().split():
+        if any(char.isalpha() for char in token):
+            for wrong, right in _OCR_CONFUSIONS:
+                token = token.replace(wrong, right)
+        token = _NON_WORD.sub("", token)
+        if token:
+            words.append(token)
+    return words
+
+
+def _shingle(words: List[str], prefix: str) -> List[str]:
+    compact = "".join(words)
+    if len(compact) <= SHINGLE_SIZE:
+        return [prefix + compact] if compact else []
+    return [prefix + compact[i:i + SHINGLE_SIZE] for i in range(len(compact) - SHINGLE_SIZE + 1)]
+
+
+def _buckets(shingles: FrozenSet[str]) -> Tuple[int, ...]:
+    hashes = [_hash64(shingle) for shingle in shingles] or [0]
+    signature = [min(map(mask.__xor__, hashes)) for mask in _MASKS]
+    buckets = []
+    for band in range(BANDS):
+        rows = signature[band * ROWS:(band + 1) * ROWS]
+        value = _hash64(f"{band}:" + ",".join(map(str, rows)))
+        # Stored in a signed 64-bit column.
+        buckets.append(value - (1 << 64) if value >= 1 << 63 else value)
+    return tuple(buckets)
+
+
+def fingerprint(question: str, options: Sequence[str], buckets: bool = True) -> Fingerprint:
+    """Shingles, markers and LSH buckets of a question; ``buckets=False`` skips the MinHash (comparison only)."""
+    texts = [_QUESTION_NUMBER.sub("", question or "", count=1)] + [str(option) for option in options or []]
+    words = [_words(text) for text in texts]
+    shingles = frozenset(_shingle(words[0], "q") + [s for option in words[1:] for s in _shingle(option, "o")])
+    markers = [number for text in texts for number in _numbers(text)]
+    markers += [word for text_words in words for word in text_words if word in _NEGATIONS]
+    return Fingerprint(shingles, tuple(sorted(markers)), _buckets(shingles) if buckets else ())
+
+
+def similarity(a: Fingerprint, b: Fingerprint) -> float:
+    union = len(a.shingles | b.shingles)
+    return len(a.shingles & b.shingles) / union if union else 1.0
+
+
+def is_near_duplicate(a: Fingerprint, b: Fingerprint) -> bool:
+    return a.markers == b.markers and similarity(a, b) >= DUPLICATE_SIMILARITY
+
+
+def find_matches(db: Session, fps: List[Fingerprint]) -> List[Optional[Match]]:
+    """For each fingerprint, the bank row or earlier batch entry it duplicates (None if it is new)."""
+    by_bucket: Dict[int, List[int]] = defaultdict(list)
+    wanted = sorted({bucket for fp in fps for bucket in fp.buckets})
+    if wanted:
+        for question_id, bucket in (
+            db.query(QuestionLshBucket.question_id, QuestionLshBucket.bucket)
+            .filter(QuestionLshBucket.bucket.in_(wanted))
+            .all()
+        ):
+            by_bucket[bucket].append(question_id)
+    candidate_ids = sorted({question_id for ids in by_bucket.values() for question_id in ids})
+    bank: Dict[int, Tuple[Fingerprint, Optional[int]]] = {}
+    if candidate_ids:
+        # Only rows sharing a bucket with the batch are loaded and compared in full.
+        for question_id, text, options, duplicate_of in (
+            db.query(Question.id, Question.question, Question.options, QuestionFingerprint.duplicate_of)
+            .outerjoin(QuestionFingerprint, QuestionFingerprint.question_id == Question.id)
+            .filter(Question.id.in_(candidate_ids))
+            .all()
+        ):
+            bank[question_id] = (fingerprint(text, options, buckets=False), duplicate_of)
+
+    matches: List[Optional[Match]] = []
+    batch_buckets: Dict[int, List[int]] = defaultdict(list)
+    for index, fp in enumerate(fps):
+        match = None
+        for question_id in sorted({i for bucket in fp.buckets for i in by_bucket.get(bucket, ())}):
+            if question_id in bank and is_near_duplicate(fp, bank[question_id][0]):
+                match = Match(question_id=bank[question_id][1] or question_id)
+                break
+        if match is None:
+            for other in sorted({i for bucket in fp.buckets for i in batch_buckets.get(bucket, ())}):
+                if is_near_duplicate(fp, fps[other]):
+                    match = matches[other] or Match(batch_index=other)
+                    break
+        matches.append(match)
+        if match is None:
+            for bucket in fp.buckets:
+                batch_buckets[bucket].append(index)
+    return matches
+
+
+def add_fingerprints(db: Session, rows: Iterable[Tuple[int, Fingerprint, Optional[int]]]) -> None:
+    """Stage ``(question_id, fingerprint, duplicate_of)`` index rows on ``db`` (the caller commits)."""
+    rows = list(rows)
+    db.bulk_insert_mappings(
+        QuestionFingerprint,
+        [{"question_id": question_id, "duplicate_of": duplicate_of} for question_id, _, duplicate_of in rows],
+    )
+    db.bulk_insert_mappings(
+        QuestionLshBucket,
+        [
+            {"question_id": question_id, "band": band, "bucket": bucket}
+            for question_id, fp, _ in rows
+            for band, bucket in enumerate(fp.buckets)
+        ],
+    )
+
+
+def resolve_duplicate_of(match: Optional[Match], batch_ids: Sequence[Optional[int]]) -> Optional[int]:
+    """The canonical question id for ``match``, given the ids assigned to the batch so far."""
+    if match is None:
+        return None
+    if match.question_id is not None:
+        return match.question_id
+    return batch_ids[match.batch_index]
+
+
+def index_missing(db: Session, chunk_size: int = REBUILD_CHUNK) -> Tuple[int, int]:
+    """Fingerprint questions that have no index row yet, in id order; returns (indexed, duplicates)."""
+    indexed = duplicates = 0
+    last_id = 0
+    while True:
+        rows = (
+            db.query(Question.id, Question.question, Question.options)
+            .outerjoin(QuestionFingerprint, QuestionFingerprint.question_id == Question.id)
+            .filter(QuestionFingerprint.question_id.is_(None), Question.id > last_id)
+            .order_by(Question.id)
+            .limit(chunk_size)
+            .all()
+        )
+        if not rows:
+            break
+        fps = [fingerprint(text, options) for _, text, options in rows]
+        ids = [question_id for question_id, _, _ in rows]
+        canonical: List[Optional[int]] = []
+        for question_id, match in zip(ids, find_matches(db, fps)):
+            duplicate_of = resolve_duplicate_of(match, [c or i for c, i in zip(canonical, ids)])
+            canonical.append(duplicate_of)
+            duplicates += duplicate_of is not None
+        add_fingerprints(db, zip(ids, fps, canonical))
+        db.commit()
+        indexed += len(rows)
+        last_id = ids[-1]
+        logger.info(f"Indexed {indexed} questions ({duplicates} near-duplicates)")
+    return indexed, duplicates
+
+
+def duplicate_clusters(db: Session, limit: int = 50, offset: int = 0) -> List[Dict]:
+    """Largest clusters first: the canonical question and the ids of its near-duplicates."""
+    groups = (
+        db.query(QuestionFingerprint.duplicate_of, func.count().label("size"))
+        .filter(QuestionFingerprint.duplicate_of.isnot(None))
+        .group_by(QuestionFingerprint.duplicate_of)
+        .order_by(func.count().desc(), QuestionFingerprint.duplicate_of)
+        .offset(offset)
+        .limit(limit)
+        .all()
+    )
+    canonical_ids = [canonical for canonical, _ in groups]
+    if not canonical_ids:
+        return []
+    members: Dict[int, List[int]] = defaultdict(list)
+    for question_id, canonical in (
+        db.query(QuestionFingerprint.question_id, QuestionFingerprint.duplicate_of)
+        .filter(QuestionFingerprint.duplicate_of.in_(canonical_ids))
+        .order_by(QuestionFingerprint.question_id)
+        .all()
+    ):
+        members[canonical].append(question_id)
+    questions = {
+        row.id: row
+        for row in db.query(Question.id, Question.question, Question.source_file)
+        .filter(Question.id.in_(canonical_ids + [i for ids in members.values() for i in ids]))
+        .all()
+    }
+    clusters = []
+    for canonical in canonical_ids:
+        ids = [canonical] + members[canonical]
+        present = [i for i in ids if i in questions]
+        if len(present) < 2:
+            continue  # rows deleted since they were indexed
+        clusters.append({
+            "canonical_id": canonical,
+            "question": questions[present[0]].question,
+            "question_ids": present,
+            "source_files": sorted({questions[i].source_file for i in present if questions[i].source_file}),
+        })
+    return clusters
+
+
+if __name__ == "__main__":
+    import argparse
+
+    from db import SessionLocal, init_db
+
+    parser = argparse.ArgumentParser(description="Build the near-duplicate index for the question bank.")
+    parser.add_argument("--rebuild", action="store_true", help="Drop every fingerprint and index the whole bank again")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO, format="%(levelname)s:%(name)s: %(message)s")
+
+    init_db()
+    session = SessionLocal()
+    try:
+        if args.rebuild:
+            session.query(QuestionLshBucket).delete(synchronize_session=False)
+            session.query(QuestionFingerprint).delete(synchronize_session=False)
+            session.commit()
+        total, dupes = index_missing(session)
+        print(f"Indexed {total} questions, {dupes} near-duplicates")
+    finally:
+        session.close()
@@ -0,0 +1,195 @@
+"""Registry of local MCQ parsers, each run on the cleaned text and scored for confidence.
+
+A parser is a function ``parse(text) -> List[Dict]`` of MCQ dicts
+(``question``, ``options``, ``correct_option`` and optionally ``question_no``).
+It is registered with :func:`register_parser`. :func:`run_parsers` runs every
+registered parser, or a named subset, on the same text. It scores each result
+with :func:`confidence` and returns the candidates best first.
+
+The score is ``quality * coverage``, between 0 and 1:
+
+* quality is the mean per-question score. Each question loses points for fewer
+  than 2 or more than 5 options, very short or very long stems, options that
+  swallowed the next question, repeated options, and (on numbered papers) a
+  missing question number;
+* coverage compares the question count with the number of numbered blocks in
+  the text that carry at least two lettered options. Finding too many questions
+  costs as much as finding too few.
+
+A parser written for the detected paper type gets a small bonus and wins
+ties. The extractor asks Groq to structure the text only when the best
+candidate is below ``PARSER_CONFIDENCE_THRESHOLD``.
+
+The candidates run concurrently on a shared pool of ``PARSER_WORKERS``
+threads. The parsers are pure Python and hold the GIL, so the saving that
+matters is the skipped LLM round-trip, not the parse time (a few milliseconds
+per parser per paper).
+"""
+
+import contextvars
+import logging
+import os
+import re
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, FrozenSet, Iterable, List, NamedTuple, Optional
+
+from metrics import stage_timer
+
+logger = logging.getLogger(__name__)
+
+PARSER_CONFIDENCE_THRESHOLD = float(os.getenv("PARSER_CONFIDENCE_THRESHOLD", "0.6"))
+PARSER_WORKERS = int(os.getenv("PARSER_WORKERS", "4"))
+# Added to a parser's score when it is specialised for the detected paper type.
+PAPER_TYPE_BONUS = 0.05
+UNNUMBERED_PENALTY = 0.1
+
+_QUESTION_START = re.compile(r"^(?:Q(?:uestion)?\s*)?\d{1,3}[.)](?!\d)", re.IGNORECASE | re.MULTILINE)
+_OPTION_LABEL = re.compile(r"(?:^|\s)\(?([A-E])[.)](?=\s|$)", re.MULTILINE)
+# "... 12. Which ..." inside an option: the parser ran into the next question.
+_MERGED_QUESTION = re.compile(r"\s\d{1,3}\.\s+[A-Z][a-z]")
+
+Parse = Callable[[str], List[Dict]]
+
+
+class ParserSpec(NamedTuple):
+    name: str
+    parse: Parse
+    # Paper types (see extractor.detect_paper_type) this parser is written for.
+    paper_types: FrozenSet[str] = frozenset()
+    # The part of the text the parser is meant to cover (e.g. English skips the
+    # listening section); coverage is measured against it. None: all of it.
+    scope: Optional[Callable[[str], str]] = None
+
+
+class Candidate(NamedTuple):
+    name: str
+    questions: List[Dict]
+    confidence: float
+
+
+_registry: Dict[str, ParserSpec] = {}
+_executor: Optional[ThreadPoolExecutor] = None
+_executor_lock = threading.Lock()
+
+
+def register_parser(
+    name: str,
+    parse: Parse,
+    paper_types: Iterable[str] = (),
+    scope: Optional[Callable[[str], str]] = None,
+) -> ParserSpec:
+    """Add ``parse`` to the registry under ``name``, replacing any parser of that name."""
+    spec = ParserSpec(name, parse, frozenset(paper_types), scope)
+    _registry[name] = spec
+    return spec
+
+
+def registered_parsers() -> List[ParserSpec]:
+    """Registered parsers in registration order, which breaks ties between equal scores."""
+    return list(_registry.values())
+
+
+def expected_questions(text: str) -> int:
+    """Numbered blocks in ``text`` that carry at least two lettered options."""
+    starts = [match.start() for match in _QUESTION_START.finditer(text)]
+    count = 0
+    for start, end in zip(starts, starts[1:] + [len(text)]):
+        letters = {match.group(1) for match in _OPTION_LABEL.finditer(text, start, end)}
+        if len(letters) >= 2:
+            count += 1
+    return count
+
+
+def _question_quality(mcq: Dict) -> float:
+    question = (mcq.get("question") or "").strip()
+    options = [str(option).strip() for option in mcq.get("options") or []]
+    score = 1.0
+    if not 2 <= len(options) <= 5:
+        score *= 0.3
+    elif len(options) < 4:
+        score *= 0.8
+    if len(question) < 10 or len(question) > 600 or "\n" in question:
+        score *= 0.5
+    if any(not option or len(option) > 250 or _MERGED_QUESTION.search(option) for option in options):
+        score *= 0.5
+    if len(set(option.lower() for option in options)) < len(options):
+        score *= 0.7
+    return score
+
+
+def confidence(questions: List[Dict], expected: int, numbered: bool = True) -> float:
+    """Score ``questions`` between 0 and 1 against ``expected`` questions (see the module docstring).
+
+    On a ``numbered`` paper, questions without their printed ``question_no``
+    count for less: answer keys are matched by number.
+    """
+    if not questions:
+        return 0.0
+    quality = sum(_question_quality(mcq) for mcq in questions) / len(questions)
+    if numbered:
+        unnumbered = sum(1 for mcq in questions if mcq.get("question_no") is None)
+        quality *= 1 - UNNUMBERED_PENALTY * unnumbered / len(questions)
+    found = len(questions)
+    expected = expected or found
+    coverage = min(found, expected) / max(found, expected)
+    return quality * coverage
+
+
+def _pool() -> ThreadPoolExecutor:
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=PARSER_WORKERS, thread_name_prefix="parser")
+        return _executor
+
+
+def _parse(spec: ParserSpec, text: str) -> List[Dict]:
+    try:
+        with stage_timer(f"parser_{spec.name}"):
+            return spec.parse(text) or []
+    except Exception as e:
+        logger.warning(f"Parser {spec.name} failed: {str(e)}")
+        return []
+
+
+def run_parsers(text: str, paper_type: Optional[str] = None, names: Optional[Iterable[str]] = None) -> List[Candidate]:
+    """Run the registered parsers (or just ``names``) on ``text``; candidates best first."""
+    specs = registered_parsers() if names is None else [_registry[name] for name in names]
+    if PARSER_WORKERS > 1 and len(specs) > 1:
+        # Each task gets a copy of the caller's context so its stage span nests under the current trace.
+        futures = [
+            _pool().submit(contextvars.copy_context().run, _parse, spec, text) for spec in specs
+        ]
+        results = [future.result() for future in futures]
+    else:
+        results = [_parse(spec, text) for spec in specs]
+
+    # Text without numbered questions is measured against the most any parser found.
+    most_found = max((len(questions) for questions in results), default=0)
+    expected: Dict[Optional[Callable], int] = {}
+    ranked = []
+    for spec, questions in zip(specs, results):
+        if spec.scope not in expected:
+            expected[spec.scope] = expected_questions(spec.scope(text) if spec.scope else text)
+        score = confidence(questions, expected[spec.scope] or most_found, numbered=expected[spec.scope] > 0)
+        preferred = bool(questions) and paper_type in spec.paper_types
+        if preferred:
+            score = min(1.0, score + PAPER_TYPE_BONUS)
+        ranked.append(((round(score, 3), preferred, len(questions)), Candidate(spec.name, questions, round(score, 3))))
+    # Stable: candidates that tie on everything keep registration order.
+    ranked.sort(key=lambda entry: entry[0], reverse=True)
+    candidates = [candidate for _, candidate in ranked]
+    logger.debug(
+        "Parser scores: "
+        + ", ".join(f"{c.name}={c.confidence:.2f} ({len(c.questions)}q)" for c in candidates)
+    )
+    return candidates
+
+
+def shutdown_parsers() -> None:
+    global _executor
+    with _executor_lock:
+        executor, _executor = _executor, None
+    if executor is not None:
+        executor.shutdown(wait=False)
@@ -0,0 +1,397 @@
+"""Page geometry for uploaded PDFs: reading order, question positions and which images belong to them.
+
+:class:`PageReader` turns a page's ``get_text("dict")`` spans into text lines in
+reading order, and that text is what the parsers see.
+
+* Spans are grouped into cells, then into visual rows, so an option label and
+  its text are one line even when the PDF stores them as separate blocks.
+* A column gutter is detected, and each column is read top to bottom before
+  the next.
+* Option labels ("(a)", "b)", a bare "C" in a table row) are recognized by
+  their position at the start of a row, and rewritten as "A. ..." lines.
+* Rotated watermarks, page numbers and running headers/footers are dropped.
+
+The text parsers know nothing about pages. After parsing, :func:`locate_questions`
+finds each question's opening words in the same lines and records its
+``page_no`` (1-based) and ``bbox``. :func:`assign_images` then attaches every
+embedded image to the question whose region it falls in on the same page.
+"""
+
+import logging
+import re
+from typing import Dict, List, NamedTuple, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+BBox = Tuple[float, float, float, float]
+
+# Images smaller than this (in PDF points) are bullets, rules or logos.
+MIN_IMAGE_SIDE = 24
+# An xref placed on this many pages is a header/footer decoration.
+REPEATED_IMAGE_PAGES = 3
+# Leading characters of the normalized question text used to find it on the page.
+ANCHOR_LENGTH = 40
+# Spans further apart than this (in points) on one line are separate cells, e.g. an option grid.
+CELL_GAP = 12.0
+# Cells whose vertical centres are closer than this fraction of their height share a row.
+ROW_TOLERANCE = 0.5
+# A column gutter is an empty vertical strip at least this wide in the middle half of the text area.
+MIN_GUTTER = 14.0
+# Cells wider than this fraction of the text area can't sit in one of two columns.
+COLUMN_MAX_WIDTH = 0.55
+# More cells than this crossing the gutter means it is just a gap in an option grid.
+MAX_SPANNING_SHARE = 0.2
+# Top and bottom bands of the page where running headers and footers live.
+MARGIN_FRACTION = 0.08
+
+QUESTION, OPTION, TEXT = "question", "option", "text"
+OPTION_LETTERS = "ABCDE"
+
+_NON_WORD = re.compile(r"[^0-9a-z]+")
+_QUESTION_START = re.compile(r"^(?:Q(?:uestion)?\s*)?\d{1,3}\s*[.)]", re.IGNORECASE)
+# A cell holding only a label: "A", "A.", "(A)", "(a)", "a)".
+_LABEL_ONLY = re.compile(r"^(?:\(?([A-E])[.):]?|\(([a-e])\)|([a-e])\))$")
+# A label opening a cell: "A. text", "A) text", "(a) text", "a) text".
+_LABEL_PREFIX = re.compile(r"^(?:([A-E])[.):]|\(([A-Ea-e])\)|([a-e])\))\s+(\S.*)$")
+_PAGE_NUMBER = re.compile(r"^(?:page\s*)?\d+(?:\s*(?:of|/)\s*\d+)?$", re.IGNORECASE)
+
+
+class TextBlock(NamedTuple):
+    page: int  # 0-based
+    bbox: BBox
+    text: str  # normalized
+
+
+class Cell(NamedTuple):
+    bbox: BBox
+    text: str
+
+
+class LayoutLine(NamedTuple):
+    bbox: BBox
+    text: str
+    kind: str  # QUESTION, OPTION or TEXT
+    column: int  # 0: full width or single column, 1: left, 2: right
+
+
+class PageImage(NamedTuple):
+    page: int  # 0-based
+    bbox: BBox
+    xref: int
+
+
+class PdfLayout(NamedTuple):
+    blocks: List[TextBlock]
+    images: List[PageImage]
+
+
+def normalize(text: str) -> str:
+    """Lowercase alphanumerics only, so PDF spacing and punctuation quirks don't matter."""
+    return _NON_WORD.sub("", (text or "").lower())
+
+
+def page_cells(page) -> List[Cell]:
+    """Horizontal text of ``page`` as cells: runs of spans on one line without a wide gap."""
+    import fitz
+
+    cells: List[Cell] = []
+    for block in page.get_text("dict", flags=fitz.TEXTFLAGS_TEXT).get("blocks", []):
+        for line in block.get("lines", []):
+            if abs(line.get("dir", (1, 0))[1]) > 0.01:
+                continue  # rotated: watermarks, margin notes
+            current: List[dict] = []
+            for span in line.get("spans", []):
+                if current and span["bbox"][0] - current[-1]["bbox"][2] > CELL_GAP:
+                    cells.extend(_cell(current))
+                    current = []
+                current.append(span)
+            cells.extend(_cell(current))
+    return cells
+
+
+def _cell(spans: List[dict]) -> List[Cell]:
+    text = " ".join("".join(span.get("text", "") for span in spans).split())
+    if not text:
+        return []
+    boxes = [span["bbox"] for span in spans]
+    bbox = (min(b[0] for b in boxes), min(b[1] for b in boxes), max(b[2] for b in boxes), max(b[3] for b in boxes))
+    return [Cell(bbox, text)]
+
+
+def find_gutter(cells: List[Cell]) -> Optional[float]:
+    """x of the gap between two text columns, or None for a single-column page."""
+    if len(cells) < 6:
+        return None
+    left = min(cell.bbox[0] for cell in cells)
+    right = max(cell.bbox[2] for cell in cells)
+    width = right - left
+    narrow = sorted(
+        (cell.bbox[0], cell.bbox[2]) for cell in cells if cell.bbox[2] - cell.bbox[0] < COLUMN_MAX_WIDTH * width
+    )
+
+    best: Optional[Tuple[float, float]] = None
+    end: Optional[float] = None
+    for x0, x1 in narrow:
+        if end is not None and x0 - end >= MIN_GUTTER:
+            middle = (end + x0) / 2
+            if left + width / 4 <= middle <= right - width / 4 and (best is None or x0 - end > best[1] - best[0]):
+                best = (end, x0)
+        end = x1 if end is None else max(end, x1)
+    if best is None:
+        return None
+
+    gutter = (best[0] + best[1]) / 2
+    spanning = [cell for cell in cells if cell.bbox[0] < gutter < cell.bbox[2]]
+    if len(spanning) > MAX_SPANNING_SHARE * len(cells):
+        return None
+    # Both columns must hold questions; otherwise the gap is inside a table or option grid.
+    sides = {cell.bbox[2] <= gutter for cell in cells if _QUESTION_START.match(cell.text) and cell not in spanning}
+    return gutter if sides == {True, False} else None
+
+
+def _rows(cells: List[Cell]) -> List[List[Cell]]:
+    rows: List[Tuple[float, float, List[Cell]]] = []
+    for cell in sorted(cells, key=lambda c: (c.bbox[1] + c.bbox[3]) / 2):
+        center = (cell.bbox[1] + cell.bbox[3]) / 2
+        height = cell.bbox[3] - cell.bbox[1]
+        if rows and abs(center - rows[-1][0]) <= ROW_TOLERANCE * min(height, rows[-1][1]):
+            rows[-1][2].append(cell)
+        else:
+            rows.append((center, height, [cell]))
+    return [sorted(row, key=lambda c: c.bbox[0]) for _, _, row in rows]
+
+
+def reading_order(cells: List[Cell], gutter: Optional[float]) -> List[Tuple[int, List[Cell]]]:
+    """``(column, row)`` pairs: full-width rows in place, each column section read top to bottom."""
+    if gutter is None:
+        return [(0, row) for row in _rows(cells)]
+
+    ordered: List[Tuple[int, List[Cell]]] = []
+    columns: Dict[int, List[Cell]] = {1: [], 2: []}
+    spanning: List[Cell] = []
+
+    def flush_columns() -> None:
+        for column in (1, 2):
+            ordered.extend((column, row) for row in _rows(columns[column]))
+            columns[column] = []
+
+    for cell in sorted(cells, key=lambda c: (c.bbox[1], c.bbox[0])):
+        if cell.bbox[0] < gutter < cell.bbox[2]:
+            flush_columns()
+            spanning.append(cell)
+            continue
+        if spanning:
+            ordered.extend((0, row) for row in _rows(spanning))
+            spanning = []
+        columns[1 if cell.bbox[2] <= gutter else 2].append(cell)
+    ordered.extend((0, row) for row in _rows(spanning))
+    flush_columns()
+    return ordered
+
+
+def _union(boxes: List[BBox]) -> BBox:
+    return (min(b[0] for b in boxes), min(b[1] for b in boxes), max(b[2] for b in boxes), max(b[3] for b in boxes))
+
+
+class PageReader:
+    """Reads pages in order, keeping what spans pages: running headers seen and the next option letter."""
+
+    def __init__(self) -> None:
+        self._margin_texts: set = set()
+        self._next_letter: Optional[str] = None
+
+    def lines(self, page) -> List[LayoutLine]:
+        cells = self._drop_running_text(page, page_cells(page))
+        gutter = find_gutter(cells)
+        lines: List[LayoutLine] = []
+        for column, row in reading_order(cells, gutter):
+            lines.extend(self._tag(row, column))
+        return lines
+
+    def text(self, page) -> str:
+        return "\n".join(line.text for line in self.lines(page))
+
+    def _drop_running_text(self, page, cells: List[Cell]) -> List[Cell]:
+        height = page.rect.height
+        top, bottom = height * MARGIN_FRACTION, height * (1 - MARGIN_FRACTION)
+        kept, seen = [], set()
+        for cell in cells:
+            in_margin = cell.bbox[3] <= top or cell.bbox[1] >= bottom
+            # A question or option printed high on the page is content, even if its wording repeats.
+            if in_margin and not (_QUESTION_START.match(cell.text) or _LABEL_PREFIX.match(cell.text)):
+                if _PAGE_NUMBER.match(cell.text):
+                    continue
+                key = re.sub(r"\d+", "#", normalize(cell.text))
+                seen.add(key)
+                if key in self._margin_texts:
+                    continue
+            kept.append(cell)
+        self._margin_texts |= seen
+        return kept
+
+    def _label(self, text: str) -> Tuple[Optional[str], str]:
+        """``(letter, rest)`` when ``text`` opens with the option label expected next."""
+        match = _LABEL_ONLY.match(text)
+        if match:
+            letter, rest = next(group for group in match.groups() if group), ""
+        else:
+            match = _LABEL_PREFIX.match(text)
+            if not match:
+                return None, text
+            letter, rest = next(group for group in match.groups()[:3] if group), match.group(4)
+        letter = letter.upper()
+        if letter != "A" and letter != self._next_letter:
+            return None, text
+        index = OPTION_LETTERS.index(letter)
+        self._next_letter = OPTION_LETTERS[index + 1] if index + 1 < len(OPTION_LETTERS) else None
+        return letter, rest
+
+    def _tag(self, row: List[Cell], column: int) -> List[LayoutLine]:
+        if _QUESTION_START.match(row[0].text):
+            self._next_letter = "A"
+            return [LayoutLine(_union([c.bbox for c in row]), " ".join(c.text for c in row), QUESTION, column)]
+
+        lines: List[LayoutLine] = []
+        pending: List[Cell] = []  # text before the first label
+        option: Optional[Tuple[str, List[Cell], List[str]]] = None
+
+        def plain(cells: List[Cell]) -> LayoutLine:
+            return LayoutLine(_union([c.bbox for c in cells]), " ".join(c.text for c in cells), TEXT, column)
+
+        def close_option() -> None:
+            letter, option_cells, parts = option
+            if not parts:  # a label with no text beside it (picture options): leave it as printed
+                lines.append(plain(option_cells))
+            else:
+                bbox = _union([c.bbox for c in option_cells])
+                lines.append(LayoutLine(bbox, f"{letter}. " + " ".join(parts), OPTION, column))
+
+        for cell in row:
+            letter, rest = self._label(cell.text)
+            if letter:
+                if option:
+                    close_option()
+                elif pending:
+                    lines.append(plain(pending))
+                    pending = []
+                option = (letter, [cell], [rest] if rest else [])
+            elif option:
+                option[1].append(cell)
+                option[2].append(cell.text)
+            else:
+                pending.append(cell)
+        if option:
+            close_option()
+        if pending:
+            lines.append(plain(pending))
+        return lines
+
+
+def read_layout(doc) -> PdfLayout:
+    """Collect text lines in reading order and placed images (with their rectangles) from an open fitz document."""
+    blocks: List[TextBlock] = []
+    images: List[PageImage] = []
+    xref_pages: Dict[int, set] = {}
+    reader = PageReader()
+
+    for page_index in range(len(doc)):
+        page = doc[page_index]
+        for line in reader.lines(page):
+            normalized = normalize(line.text)
+            if normalized:
+                blocks.append(TextBlock(page_index, line.bbox, normalized))
+
+        for info in page.get_image_info(xrefs=True):
+            xref = info.get("xref") or 0
+            x0, y0, x1, y1 = info["bbox"]
+            if xref <= 0 or min(x1 - x0, y1 - y0) < MIN_IMAGE_SIDE:
+                continue
+            xref_pages.setdefault(xref, set()).add(page_index)
+            images.append(PageImage(page_index, (x0, y0, x1, y1), xref))
+
+    images = [img for img in images if len(xref_pages[img.xref]) < REPEATED_IMAGE_PAGES]
+    return PdfLayout(blocks, images)
+
+
+def locate_questions(mcqs: List[Dict], blocks: List[TextBlock]) -> int:
+    """Set ``page_no`` and ``bbox`` on each question found in ``blocks``; returns how many were found.
+
+    Questions are searched for in document order, starting after the previous
+    match, so repeated phrasings resolve to the right occurrence.
+    """
+    doc_text = "".join(block.text for block in blocks)
+    starts = []
+    offset = 0
+    for block in blocks:
+        starts.append(offset)
+        offset += len(block.text)
+
+    located = 0
+    cursor = 0
+    for mcq in mcqs:
+        anchor = normalize(mcq.get("question", ""))[:ANCHOR_LENGTH]
+        if not anchor:
+            continue
+        position = doc_text.find(anchor, cursor)
+        if position < 0:
+            position = doc_text.find(anchor)
+        if position < 0:
+            continue
+        block = blocks[_block_at(starts, position)]
+        mcq["page_no"] = block.page + 1
+        mcq["bbox"] = list(block.bbox)
+        cursor = position + len(anchor)
+        located += 1
+    return located
+
+
+def _block_at(starts: List[int], position: int) -> int:
+    lo, hi = 0, len(starts) - 1
+    while lo < hi:
+        mid = (lo + hi + 1) // 2
+        if starts[mid] <= position:
+            lo = mid
+        else:
+            hi = mid - 1
+    return lo
+
+
+def _overlaps_horizontally(a: BBox, b: BBox) -> bool:
+    return a[0] < b[2] and b[0] < a[2]
+
+
+def _owner_on_page(image: PageImage, candidates: List[Tuple[int, BBox]]) -> Optional[int]:
+    """Pick the question that starts closest above the image, preferring the same column."""
+    top = image.bbox[1]
+    above = [(index, bbox) for index, bbox in candidates if bbox[1] <= top + 1]
+    same_column = [item for item in above if _overlaps_horizontally(item[1], image.bbox)]
+    pool = same_column or above
+    if not pool:
+        return None
+    return max(pool, key=lambda item: item[1][1])[0]
+
+
+def assign_images(mcqs: List[Dict], images: List[PageImage]) -> Dict[int, List[PageImage]]:
+    """Map question index -> images in reading order.
+
+    An image belongs to the nearest question starting above it on the same page. An
+    image at the top of a page, before any question, continues the last question
+    of an earlier page. Images that can't be placed are dropped.
+    """
+    by_page: Dict[int, List[Tuple[int, BBox]]] = {}
+    for index, mcq in enumerate(mcqs):
+        if mcq.get("page_no") and mcq.get("bbox"):
+            by_page.setdefault(mcq["page_no"] - 1, []).append((index, tuple(mcq["bbox"])))
+
+    assigned: Dict[int, List[PageImage]] = {}
+    for image in sorted(images, key=lambda img: (img.page, img.bbox[1], img.bbox[0])):
+        owner = _owner_on_page(image, by_page.get(image.page, []))
+        if owner is None:
+            earlier = [page for page in by_page if page < image.page]
+            if earlier:
+                owner = max(index for index, _ in by_page[max(earlier)])
+        if owner is None:
+            logger.debug(f"Dropping image xref {image.xref} on page {image.page + 1}: no question nearby")
+            continue
+        assigned.setdefault(owner, []).append(image)
+    return assigned
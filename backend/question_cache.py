@@ -0,0 +1,333 @@
+"""Read-through cache for serialized questions and quiz pools.
+
+Entries hold the serialized ``QuestionDTO`` payload (plus ``updated_at`` for
+ETags), so cache hits skip both the database and ORM serialization.
+
+The default backend is a size-bounded in-process LRU. Writes invalidate the
+questions and pools they touch. Each process also watches the bank-wide
+version counter (see ``http_cache``) at most every
+``QUESTION_CACHE_VERSION_CHECK_SECONDS``. It drops all its entries only when
+the counter moved by more than this process's own committed writes, i.e. when
+another worker changed the bank. Set ``QUESTION_CACHE_URL=redis://...`` to share one
+cache between instances instead (requires the ``redis`` package). Its entry
+count is the database's key count, so give the cache a database of its own.
+"""
+
+import json
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime
+from typing import Any, Callable, Dict, Iterable, List, Optional
+
+logger = logging.getLogger(__name__)
+
+MAX_ENTRIES = int(os.getenv("QUESTION_CACHE_MAX_ENTRIES", "5000"))
+MAX_BYTES = int(os.getenv("QUESTION_CACHE_MAX_MB", "64")) * 1024 * 1024
+TTL_SECONDS = float(os.getenv("QUESTION_CACHE_TTL_SECONDS", "0"))  # 0 = no expiry
+VERSION_CHECK_SECONDS = float(os.getenv("QUESTION_CACHE_VERSION_CHECK_SECONDS", "1"))
+CACHE_URL = os.getenv("QUESTION_CACHE_URL", "")
+ENABLED = os.getenv("QUESTION_CACHE", "1").lower() not in ("0", "false", "no")
+# Topic pools kept per process; arbitrary topics must not push questions out of the LRU.
+MAX_TOPIC_POOLS = int(os.getenv("QUESTION_CACHE_MAX_TOPIC_POOLS", "64"))
+
+
+def _estimate_size(value: Any) -> int:
+    if isinstance(value, str):
+        return len(value)
+    if isinstance(value, dict):
+        return sum(len(k) + _estimate_size(v) for k, v in value.items())
+    if isinstance(value, (list, tuple)):
+        return sum(_estimate_size(v) for v in value) + 8 * len(value)
+    return 16
+
+
+class LRUCacheBackend:
+    """Thread-safe in-process LRU bounded by entry count and approximate bytes."""
+
+    shared = False
+
+    def __init__(self, max_entries: int = MAX_ENTRIES, max_bytes: int = MAX_BYTES, ttl: float = TTL_SECONDS):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.evictions = 0
+        self._data: "OrderedDict[str, tuple[Any, int, float]]" = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[Any]:
+        with self._lock:
+            item = self._data.get(key)
+            if item is None:
+                return None
+            value, size, expires = item
+            if expires and expires < time.monotonic():
+                self._remove(key)
+                return None
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key: str, value: Any) -> None:
+        size = _estimate_size(value)
+        if size > self.max_bytes:
+            return
+        expires = time.monotonic() + self.ttl if self.ttl else 0.0
+        with self._lock:
+            if key in self._data:
+                self._remove(key)
+            self._data[key] = (value, size, expires)
+            self._bytes += size
+            while len(self._data) > self.max_entries or self._bytes > self.max_bytes:
+                oldest = next(iter(self._data))
+                self._remove(oldest)
+                self.evictions += 1
+
+    def delete(self, key: str) -> None:
+        with self._lock:
+            if key in self._data:
+                self._remove(key)
+
+    def delete_prefix(self, prefix: str) -> None:
+        with self._lock:
+            for key in [k for k in self._data if k.startswith(prefix)]:
+                self._remove(key)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+            self._bytes = 0
+
+    def size(self) -> Dict[str, int]:
+        with self._lock:
+            return {"entries": len(self._data), "bytes": self._bytes, "evictions": self.evictions}
+
+    def _remove(self, key: str) -> None:
+        _, size, _ = self._data.pop(key)
+        self._bytes -= size
+
+
+class RedisCacheBackend:
+    """Shared backend for multi-instance deployments; values are stored as JSON."""
+
+    shared = True
+
+    def __init__(self, url: str, prefix: str = "quiz:", ttl: float = TTL_SECONDS):
+        import redis
+
+        self._client = redis.Redis.from_url(url)
+        self._prefix = prefix
+        self._ttl = int(ttl) or None
+
+    def get(self, key: str) -> Optional[Any]:
+        raw = self._client.get(self._prefix + key)
+        return json.loads(raw) if raw is not None else None
+
+    def set(self, key: str, value: Any) -> None:
+        self._client.set(self._prefix + key, json.dumps(value), ex=self._ttl)
+
+    def delete(self, key: str) -> None:
+        self._client.delete(self._prefix + key)
+
+    def delete_prefix(self, prefix: str) -> None:
+        keys = list(self._client.scan_iter(match=f"{self._prefix}{prefix}*"))
+        if keys:
+            self._client.delete(*keys)
+
+    def clear(self) -> None:
+        self.delete_prefix("")
+
+    def size(self) -> Dict[str, int]:
+        # DBSIZE is O(1), unlike walking the keys; give the cache its own database (redis://host/N).
+        return {"entries": self._client.dbsize()}
+
+
+def _question_key(question_id: int) -> str:
+    return f"q:{question_id}"
+
+
+def normalize_topic(topic: Optional[str]) -> Optional[str]:
+    """Lower-cased with runs of whitespace collapsed, so spellings of one topic share a pool; None if blank."""
+    topic = " ".join((topic or "").split()).lower()
+    return topic or None
+
+
+def _pool_key(topic: Optional[str]) -> str:
+    return f"pool:{topic or ''}"
+
+
+class QuestionCache:
+    """Read-through cache in front of the questions table."""
+
+    def __init__(self, backend=None, version_check_seconds: float = VERSION_CHECK_SECONDS):
+        self.backend = backend if backend is not None else LRUCacheBackend()
+        self.version_check_seconds = version_check_seconds
+        self.hits = 0
+        self.misses = 0
+        self._seen_version: Optional[int] = None
+        self._next_version_check = 0.0
+        self._local_bumps = 0
+        self._topic_pools: "OrderedDict[str, None]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    # -- coherence -------------------------------------------------------
+
+    def note_local_bumps(self, count: int) -> None:
+        """Count version bumps this process committed; its writes invalidate their own entries."""
+        with self._lock:
+            self._local_bumps += count
+
+    def sync_version(self, read_version: Callable[[], int]) -> None:
+        """Drop local entries if another process changed the bank since the last check."""
+        if self.backend.shared:
+            return
+        now = time.monotonic()
+        if now < self._next_version_check:
+            return
+        with self._lock:
+            if now < self._next_version_check:
+                return
+            self._next_version_check = now + self.version_check_seconds
+        version = read_version()
+        with self._lock:
+            local, self._local_bumps = self._local_bumps, 0
+        # A local commit landing between the read and the reset makes the counts
+        # disagree; that only costs one unnecessary clear.
+        if self._seen_version is not None and version - self._seen_version != local:
+            logger.debug("Question bank version %s -> %s, clearing cache", self._seen_version, version)
+            self.backend.clear()
+        self._seen_version = version
+
+    # -- reads -----------------------------------------------------------
+
+    def _record(self, hit: bool, count: int = 1) -> None:
+        with self._lock:
+            if hit:
+                self.hits += count
+            else:
+                self.misses += count
+
+    def get_question(self, question_id: int, loader: Callable[[int], Optional[Dict[str, Any]]]) -> Optional[Dict[str, Any]]:
+        """Return ``{"payload": ..., "updated_at": ...}`` for one question, loading it on a miss."""
+        key = _question_key(question_id)
+        entry = self.backend.get(key)
+        if entry is not None:
+            self._record(True)
+            return entry
+        self._record(False)
+        entry = loader(question_id)
+        if entry is not None:
+            self.backend.set(key, entry)
+        return entry
+
+    def get_questions(
+        self,
+        question_ids: Iterable[int],
+        loader: Callable[[List[int]], Dict[int, Dict[str, Any]]],
+    ) -> List[Dict[str, Any]]:
+        """Return entries for ``question_ids`` in order, loading all misses in one call."""
+        question_ids = list(question_ids)
+        found: Dict[int, Dict[str, Any]] = {}
+        missing: List[int] = []
+        for question_id in question_ids:
+            entry = self.backend.get(_question_key(question_id))
+            if entry is None:
+                missing.append(question_id)
+            else:
+                found[question_id] = entry
+        self._record(True, len(found))
+        if missing:
+            self._record(False, len(missing))
+            for question_id, entry in loader(missing).items():
+                self.backend.set(_question_key(question_id), entry)
+                found[question_id] = entry
+        return [found[qid] for qid in question_ids if qid in found]
+
+    def get_pool(self, topic: Optional[str], loader: Callable[[Optional[str]], List[int]]) -> List[int]:
+        """Return the ids eligible for a quiz on ``topic`` (all questions when None).
+
+        ``topic`` is normalized (see :func:`normalize_topic`) before it reaches
+        ``loader``. At most ``MAX_TOPIC_POOLS`` topic pools are kept; the least
+        recently used one is dropped to make room.
+        """
+        topic = normalize_topic(topic)
+        key = _pool_key(topic)
+        ids = self.backend.get(key)
+        if ids is not None:
+            self._record(True)
+            self._touch_topic(key)
+            return ids
+        self._record(False)
+        ids = loader(topic)
+        self.backend.set(key, ids)
+        self._touch_topic(key)
+        return ids
+
+    def _touch_topic(self, key: str) -> None:
+        if key == _pool_key(None):
+            return
+        with self._lock:
+            self._topic_pools[key] = None
+            self._topic_pools.move_to_end(key)
+            evicted = []
+            while len(self._topic_pools) > MAX_TOPIC_POOLS:
+                evicted.append(self._topic_pools.popitem(last=False)[0])
+        for old_key in evicted:
+            self.backend.delete(old_key)
+
+    # -- invalidation ----------------------------------------------------
+
+    def invalidate_questions(self, question_ids: Iterable[int]) -> None:
+        for question_id in question_ids:
+            self.backend.delete(_question_key(question_id))
+
+    def invalidate_pools(self) -> None:
+        self.backend.delete_prefix("pool:")
+        with self._lock:
+            self._topic_pools.clear()
+
+    def clear(self) -> None:
+        self.backend.clear()
+        with self._lock:
+            self._topic_pools.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            hits, misses = self.hits, self.misses
+        total = hits + misses
+        return {
+            "backend": type(self.backend).__name__,
+            "hits": hits,
+            "misses": misses,
+            "hit_rate": round(hits / total, 4) if total else 0.0,
+            **self.backend.size(),
+        }
+
+
+class _DisabledBackend(LRUCacheBackend):
+    def set(self, key: str, value: Any) -> None:
+        return None
+
+
+def _make_backend():
+    if not ENABLED:
+        return _DisabledBackend()
+    if CACHE_URL:
+        try:
+            return RedisCacheBackend(CACHE_URL)
+        except ImportError:
+            logger.warning("QUESTION_CACHE_URL set but 'redis' is not installed; using in-process cache")
+    return LRUCacheBackend()
+
+
+question_cache = QuestionCache(_make_backend())
+
+
+def serialize_timestamp(value: Optional[datetime]) -> Optional[str]:
+    return value.isoformat() if value else None
+
+
+def parse_timestamp(value: Optional[str]) -> Optional[datetime]:
+    return datetime.fromisoformat(value) if value else None
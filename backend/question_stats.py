@@ -0,0 +1,238 @@
+"""Per-question and per-source-file answer statistics, maintained incrementally.
+
+``question_stats`` and ``source_file_stats`` hold plain counters: attempts,
+graded attempts, correct answers, skips and, per question, how often each
+option was chosen. Every flush of the attempts buffer (``attempts.py``) adds
+its batch to these counters. It uses one upsert per table, in the same
+transaction as the INSERT into ``question_attempts``. The ``/stats`` endpoints
+therefore read a row per question or file, never the raw attempts, and load
+in milliseconds however many attempts have been logged.
+
+The counters can be recomputed from ``question_attempts`` with::
+
+    python question_stats.py --rebuild
+
+The rebuild replaces both tables in one transaction. Run it while no answers
+are being flushed, or a concurrent flush may be counted twice or not at all.
+"""
+
+import importlib
+import logging
+from collections import defaultdict
+from datetime import datetime
+from typing import Dict, Iterable, List, Optional
+
+from sqlalchemy import Float, case, cast, func
+from sqlalchemy.orm import Session
+
+from models import Question, QuestionAttempt, QuestionStats, SourceFileStats
+
+logger = logging.getLogger(__name__)
+
+OPTION_COLUMNS = tuple(f"option_{index}" for index in range(5))
+COUNTERS = ("attempts", "graded", "correct", "skipped")
+SORTS = ("attempts", "hardest", "easiest", "recent")
+
+
+def _empty(counters: Iterable[str]) -> Dict:
+    return {**dict.fromkeys(counters, 0), "last_answered_at": None}
+
+
+def _later(current: Optional[datetime], other: Optional[datetime]) -> Optional[datetime]:
+    return other if current is None or (other is not None and other > current) else current
+
+
+def _count(events: Iterable[Dict]) -> Dict[int, Dict]:
+    per_question: Dict[int, Dict] = defaultdict(lambda: _empty(COUNTERS + OPTION_COLUMNS))
+    for event in events:
+        counts = per_question[event["question_id"]]
+        counts["attempts"] += 1
+        if event["is_correct"] is not None:
+            counts["graded"] += 1
+            counts["correct"] += bool(event["is_correct"])
+        answer = event["answer"]
+        if answer is None:
+            counts["skipped"] += 1
+        elif 0 <= answer < len(OPTION_COLUMNS):
+            counts[OPTION_COLUMNS[answer]] += 1
+        counts["last_answered_at"] = _later(counts["last_answered_at"], event["answered_at"])
+    return per_question
+
+
+def _source_totals(question_rows: Iterable[Dict]) -> List[Dict]:
+    per_source: Dict[str, Dict] = defaultdict(lambda: _empty(COUNTERS))
+    for row in question_rows:
+        if row["source_file"]:
+            totals = per_source[row["source_file"]]
+            for name in COUNTERS:
+                totals[name] += row[name]
+            totals["last_answered_at"] = _later(totals["last_answered_at"], row["last_answered_at"])
+    return [{"source_file": source, **totals} for source, totals in per_source.items()]
+
+
+def _upsert(db: Session, model, key: str, rows: List[Dict], counters: Iterable[str]) -> None:
+    """Add the counters in ``rows`` to existing rows of ``model``, inserting rows that are missing."""
+    if not rows:
+        return
+    # Same lock order in every transaction, so two concurrent flushes cannot deadlock on Postgres.
+    rows = sorted(rows, key=lambda row: row[key])
+    table = model.__table__
+    latest = table.c.last_answered_at
+    dialect = db.get_bind().dialect.name
+    if dialect in ("sqlite", "postgresql"):
+        stmt = importlib.import_module(f"sqlalchemy.dialects.{dialect}").insert(table)
+        updates = {name: table.c[name] + stmt.excluded[name] for name in counters}
+        # A NULL comparison falls through to the new value.
+        newest = stmt.excluded.last_answered_at
+        updates["last_answered_at"] = case((latest > newest, latest), else_=newest)
+        if key != "source_file" and "source_file" in table.c:
+            updates["source_file"] = stmt.excluded.source_file
+        db.execute(stmt.on_conflict_do_update(index_elements=[key], set_=updates), rows)
+        return
+    # Other databases: update, then insert the rows that did not exist yet.
+    for row in rows:
+        values = {name: table.c[name] + row[name] for name in counters}
+        values["last_answered_at"] = case((latest > row["last_answered_at"], latest), else_=row["last_answered_at"])
+        if not db.execute(table.update().where(table.c[key] == row[key]).values(values)).rowcount:
+            db.execute(table.insert().values(row))
+
+
+def apply_attempts(db: Session, events: List[Dict]) -> None:
+    """Add a batch of attempts (``question_attempts`` rows) to both stats tables; the caller commits."""
+    per_question = _count(events)
+    if not per_question:
+        return
+    sources = dict(
+        db.query(Question.id, Question.source_file).filter(Question.id.in_(list(per_question))).all()
+    )
+    question_rows = [
+        {"question_id": question_id, "source_file": sources.get(question_id), **counts}
+        for question_id, counts in per_question.items()
+    ]
+    _upsert(db, QuestionStats, "question_id", question_rows, COUNTERS + OPTION_COLUMNS)
+    _upsert(db, SourceFileStats, "source_file", _source_totals(question_rows), COUNTERS)
+
+
+def rebuild(db: Session) -> int:
+    """Recompute both tables from ``question_attempts``; returns how many questions have stats."""
+    attempt = QuestionAttempt
+    answer_counts = [
+        func.sum(case((attempt.answer == index, 1), else_=0)).label(name)
+        for index, name in enumerate(OPTION_COLUMNS)
+    ]
+    grouped = (
+        db.query(
+            attempt.question_id,
+            func.count().label("attempts"),
+            func.count(attempt.is_correct).label("graded"),
+            func.sum(case((attempt.is_correct.is_(True), 1), else_=0)).label("correct"),
+            func.sum(case((attempt.answer.is_(None), 1), else_=0)).label("skipped"),
+            *answer_counts,
+            func.max(attempt.answered_at).label("last_answered_at"),
+        )
+        .group_by(attempt.question_id)
+        .all()
+    )
+    question_ids = [row.question_id for row in grouped]
+    sources: Dict[int, Optional[str]] = {}
+    for start in range(0, len(question_ids), 500):
+        chunk = question_ids[start:start + 500]
+        sources.update(db.query(Question.id, Question.source_file).filter(Question.id.in_(chunk)).all())
+    question_rows = [{**row._asdict(), "source_file": sources.get(row.question_id)} for row in grouped]
+
+    db.query(QuestionStats).delete(synchronize_session=False)
+    db.query(SourceFileStats).delete(synchronize_session=False)
+    if question_rows:
+        db.bulk_insert_mappings(QuestionStats, question_rows)
+        db.bulk_insert_mappings(SourceFileStats, _source_totals(question_rows))
+    db.commit()
+    return len(question_rows)
+
+
+def _accuracy(correct: int, graded: int) -> Optional[float]:
+    return round(correct / graded, 4) if graded else None
+
+
+def _order(model, sort: str):
+    accuracy = case((model.graded > 0, cast(model.correct, Float) / model.graded), else_=None)
+    if sort == "hardest":
+        return [model.graded == 0, accuracy.asc()]
+    if sort == "easiest":
+        return [model.graded == 0, accuracy.desc()]
+    if sort == "recent":
+        return [model.last_answered_at.is_(None), model.last_answered_at.desc()]
+    return [model.attempts.desc()]
+
+
+def _stats_payload(row) -> Dict:
+    accuracy = _accuracy(row.correct, row.graded)
+    return {
+        **{name: getattr(row, name) for name in COUNTERS},
+        "accuracy": accuracy,
+        "difficulty": round(1 - accuracy, 4) if accuracy is not None else None,
+        "last_answered_at": row.last_answered_at.isoformat() if row.last_answered_at else None,
+    }
+
+
+def _question_payloads(db: Session, rows: List[QuestionStats]) -> List[Dict]:
+    stems = dict(
+        db.query(Question.id, Question.question).filter(Question.id.in_([row.question_id for row in rows])).all()
+    )
+    return [
+        {
+            "question_id": row.question_id,
+            "question": stems.get(row.question_id),  # None once the question is deleted
+            "source_file": row.source_file,
+            **_stats_payload(row),
+            "option_counts": [getattr(row, name) for name in OPTION_COLUMNS],
+        }
+        for row in rows
+    ]
+
+
+def question_stats(
+    db: Session, source_file: Optional[str] = None, sort: str = "attempts", limit: int = 50, offset: int = 0
+) -> List[Dict]:
+    query = db.query(QuestionStats)
+    if source_file is not None:
+        query = query.filter(QuestionStats.source_file == source_file)
+    rows = query.order_by(*_order(QuestionStats, sort), QuestionStats.question_id).offset(offset).limit(limit).all()
+    return _question_payloads(db, rows)
+
+
+def question_stats_for(db: Session, question_id: int) -> Optional[Dict]:
+    row = db.get(QuestionStats, question_id)
+    return _question_payloads(db, [row])[0] if row else None
+
+
+def source_file_stats(db: Session, sort: str = "attempts", limit: int = 50, offset: int = 0) -> List[Dict]:
+    rows = (
+        db.query(SourceFileStats)
+        .order_by(*_order(SourceFileStats, sort), SourceFileStats.source_file)
+        .offset(offset)
+        .limit(limit)
+        .all()
+    )
+    return [{"source_file": row.source_file, **_stats_payload(row)} for row in rows]
+
+
+if __name__ == "__main__":
+    import argparse
+
+    from db import SessionLocal, init_db
+
+    parser = argparse.ArgumentParser(description="Maintain the precomputed answer statistics.")
+    parser.add_argument(
+        "--rebuild", action="store_true", help="Recompute question_stats and source_file_stats from question_attempts"
+    )
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO, format="%(levelname)s:%(name)s: %(message)s")
+
+    if not args.rebuild:
+        parser.error("nothing to do; pass --rebuild")
+    init_db()
+    session = SessionLocal()
+    try:
+        print(f"Rebuilt stats for {rebuild(session)} questions")
+    finally:
+        session.close()
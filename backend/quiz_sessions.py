@@ -0,0 +1,183 @@
+"""Server-side quiz sessions: a pinned sample of question ids, served one at a time.
+
+``POST /quiz/sessions`` samples question ids from the cached quiz pool (see
+``question_cache``) and pins them in a ``quiz_sessions`` row, together with the
+answers given so far. The row holds ids and answers, never copies of the
+questions, so a session is a few hundred bytes. No random sample is drawn after
+creation.
+
+Questions are served in order, without their answers. Each answer is marked
+when it is submitted, and the response carries the next question. Whenever a
+question is served, the next ``QUIZ_SESSION_PREFETCH`` are loaded into the
+question cache by the same query, so the rest of the quiz is served from cache.
+
+A session created with a ``learner_id`` is adaptive: its questions are chosen
+by the learner's spaced-repetition schedule (``review_schedule``), and every
+answer updates that schedule.
+
+Sessions expire ``QUIZ_SESSION_TTL_SECONDS`` after they are created. Each
+process deletes expired rows at most every ``PURGE_INTERVAL_SECONDS``, when a
+session is created.
+"""
+
+import logging
+import os
+import random
+import threading
+import time
+import uuid
+from datetime import datetime, timedelta
+from typing import List, Optional
+
+from fastapi import HTTPException, status
+from sqlalchemy.orm import Session
+
+from models import QuizSession
+
+logger = logging.getLogger(__name__)
+
+SESSION_TTL_SECONDS = float(os.getenv("QUIZ_SESSION_TTL_SECONDS", "7200"))
+PREFETCH = int(os.getenv("QUIZ_SESSION_PREFETCH", "3"))
+MAX_QUESTIONS = 50
+PURGE_INTERVAL_SECONDS = 60.0
+
+RIGHT, WRONG, UNGRADED = "1", "0", "-"
+
+_next_purge = 0.0
+_purge_lock = threading.Lock()
+
+
+def create_session(
+    db: Session,
+    pool: List[int],
+    limit: int,
+    topic: Optional[str] = None,
+    learner_id: Optional[str] = None,
+) -> QuizSession:
+    """Pin up to ``limit`` ids from ``pool`` in a new session.
+
+    A plain session samples ``pool`` at random. An adaptive session
+    (``learner_id``) gets ``pool`` already picked by ``review_schedule.pick``
+    and keeps its order.
+    """
+    _maybe_purge(db)
+    now = datetime.utcnow()
+    size = min(max(1, limit), MAX_QUESTIONS, len(pool))
+    session = QuizSession(
+        id=uuid.uuid4().hex,
+        topic=topic,
+        learner_id=learner_id,
+        question_ids=list(pool[:size]) if learner_id else random.sample(pool, size),
+        answers=[],
+        marks="",
+        created_at=now,
+        expires_at=now + timedelta(seconds=SESSION_TTL_SECONDS),
+    )
+    db.add(session)
+    db.commit()
+    return session
+
+
+def load_session(db: Session, session_id: str, for_update: bool = False) -> QuizSession:
+    """The session ``session_id``; 404 if unknown, 410 once it has expired.
+
+    ``for_update`` locks the row (on databases that support it) so two answers
+    to one session are marked one after the other.
+    """
+    query = db.query(QuizSession).filter(QuizSession.id == session_id)
+    if for_update:
+        query = query.with_for_update()
+    session = query.first()
+    if session is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Quiz session not found")
+    if session.expires_at < datetime.utcnow():
+        raise HTTPException(status_code=status.HTTP_410_GONE, detail="Quiz session has expired")
+    return session
+
+
+def upcoming_ids(session: QuizSession, prefetch: int = PREFETCH) -> List[int]:
+    """Id of the question to serve next, followed by up to ``prefetch`` after it."""
+    return session.question_ids[session.position:session.position + 1 + prefetch]
+
+
+def question_id_at(session: QuizSession, position: int) -> int:
+    if not 0 <= position < session.total:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"position must be between 0 and {session.total - 1}",
+        )
+    if position > session.position:
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail=f"Answer question {session.position} first",
+        )
+    return session.question_ids[position]
+
+
+def mark_is_correct(mark: str) -> Optional[bool]:
+    return None if mark == UNGRADED else mark == RIGHT
+
+
+def record_answer(
+    db: Session,
+    session: QuizSession,
+    position: int,
+    answer: Optional[int],
+    options: int,
+    correct_option: Optional[int],
+) -> str:
+    """Mark ``answer`` (None skips the question) for the question at ``position``; returns the mark.
+
+    Re-sending the answer already recorded for a position returns its mark, so
+    clients can retry; a different answer is a 409.
+    """
+    question_id_at(session, position)
+    if position < session.position:
+        if session.answers[position] != answer:
+            raise HTTPException(
+                status_code=status.HTTP_409_CONFLICT, detail=f"Question {position} was already answered"
+            )
+        return session.marks[position]
+    if answer is not None and not 0 <= answer < options:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST, detail=f"answer must be between 0 and {options - 1}"
+        )
+
+    if correct_option is None:
+        mark = UNGRADED
+    else:
+        mark = RIGHT if answer == correct_option else WRONG
+    # Reassigned rather than appended in place, so the JSON column is flagged as changed.
+    session.answers = session.answers + [answer]
+    session.marks = session.marks + mark
+    if session.finished:
+        session.finished_at = datetime.utcnow()
+    db.commit()
+    return mark
+
+
+def purge_expired(db: Session) -> int:
+    """Delete every expired session; returns how many were removed."""
+    deleted = (
+        db.query(QuizSession)
+        .filter(QuizSession.expires_at < datetime.utcnow())
+        .delete(synchronize_session=False)
+    )
+    db.commit()
+    return deleted
+
+
+def _maybe_purge(db: Session) -> None:
+    global _next_purge
+    now = time.monotonic()
+    with _purge_lock:
+        if now < _next_purge:
+            return
+        _next_purge = now + PURGE_INTERVAL_SECONDS
+    try:
+        deleted = purge_expired(db)
+        if deleted:
+            logger.info(f"🧹 Purged {deleted} expired quiz sessions")
+    except Exception as e:
+        db.rollback()
+        logger.warning(f"Could not purge expired quiz sessions: {str(e)}")
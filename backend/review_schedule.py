@@ -0,0 +1,225 @@
+"""Per-learner spaced repetition (SM-2) and adaptive question selection.
+
+Each answer a learner gives updates their ``review_schedule`` card for that
+question. The card follows SM-2:
+
+* a passed review grows the interval (1 day, 6 days, then times the ease);
+* a failed or skipped one sends the card back ``REVIEW_RELEARN_MINUTES`` later
+  and lowers its ease.
+
+A card's first ease comes from the question's accuracy across all learners
+(``question_stats``), so questions most people miss come back sooner.
+
+An adaptive quiz (:func:`pick`) is built from three groups, in this order:
+
+1. cards that are due, most overdue first;
+2. questions the learner has not seen yet, easiest first by overall
+   accuracy;
+3. if the quiz is still short, the cards due soonest.
+
+Due cards are read from the ``(learner_id, due_at, question_id)`` index in due
+order. That makes the index the priority queue: the next N cards cost an index
+range read and never scan the bank or other learners' schedules. New questions
+are drawn from the cached quiz pool and checked against the learner's cards by
+primary key.
+"""
+
+import logging
+import os
+import random
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional, Set
+
+from fastapi import HTTPException, status
+from sqlalchemy import and_, func, or_
+from sqlalchemy.orm import Session
+
+from models import QuestionStats, ReviewCard
+
+logger = logging.getLogger(__name__)
+
+RELEARN_MINUTES = float(os.getenv("REVIEW_RELEARN_MINUTES", "10"))
+
+INITIAL_EASE = 2.5
+MIN_EASE = 1.3
+# Overall accuracy only seeds a card's ease once this many attempts were graded.
+MIN_GRADED_FOR_EASE = 5
+# Accuracy assumed for questions nobody has answered, when ordering new questions.
+UNKNOWN_ACCURACY = 0.5
+# Random candidates drawn from the pool per new question needed, per round.
+NEW_CANDIDATES_PER_SLOT = 4
+NEW_CANDIDATE_ROUNDS = 3
+PAGE_SIZE = 200
+
+# SM-2 answer quality, 0 (blackout) to 5 (perfect).
+QUALITY_CORRECT = 5
+QUALITY_UNGRADED = 4  # Answered, but the question has no answer key
+QUALITY_WRONG = 1
+QUALITY_SKIPPED = 0
+
+
+def check_learner_id(learner_id: str) -> str:
+    learner_id = (learner_id or "").strip()
+    if not 0 < len(learner_id) <= 64:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST, detail="learner_id must be 1 to 64 characters"
+        )
+    return learner_id
+
+
+def quality(answer: Optional[int], is_correct: Optional[bool]) -> int:
+    if answer is None:
+        return QUALITY_SKIPPED
+    if is_correct is None:
+        return QUALITY_UNGRADED
+    return QUALITY_CORRECT if is_correct else QUALITY_WRONG
+
+
+def _initial_ease(db: Session, question_id: int) -> float:
+    """Ease for a new card: 1.3 for a question nobody gets right, 2.5 for one everybody does."""
+    stats = db.get(QuestionStats, question_id)
+    if stats is None or stats.graded < MIN_GRADED_FOR_EASE:
+        return INITIAL_EASE
+    return MIN_EASE + (INITIAL_EASE - MIN_EASE) * stats.correct / stats.graded
+
+
+def review(
+    db: Session,
+    learner_id: str,
+    question_id: int,
+    answer: Optional[int],
+    is_correct: Optional[bool],
+    now: Optional[datetime] = None,
+) -> ReviewCard:
+    """Apply one answer to the learner's card for ``question_id``; the caller commits."""
+    now = now or datetime.utcnow()
+    card = db.get(ReviewCard, (learner_id, question_id), with_for_update=True)
+    if card is None:
+        card = ReviewCard(
+            learner_id=learner_id,
+            question_id=question_id,
+            ease=_initial_ease(db, question_id),
+            interval_days=0.0,
+            repetitions=0,
+            lapses=0,
+            due_at=now,
+            last_reviewed_at=now,
+        )
+        db.add(card)
+        db.flush()  # So a second answer in the same transaction finds the card
+
+    q = quality(answer, is_correct)
+    if q < 3:
+        card.repetitions = 0
+        card.lapses += 1
+        card.interval_days = 0.0
+        card.due_at = now + timedelta(minutes=RELEARN_MINUTES)
+    else:
+        card.repetitions += 1
+        if card.repetitions == 1:
+            card.interval_days = 1.0
+        elif card.repetitions == 2:
+            card.interval_days = 6.0
+        else:
+            card.interval_days = round(card.interval_days * card.ease, 2)
+        card.due_at = now + timedelta(days=card.interval_days)
+    card.ease = max(MIN_EASE, round(card.ease + 0.1 - (5 - q) * (0.08 + (5 - q) * 0.02), 3))
+    card.last_reviewed_at = now
+    return card
+
+
+def _scheduled(db: Session, learner_id: str, limit: int, allowed: Optional[Set[int]]) -> List[ReviewCard]:
+    """The learner's first ``limit`` cards in due order, keeping only ``allowed`` questions if given.
+
+    Pages through the index with a (due_at, question_id) keyset, so each page
+    is an index range read no matter how far in it starts.
+    """
+    cards: List[ReviewCard] = []
+    after = None
+    while len(cards) < limit:
+        query = db.query(ReviewCard).filter(ReviewCard.learner_id == learner_id)
+        if after is not None:
+            query = query.filter(
+                or_(
+                    ReviewCard.due_at > after.due_at,
+                    and_(ReviewCard.due_at == after.due_at, ReviewCard.question_id > after.question_id),
+                )
+            )
+        page_size = limit if allowed is None else PAGE_SIZE
+        page = query.order_by(ReviewCard.due_at, ReviewCard.question_id).limit(page_size).all()
+        cards.extend(card for card in page if allowed is None or card.question_id in allowed)
+        if len(page) < page_size:
+            break
+        after = page[-1]
+    return cards[:limit]
+
+
+def _new_questions(db: Session, learner_id: str, pool: List[int], count: int) -> List[int]:
+    """Up to ``count`` questions from ``pool`` the learner has no card for, easiest first."""
+    if count <= 0:
+        return []
+    unseen: List[int] = []
+    tried: Set[int] = set()
+    for _ in range(NEW_CANDIDATE_ROUNDS):
+        drawn = random.sample(pool, min(len(pool), count * NEW_CANDIDATES_PER_SLOT))
+        candidates = [question_id for question_id in drawn if question_id not in tried]
+        if not candidates:
+            break
+        tried.update(candidates)
+        seen = {
+            question_id
+            for (question_id,) in db.query(ReviewCard.question_id).filter(
+                ReviewCard.learner_id == learner_id, ReviewCard.question_id.in_(candidates)
+            )
+        }
+        unseen.extend(question_id for question_id in candidates if question_id not in seen)
+        if len(unseen) >= count:
+            break
+
+    if not unseen:
+        return []
+    rows = db.query(QuestionStats.question_id, QuestionStats.correct, QuestionStats.graded).filter(
+        QuestionStats.question_id.in_(unseen), QuestionStats.graded > 0
+    )
+    accuracy: Dict[int, float] = {question_id: correct / graded for question_id, correct, graded in rows}
+    unseen.sort(key=lambda question_id: accuracy.get(question_id, UNKNOWN_ACCURACY), reverse=True)
+    return unseen[:count]
+
+
+def pick(
+    db: Session,
+    learner_id: str,
+    pool: List[int],
+    limit: int,
+    restrict_to_pool: bool = False,
+    now: Optional[datetime] = None,
+) -> List[int]:
+    """Question ids for an adaptive quiz of up to ``limit`` questions, in serving order.
+
+    ``restrict_to_pool`` keeps only scheduled cards whose question is in
+    ``pool`` (a topic quiz); otherwise every card counts.
+    """
+    now = now or datetime.utcnow()
+    allowed = set(pool) if restrict_to_pool else None
+    scheduled = _scheduled(db, learner_id, limit, allowed)
+    due = [card.question_id for card in scheduled if card.due_at <= now]
+    later = [card.question_id for card in scheduled if card.due_at > now]
+    new = _new_questions(db, learner_id, pool, limit - len(due))
+    return (due + new + later)[:limit]
+
+
+def summary(db: Session, learner_id: str, now: Optional[datetime] = None) -> Dict:
+    """Card counts and the next due time for one learner, read from the schedule index."""
+    now = now or datetime.utcnow()
+    base = db.query(func.count(ReviewCard.question_id)).filter(ReviewCard.learner_id == learner_id)
+    next_due = (
+        db.query(func.min(ReviewCard.due_at))
+        .filter(ReviewCard.learner_id == learner_id, ReviewCard.due_at > now)
+        .scalar()
+    )
+    return {
+        "learner_id": learner_id,
+        "cards": base.scalar(),
+        "due": base.filter(ReviewCard.due_at <= now).scalar(),
+        "next_due_at": next_due.isoformat() if next_due else None,
+    }
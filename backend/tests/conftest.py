@@ -0,0 +1,22 @@
+import os
+import sys
+import tempfile
+from pathlib import Path
+
+# Point the app at a throwaway database before any backend module is imported.
+_DB_DIR = tempfile.mkdtemp(prefix="quiz-tests-")
+os.environ["DATABASE_URL"] = f"sqlite:///{_DB_DIR}/test.db"
+os.environ["ATTEMPT_SPILL_DIR"] = f"{_DB_DIR}/attempt-spill"
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import pytest  # noqa: E402
+
+
+@pytest.fixture(scope="session", autouse=True)
+def _create_tables():
+    from db import Base, engine
+    import models  # noqa: F401 - registers tables on Base.metadata
+
+    Base.metadata.create_all(bind=engine)
+    yield
@@ -45,3 +45,477 @@ def test_upload_invalid_file():
         files={"file": ("test.txt", b"not a pdf", "text/plain")}
     )
     assert response.status_code == 400
+
+
+def test_upload_rejects_oversized_files(monkeypatch):
+    import uploads
+
+    monkeypatch.setattr(uploads, "MAX_UPLOAD_BYTES", 1024)
+    # Over limit + multipart overhead: refused from Content-Length before parsing.
+    huge = b"%PDF-1.4\n" + b"0" * (uploads.MULTIPART_OVERHEAD + 4096)
+    response = client.post("/upload", files={"file": ("big.pdf", huge, "application/pdf")})
+    assert response.status_code == 413
+
+    # Within the overhead allowance: caught while spooling the file part.
+    response = client.post("/upload-answer-key", files={"file": ("key.pdf", b"0" * 2048, "application/pdf")})
+    assert response.status_code == 413
+
+
+def _streamed(extract):
+    """Turn a fake ``extract(path) -> questions`` into a fake ``iter_questions_from_pdf``."""
+    from extractor import ExtractionBatch
+
+    def iter_questions(path, skip_ocr=False):
+        questions = extract(path)
+        yield ExtractionBatch(questions, 1, 1)
+        yield ExtractionBatch([], 1, 1, layout_done=True)
+
+    return iter_questions
+
+
+def test_upload_is_spooled_and_hashed(monkeypatch):
+    import hashlib
+    import os
+
+    import main
+
+    contents = b"%PDF-1.4\n" + os.urandom(3 * 1024 * 1024)
+    seen = {}
+
+    def fake_extract(path):
+        seen["path"] = path
+        with open(path, "rb") as handle:
+            seen["matches"] = handle.read() == contents
+        return [{"question": "Spooled?", "options": ["Yes", "No"], "correct_option": 0}]
+
+    monkeypatch.setattr(main, "iter_questions_from_pdf", _streamed(fake_extract))
+    monkeypatch.setattr(main, "generate_explanations", lambda filename: None)
+    response = client.post("/upload", files={"file": ("spooled.pdf", contents, "application/pdf")})
+
+    assert response.status_code == 200
+    assert response.json()["sha256"] == hashlib.sha256(contents).hexdigest()
+    assert seen["matches"]
+    assert not os.path.exists(seen["path"])
+
+
+def test_upload_failing_part_way_reports_the_saved_questions(monkeypatch):
+    import main
+    from extractor import ExtractionBatch, PDFExtractionError
+
+    def failing(path):
+        yield ExtractionBatch([{"question": "Saved before the failure?", "options": ["Yes", "No"]}], 1, 3)
+        raise PDFExtractionError("Extraction failed after 2 of 3 pages: broken page")
+
+    monkeypatch.setattr(main, "iter_questions_from_pdf", failing)
+    response = client.post("/upload", files={"file": ("partial.pdf", b"%PDF-1.4\n", "application/pdf")})
+
+    assert response.status_code == 422
+    assert "after 2 of 3 pages" in response.json()["detail"]
+    assert "1 questions from the pages before were saved" in response.json()["detail"]
+
+
+def test_batch_upload_ingests_pdfs_and_zips_concurrently(monkeypatch):
+    import io
+    import time
+    import zipfile
+
+    import main
+
+    def fake_extract(path):
+        with open(path, "rb") as handle:
+            contents = handle.read()
+        time.sleep(0.5)
+        if b"no questions" in contents:
+            return []
+        return [{"question": f"From {len(contents)} bytes?", "options": ["Yes", "No"], "correct_option": 0}]
+
+    monkeypatch.setattr(main, "iter_questions_from_pdf", _streamed(fake_extract))
+    monkeypatch.setattr(main, "generate_explanations", lambda filename: None)
+
+    archive = io.BytesIO()
+    with zipfile.ZipFile(archive, "w") as bundle:
+        bundle.writestr("series/paper-3.pdf", b"%PDF-1.4 third paper")
+        bundle.writestr("series/notes.txt", b"ignored")
+    files = [
+        ("files", ("paper-1.pdf", b"%PDF-1.4 first", "application/pdf")),
+        ("files", ("paper-2.pdf", b"%PDF-1.4 no questions", "application/pdf")),
+        ("files", ("series.zip", archive.getvalue(), "application/zip")),
+    ]
+    started = time.monotonic()
+    response = client.post("/upload/batch", files=files)
+    assert response.status_code == 202
+    job = response.json()
+    assert [item["file_name"] for item in job["files"]] == ["paper-1.pdf", "paper-2.pdf", "paper-3.pdf"]
+
+    deadline = time.monotonic() + 10
+    while job["status"] != "done" and time.monotonic() < deadline:
+        time.sleep(0.05)
+        job = client.get(f"/upload/batch/{job['job_id']}").json()
+
+    elapsed = time.monotonic() - started
+
+    assert job["status"] == "done"
+    # Three 0.5 s extractions ran side by side, not one after another.
+    assert elapsed < 1.2
+    assert job["completed_files"] == 2 and job["failed_files"] == 1
+    assert job["saved_count"] == 2
+    statuses = {item["file_name"]: item["status"] for item in job["files"]}
+    assert {item["total_pages"] for item in job["files"]} == {1}
+    assert statuses == {"paper-1.pdf": "done", "paper-2.pdf": "failed", "paper-3.pdf": "done"}
+    assert client.get("/upload/batch/unknown").status_code == 404
+    assert client.post("/upload/batch", files=[("files", ("notes.txt", b"x", "text/plain"))]).status_code == 400
+
+
+def test_zip_unpacking_stops_at_the_file_and_byte_budgets(tmp_path, monkeypatch):
+    import zipfile
+
+    from fastapi import HTTPException
+
+    import batch_ingest
+    from uploads import unpack_zip
+
+    archive_path = tmp_path / "bomb.zip"
+    with zipfile.ZipFile(archive_path, "w", compression=zipfile.ZIP_DEFLATED) as bundle:
+        for n in range(3):
+            bundle.writestr(f"paper-{n}.pdf", b"%PDF-1.4" + b"\0" * (1024 * 1024))
+    workdir = tmp_path / "out"
+    workdir.mkdir()
+
+    for limits, status_code in (({"max_files": 2}, 400), ({"max_total_bytes": 1536 * 1024}, 413)):
+        try:
+            unpack_zip(str(archive_path), str(workdir), **limits)
+        except HTTPException as exc:
+            assert exc.status_code == status_code
+        else:
+            raise AssertionError(f"{limits} was not enforced")
+        assert list(workdir.iterdir()) == []  # Nothing unpacked is left behind
+    assert len(unpack_zip(str(archive_path), str(workdir), max_files=3)) == 3
+
+    monkeypatch.setattr(batch_ingest, "BATCH_MAX_INFLATED_BYTES", 2 * 1024 * 1024)
+    response = client.post(
+        "/upload/batch", files=[("files", ("bomb.zip", archive_path.read_bytes(), "application/zip"))]
+    )
+    assert response.status_code == 413
+
+
+def _create_question(**overrides):
+    from db import SessionLocal
+    from models import Question
+
+    db = SessionLocal()
+    try:
+        question = Question(
+            question=overrides.get("question", "What is the SI unit of force?"),
+            options=overrides.get("options", ["Newton", "Joule", "Watt", "Pascal"]),
+            correct_option=overrides.get("correct_option", 0),
+            source_file=overrides.get("source_file", "test.pdf"),
+            page_no=overrides.get("page_no", 1),
+            question_no=overrides.get("question_no"),
+            image_data=overrides.get("image_data"),
+            image_type=overrides.get("image_type"),
+            thumbnail_data=overrides.get("thumbnail_data"),
+            thumbnail_type=overrides.get("thumbnail_type"),
+        )
+        db.add(question)
+        db.commit()
+        return question.id
+    finally:
+        db.close()
+
+
+def test_hint_unknown_question():
+    """Test hint endpoint with a missing question."""
+    response = client.post("/assistant/hint?question_id=999999")
+    assert response.status_code == 404
+
+
+def test_hint_uses_async_groq(monkeypatch):
+    """Test hint endpoint awaits the async Groq client."""
+    import main
+
+    async def fake_hint(question, options):
+        return f"Think about {options[0]}"
+
+    monkeypatch.setattr(main, "groq_generate_hint_async", fake_hint)
+    question_id = _create_question()
+    response = client.post(f"/assistant/hint?question_id={question_id}")
+    assert response.status_code == 200
+    assert response.json() == {"hint": "Think about Newton"}
+
+
+@pytest.mark.asyncio
+async def test_hints_do_not_hold_threads(monkeypatch):
+    """Concurrent hint requests wait on the LLM without serializing or holding DB connections."""
+    import asyncio
+    import time
+
+    import httpx
+    import main
+
+    concurrent = 40  # More than pool_size + max_overflow
+    waiting = 0
+    all_waiting = asyncio.Event()
+    checked_out = []
+
+    async def slow_hint(question, options):
+        nonlocal waiting
+        waiting += 1
+        if waiting == concurrent:
+            all_waiting.set()
+        await asyncio.wait_for(all_waiting.wait(), timeout=10)
+        checked_out.append(main.engine.pool.checkedout())
+        await asyncio.sleep(0.5)
+        return "hint"
+
+    monkeypatch.setattr(main, "groq_generate_hint_async", slow_hint)
+    question_id = _create_question()
+
+    async with httpx.AsyncClient(app=app, base_url="http://test") as async_client:
+        started = time.perf_counter()
+        responses = await asyncio.gather(*[
+            async_client.post(f"/assistant/hint?question_id={question_id}") for _ in range(concurrent)
+        ])
+        elapsed = time.perf_counter() - started
+
+    assert all(r.status_code == 200 for r in responses)
+    assert responses[0].json() == {"hint": "hint"}
+    # Every request is inside the LLM call at once, and none holds a connection.
+    assert max(checked_out) == 0
+    assert elapsed < 5
+
+
+def test_apply_answer_key_by_question_number():
+    """Answer keys update correct_option by printed question number."""
+    source_file = "answer-key-test.pdf"
+    ids = {n: _create_question(source_file=source_file, correct_option=None, question_no=n) for n in range(1, 101)}
+    answers = {n: "ABCD"[n % 4] for n in range(1, 101)}
+    answers[101] = "A"
+
+    response = client.put("/questions/answer-key", json={"source_file": source_file, "answers": answers})
+    assert response.status_code == 200
+    body = response.json()
+    assert body["updated_count"] == 100
+    assert body["unmatched"] == [101]
+
+    assert client.get(f"/questions/{ids[7]}").json()["correct_option"] == 7 % 4
+
+
+def test_apply_answer_key_updates_every_question_sharing_a_number():
+    source_file = "answer-key-sections.pdf"
+    first = _create_question(source_file=source_file, correct_option=None, question_no=1)
+    second = _create_question(source_file=source_file, correct_option=None, question_no=1)
+    other = _create_question(source_file=source_file, correct_option=None, question_no=2)
+
+    response = client.put("/questions/answer-key", json={"source_file": source_file, "answers": {"1": "C", "2": "B"}})
+
+    body = response.json()
+    assert (body["updated_count"], body["unmatched"], body["ambiguous"]) == (3, [], [1])
+    assert [client.get(f"/questions/{qid}").json()["correct_option"] for qid in (first, second, other)] == [2, 2, 1]
+
+
+def test_apply_answer_key_unknown_source():
+    response = client.put("/questions/answer-key", json={"source_file": "missing.pdf", "answers": {"1": "A"}})
+    assert response.status_code == 404
+
+
+def test_question_conditional_get():
+    """A matching If-None-Match returns 304 until the question changes."""
+    question_id = _create_question(source_file="etag-test.pdf")
+    first = client.get(f"/questions/{question_id}")
+    etag = first.headers["etag"]
+    assert first.headers["last-modified"]
+
+    cached = client.get(f"/questions/{question_id}", headers={"If-None-Match": etag})
+    assert cached.status_code == 304
+    assert cached.content == b""
+
+    client.put("/questions/answer-key", json={"source_file": "etag-test.pdf", "answers": {"1": "B"}})
+    changed = client.get(f"/questions/{question_id}", headers={"If-None-Match": etag})
+    assert changed.status_code == 200
+    assert changed.headers["etag"] != etag
+
+
+def test_question_list_etag_follows_bank_version():
+    """List pages revalidate against the bank-wide version counter."""
+    etag = client.get("/questions?limit=5").headers["etag"]
+    assert client.get("/questions?limit=5", headers={"If-None-Match": etag}).status_code == 304
+    assert client.get("/questions?limit=6", headers={"If-None-Match": etag}).status_code == 200
+
+    _create_question()
+    client.put("/questions/answer-key", json={"source_file": "test.pdf", "answers": {"1": "C"}})
+    assert client.get("/questions?limit=5", headers={"If-None-Match": etag}).status_code == 200
+
+
+def test_bank_version_row_is_seeded_once_and_bumped_in_place():
+    """A second seeder or a first write on an unseeded bank never hits a duplicate key."""
+    from db import SessionLocal
+    from http_cache import bump_bank_version, get_bank_version, seed_bank_version
+    from models import QuestionBankVersion
+
+    db = SessionLocal()
+    try:
+        db.query(QuestionBankVersion).delete()
+        bump_bank_version(db)
+        db.commit()
+        assert get_bank_version(db)[0] == 1
+
+        seed_bank_version(db)
+        seed_bank_version(db)
+        bump_bank_version(db)
+        db.commit()
+        assert get_bank_version(db)[0] == 2
+        assert db.query(QuestionBankVersion).count() == 1
+    finally:
+        db.close()
+
+
+def test_bank_version_listeners_are_registered_once_per_session(monkeypatch):
+    from db import SessionLocal
+    from http_cache import bump_bank_version, question_cache
+
+    credited = []
+    monkeypatch.setattr(question_cache, "note_local_bumps", credited.append)
+    db = SessionLocal()
+    try:
+        for _ in range(3):
+            bump_bank_version(db)
+            bump_bank_version(db)
+            db.commit()
+        bump_bank_version(db)
+        db.rollback()
+        assert (len(db.dispatch.after_commit), len(db.dispatch.after_rollback)) == (1, 1)
+        assert credited == [2, 2, 2]
+        assert "bank_version_bumps" not in db.info
+    finally:
+        db.close()
+
+
+def test_quiz_served_from_cache_and_invalidated_on_write():
+    """Repeated quizzes hit the cache; explanation writes refresh the entry."""
+    import main
+    from question_cache import question_cache
+
+    question_id = _create_question(source_file="cache-test.pdf")
+    question_cache.clear()
+    client.get(f"/questions/{question_id}")
+    hits = question_cache.stats()["hits"]
+    assert client.get(f"/questions/{question_id}").json()["explanation"] is None
+    assert question_cache.stats()["hits"] == hits + 1
+
+    main._save_explanation(main._load_question(question_id).id, "Because F = ma.")
+    assert client.get(f"/questions/{question_id}").json()["explanation"] == "Because F = ma."
+
+    quiz = client.get("/quiz?limit=5")
+    assert quiz.status_code == 200
+    assert client.get("/cache/stats").json()["hit_rate"] > 0
+
+
+def test_large_lists_are_compressed():
+    for _ in range(10):
+        _create_question(source_file="gzip-test.pdf")
+    response = client.get("/questions?limit=50", headers={"Accept-Encoding": "gzip"})
+    assert response.headers["content-encoding"] in ("gzip", "br")
+    assert isinstance(response.json(), list)
+
+
+def test_images_served_as_binary_in_url_mode():
+    image = b"\x89PNG\r\n\x1a\n" + b"\x00" * 2048
+    question_id = _create_question(
+        source_file="image-test.pdf",
+        image_data=image,
+        image_type="png",
+        thumbnail_data=b"RIFF-thumb",
+        thumbnail_type="webp",
+    )
+
+    inline = client.get(f"/questions/{question_id}").json()
+    assert inline["image_url"].startswith("data:image/png;base64,")
+
+    linked = client.get(f"/questions/{question_id}?images=url").json()
+    assert "/questions/%d/image?v=" % question_id in linked["image_url"]
+
+    response = client.get(linked["image_url"], headers={"Accept-Encoding": "gzip"})
+    assert response.status_code == 200
+    assert response.headers["content-type"] == "image/png"
+    assert "content-encoding" not in response.headers
+    assert response.content == image
+    cached = client.get(linked["image_url"], headers={"If-None-Match": response.headers["etag"]})
+    assert cached.status_code == 304
+
+    thumbnail = client.get(linked["thumbnail_url"])
+    assert thumbnail.headers["content-type"] == "image/webp"
+    assert thumbnail.content == b"RIFF-thumb"
+
+    assert client.get("/questions?images=bogus").status_code == 400
+
+
+def test_metrics_endpoint_reports_endpoint_and_stage_timings():
+    pytest.importorskip("prometheus_client")
+    from metrics import stage_timer
+
+    _create_question(source_file="metrics-test.pdf")
+    client.get("/quiz?limit=3")
+    with stage_timer("parser_physics"):
+        pass
+
+    response = client.get("/metrics")
+    assert response.status_code == 200
+    body = response.text
+    assert 'quiz_db_query_seconds_count{endpoint="get_quiz"}' in body
+    assert 'quiz_http_request_seconds_count{endpoint="get_quiz",method="GET",status="200"}' in body
+    assert 'quiz_extraction_stage_seconds_count{stage="parser_physics"}' in body
+    assert "quiz_question_cache_hit_ratio" in body
+
+
+def test_failed_statements_do_not_leak_query_timers():
+    from sqlalchemy import text
+    from sqlalchemy.exc import OperationalError
+
+    import main
+
+    with main.engine.connect() as conn:
+        for _ in range(3):
+            with pytest.raises(OperationalError):
+                conn.execute(text("SELECT * FROM no_such_table"))
+        conn.execute(text("SELECT 1"))
+        assert conn.info.get("metrics_query_start") == []
+
+
+def test_sync_endpoint_queries_are_labelled_in_any_thread():
+    """The label reaches the DB timing even from a thread that did not inherit the request context."""
+    pytest.importorskip("prometheus_client")
+    import threading
+
+    from prometheus_client import REGISTRY
+
+    def count(endpoint):
+        return REGISTRY.get_sample_value("quiz_db_query_seconds_count", {"endpoint": endpoint}) or 0
+
+    _create_question(source_file="metrics-label-test.pdf")
+    before, background = count("list_questions"), count("background")
+    assert client.get("/questions?limit=5").status_code == 200
+    assert count("list_questions") > before
+
+    from starlette.requests import Request
+
+    from db import SessionLocal
+
+    route = next(r for r in app.routes if getattr(r, "path", None) == "/questions" and "GET" in r.methods)
+    request = Request({
+        "type": "http", "method": "GET", "path": "/questions", "query_string": b"",
+        "headers": [], "scheme": "http", "server": ("test", 80),
+    })
+
+    def call():
+        db = SessionLocal()
+        try:
+            route.dependant.call(request=request, skip=0, limit=5, images=None, db=db)
+        finally:
+            db.close()
+
+    before = count("list_questions")
+    thread = threading.Thread(target=call)  # A plain thread copies no context
+    thread.start()
+    thread.join()
+    assert count("list_questions") > before
+    assert count("background") == background
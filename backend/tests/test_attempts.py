@@ -0,0 +1,96 @@
+from fastapi.testclient import TestClient
+
+from main import app
+from tests.test_api import _create_question
+
+client = TestClient(app)
+
+
+def _attempts(question_id):
+    from db import SessionLocal
+    from models import QuestionAttempt
+
+    db = SessionLocal()
+    try:
+        return db.query(QuestionAttempt).filter(QuestionAttempt.question_id == question_id).all()
+    finally:
+        db.close()
+
+
+def test_session_answers_are_logged_in_bulk_through_the_spill_file(tmp_path):
+    from attempts import AttemptBuffer, attempt_buffer
+
+    question_id = _create_question(question="Which attempt-log quantity is a vector?", correct_option=1)
+    session = client.post("/quiz/sessions", json={"limit": 1, "topic": "attempt-log"}).json()
+    client.post(f"/quiz/sessions/{session['session_id']}/answers", json={"position": 0, "answer": 1})
+    # A retried answer is not logged twice.
+    client.post(f"/quiz/sessions/{session['session_id']}/answers", json={"position": 0, "answer": 1})
+
+    attempt_buffer.flush()
+    [attempt] = _attempts(question_id)
+    assert (attempt.answer, attempt.is_correct, attempt.source) == (1, True, "session")
+    assert attempt.session_id == session["session_id"]
+
+    # Events of a worker that died before flushing are replayed from its spill file.
+    crashed = AttemptBuffer(spill_dir=tmp_path, flush_size=10_000, flush_seconds=3600)
+    for answer in (0, 2, None):
+        crashed.record(question_id, answer, answer == 1 if answer is not None else False, "feedback")
+    segment = crashed._segment
+    segment.handle.close()  # Releases the lock, as the process exiting would
+    segment.path.write_text(segment.path.read_text() + '{"question_id": 1, "answ')  # Torn last line
+
+    survivor = AttemptBuffer(spill_dir=tmp_path)
+    assert survivor.recover() == 3
+    assert not list(tmp_path.iterdir())
+    assert sorted(a.answer if a.answer is not None else -1 for a in _attempts(question_id)) == [-1, 0, 1, 2]
+
+
+def test_failed_flushes_keep_events_for_the_next_attempt(tmp_path):
+    from attempts import AttemptBuffer
+    from db import SessionLocal
+
+    question_id = _create_question(question="Retry flush question?")
+    calls = []
+
+    def flaky_session():
+        calls.append(1)
+        if len(calls) == 1:
+            raise RuntimeError("database is down")
+        return SessionLocal()
+
+    buffer = AttemptBuffer(session_factory=flaky_session, spill_dir=tmp_path, flush_size=10_000, flush_seconds=3600)
+    for answer in range(3):
+        buffer.record(question_id, answer, answer == 0, "feedback")
+    assert buffer.flush() == 0
+    assert buffer.stats()["pending"] == 3 and len(list(tmp_path.iterdir())) == 1
+    assert buffer.flush() == 3
+    assert buffer.stats() == {"pending": 0, "flushed": 3, "failed_flushes": 1, "dropped": 0}
+    assert len(_attempts(question_id)) == 3 and not list(tmp_path.iterdir())
+    buffer.close()
+
+
+def test_an_outage_keeps_few_segments_open_and_replays_the_rest(tmp_path):
+    from attempts import MAX_RETAINED_BATCHES, AttemptBuffer
+    from db import SessionLocal
+
+    question_id = _create_question(question="Outage flush question?")
+    down = [True]
+
+    def session_factory():
+        if down[0]:
+            raise RuntimeError("database is down")
+        return SessionLocal()
+
+    buffer = AttemptBuffer(session_factory=session_factory, spill_dir=tmp_path, flush_size=10_000, flush_seconds=3600)
+    outage_flushes = MAX_RETAINED_BATCHES + 3
+    for answer in range(outage_flushes):
+        buffer.record(question_id, answer % 4, False, "feedback")
+        assert buffer.flush() == 0
+    open_segments = [segment for segment, _ in buffer._unflushed if not segment.handle.closed]
+    assert len(open_segments) == MAX_RETAINED_BATCHES
+    assert len(list(tmp_path.iterdir())) == outage_flushes  # Nothing is lost
+
+    down[0] = False
+    assert buffer.flush() == outage_flushes
+    assert len(_attempts(question_id)) == outage_flushes and not list(tmp_path.iterdir())
+    buffer.close()
@@ -0,0 +1,282 @@
+import re
+
+import pytest
+
+from extractor import parse_answer_key_text
+
+
+def test_parse_answer_key_inline_pairs():
+    text = "ANSWER KEY\n1. A  2. C  3) b\nQ4: D\nQuestion 5 - (a)"
+    assert parse_answer_key_text(text) == {1: "A", 2: "C", 3: "B", 4: "D", 5: "A"}
+
+
+def test_parse_answer_key_grid_layout():
+    text = "Physics 2025\nQ 1 2 3 4 5\nAns A C B D A\n6 7 8\nB B C"
+    assert parse_answer_key_text(text) == {1: "A", 2: "C", 3: "B", 4: "D", 5: "A", 6: "B", 7: "B", 8: "C"}
+
+
+def test_parse_answer_key_one_cell_per_line():
+    assert parse_answer_key_text("1\nA\n2\nC\n3\nD") == {1: "A", 2: "C", 3: "D"}
+
+
+def test_parse_answer_key_ignores_prose():
+    assert parse_answer_key_text("Page 1 of 2\nTotal marks 100") == {}
+
+
+def test_answer_pairs_do_not_cross_lines_or_take_bare_lowercase_letters():
+    text = "Figure 12\na clock\nSection 3 b shows\n4 c\n5. c\n6 (d)\n7 E"
+    assert parse_answer_key_text(text) == {5: "C", 6: "D", 7: "E"}
+
+
+def test_groq_answer_key_fallback_is_sent_in_chunks(monkeypatch):
+    import json
+    import sys
+    import types
+
+    import extractor
+
+    prompts = []
+
+    class FakeCompletions:
+        def create(self, messages, **kwargs):
+            prompt = messages[0]["content"]
+            prompts.append(prompt)
+            numbers = sorted({int(n) for n in re.findall(r"^(\d+) is ", prompt, re.MULTILINE)})
+            content = json.dumps({"answers": [{"question_number": n, "answer": "B"} for n in numbers]})
+            return types.SimpleNamespace(choices=[types.SimpleNamespace(message=types.SimpleNamespace(content=content))])
+
+    class FakeGroq:
+        def __init__(self, api_key):
+            self.chat = types.SimpleNamespace(completions=FakeCompletions())
+
+    monkeypatch.setitem(sys.modules, "groq", types.SimpleNamespace(Groq=FakeGroq))
+    monkeypatch.setenv("GROQ_API_KEY", "test")
+    text = "".join(f"{n} is option two\n" for n in range(1, 301))
+
+    result = extractor._parse_answer_key_with_groq(text)
+
+    assert len(prompts) > 1
+    assert all(len(prompt) < 2 * extractor.ANSWER_KEY_CHUNK_CHARS for prompt in prompts)
+    assert result["status"] == "success"
+    assert [item["question_number"] for item in result["answer_key"]["answers"]] == list(range(1, 301))
+
+
+def _sample_pdf_with_diagrams() -> bytes:
+    import io
+
+    import fitz
+    from PIL import Image
+
+    def png(color, size=(120, 80)):
+        out = io.BytesIO()
+        Image.new("RGB", size, color).save(out, format="PNG")
+        return out.getvalue()
+
+    logo = png("gray", (60, 30))
+    doc = fitz.open()
+    for _ in range(3):
+        doc.new_page()
+    page1, page2, page3 = doc
+    for page in doc:
+        page.insert_image(fitz.Rect(500, 10, 560, 40), stream=logo)  # header on every page
+    page1.insert_text((50, 100), "1. Which circuit shows resistors in series?")
+    page1.insert_image(fitz.Rect(50, 120, 170, 200), stream=png("red"))
+    page1.insert_text((50, 500), "2. A ray diagram of a convex lens is shown.")
+    page2.insert_image(fitz.Rect(50, 60, 170, 140), stream=png("green"))  # continues Q2
+    page2.insert_text((50, 300), "3. Compare the two velocity-time graphs.")
+    page2.insert_image(fitz.Rect(50, 320, 170, 400), stream=png("blue"))
+    page2.insert_image(fitz.Rect(50, 420, 170, 500), stream=png("yellow"))
+    page3.insert_text((50, 100), "4. State Newton's first law of motion.")
+    return doc.tobytes()
+
+
+def test_images_attached_by_page_and_position(monkeypatch):
+    pytest.importorskip("fitz")
+    pytest.importorskip("PIL")
+    import io
+
+    from PIL import Image
+
+    import extractor
+    from extractor import attach_images_to_questions
+
+    opened = []
+    real_open_pdf = extractor.open_pdf
+    monkeypatch.setattr(extractor, "open_pdf", lambda source: opened.append(real_open_pdf(source)) or opened[-1])
+    mcqs = [
+        {"question": "Which circuit shows resistors in series?"},
+        {"question": "A ray diagram of a convex lens is shown."},
+        {"question": "Compare the two velocity-time graphs."},
+        {"question": "State Newton's first law of motion."},
+    ]
+    attach_images_to_questions(_sample_pdf_with_diagrams(), mcqs)
+
+    assert [mcq.get("page_no") for mcq in mcqs] == [1, 1, 2, 3]
+    assert mcqs[0]["bbox"][1] < 100 < mcqs[0]["bbox"][3]
+
+    def image(mcq):
+        return Image.open(io.BytesIO(mcq["image_data"])).convert("RGB")
+
+    assert image(mcqs[0]).getpixel((10, 10)) == (255, 0, 0)
+    assert image(mcqs[1]).getpixel((10, 10)) == (0, 128, 0)
+    graphs = image(mcqs[2])  # both graphs, stacked
+    assert graphs.size == (120, 160)
+    assert graphs.getpixel((10, 10)) == (0, 0, 255) and graphs.getpixel((10, 150)) == (255, 255, 0)
+    assert "image_data" not in mcqs[3]  # only the repeated header logo is on its page
+    assert opened and all(doc.is_closed for doc in opened)
+
+
+def _paged_paper(pages: int = 4, per_page: int = 3) -> bytes:
+    import fitz
+
+    doc = fitz.open()
+    number = 1
+    for index in range(pages):
+        page = doc.new_page()
+        lines = ["PHYSICS - Paper I"] if index == 0 else []
+        if index == 2:
+            lines.append("A. Metre  B. Second  C. Kelvin  D. Ampere")  # options of the question split across pages
+        for _ in range(per_page):
+            lines.append(f"{number}. Which of the following is the SI base unit number {number}?")
+            if not (index == 1 and _ == per_page - 1):
+                lines.append("A. Metre  B. Second  C. Kelvin  D. Ampere")
+            number += 1
+        page.insert_text((50, 60), "\n".join(lines), fontsize=10)
+    return doc.tobytes()
+
+
+def test_questions_stream_page_by_page():
+    pytest.importorskip("fitz")
+    from extractor import iter_questions_from_pdf
+
+    batches = list(iter_questions_from_pdf(_paged_paper(), skip_ocr=True, pages_per_batch=1))
+
+    assert [batch.pages_done for batch in batches] == [1, 2, 3, 4, 4]
+    assert batches[-1].layout_done and not batches[-1].questions
+    # The last question parsed so far is held back until the next page is read.
+    assert [len(batch.questions) for batch in batches[:4]] == [2, 2, 4, 4]
+    questions = [mcq for batch in batches for mcq in batch.questions]
+    assert [mcq["question_no"] for mcq in questions] == list(range(1, 13))
+    split = questions[5]
+    assert len(split["options"]) == 4 and split["page_no"] == 2
+
+
+def test_a_failing_page_raises_after_the_earlier_batches(monkeypatch):
+    pytest.importorskip("fitz")
+    import extractor
+
+    real = extractor._page_texts
+
+    def breaks_on_page_three(source, skip_ocr):
+        for index, total, text in real(source, skip_ocr):
+            if index == 2:
+                raise RuntimeError("broken page")
+            yield index, total, text
+
+    monkeypatch.setattr(extractor, "_page_texts", breaks_on_page_three)
+    batches = extractor.iter_questions_from_pdf(_paged_paper(), skip_ocr=True, pages_per_batch=1)
+
+    assert [batch.pages_done for batch in (next(batches), next(batches))] == [1, 2]
+    with pytest.raises(extractor.PDFExtractionError, match="after 2 of 4 pages: broken page"):
+        next(batches)
+
+
+def _two_column_paper(pages: int = 2, per_column: int = 3) -> bytes:
+    import fitz
+
+    doc = fitz.open()
+    number = 1
+    for index in range(pages):
+        page = doc.new_page()
+        columns = []
+        for _ in range(2):
+            rows = []
+            for _ in range(per_column):
+                rows.append([f"{number}. A body of mass {number} kg moves with uniform"])
+                rows.append(["velocity. Which quantity stays constant?"])
+                rows.append(["(a) its momentum", "(b) its acceleration"])
+                rows.append(["(c) its position", "(d) its weight"])
+                number += 1
+            columns.append(rows)
+        # Drawn row by row across both columns, so plain text output interleaves them.
+        for row in range(len(columns[0])):
+            for x, column in ((40, columns[0]), (310, columns[1])):
+                for offset, cell in enumerate(column[row]):
+                    page.insert_text((x + offset * 120, 80 + row * 18), cell, fontsize=9)
+        page.insert_text((280, 820), f"Page {index + 1} of {pages}", fontsize=8)
+    return doc.tobytes()
+
+
+def test_two_column_layout_is_read_column_by_column():
+    pytest.importorskip("fitz")
+    import fitz
+
+    from extractor import iter_questions_from_pdf
+    from pdf_layout import OPTION, PageReader
+
+    pdf = _two_column_paper()
+    lines = PageReader().lines(fitz.open(stream=pdf, filetype="pdf")[0])
+    assert [line.text for line in lines[:6]] == [
+        "1. A body of mass 1 kg moves with uniform",
+        "velocity. Which quantity stays constant?",
+        "A. its momentum",
+        "B. its acceleration",
+        "C. its position",
+        "D. its weight",
+    ]
+    assert lines[2].kind == OPTION and lines[-1].column == 2
+    assert not any("Page" in line.text for line in lines)
+
+    questions = [mcq for batch in iter_questions_from_pdf(pdf, skip_ocr=True) for mcq in batch.questions]
+    assert [mcq["question_no"] for mcq in questions] == list(range(1, 13))
+    assert questions[4]["options"] == ["its momentum", "its acceleration", "its position", "its weight"]
+    assert questions[4]["page_no"] == 1 and questions[4]["bbox"][0] >= 300
+
+
+def test_most_confident_local_parser_wins_and_groq_runs_only_below_threshold(monkeypatch):
+    import extractor
+    from parser_registry import PARSER_CONFIDENCE_THRESHOLD, run_parsers
+
+    groq_calls = []
+    monkeypatch.setattr(extractor, "validate_and_structure_with_groq", lambda text: groq_calls.append(text) or [])
+
+    numbered = "PHYSICS - Paper I\n" + "\n".join(
+        f"{n}. Which of the following is the SI base unit number {n}?\nA. Metre B. Second C. Kelvin D. Ampere"
+        for n in range(1, 7)
+    )
+    candidates = run_parsers(extractor.clean_text(numbered), "PHYSICS")
+    assert candidates[0].name == "physics" and candidates[0].confidence >= PARSER_CONFIDENCE_THRESHOLD
+    assert [c.confidence for c in candidates] == sorted((c.confidence for c in candidates), reverse=True)
+
+    # No numbers on the paper: the block parser is the one that copes.
+    unnumbered = "\n".join(
+        f"What is measured by instrument {n} in the laboratory?\nA) mass\nB) length\nC) time\nD) current"
+        for n in range(6)
+    )
+    mcqs = extractor._extract_questions(None, True, text=unnumbered, images=False)
+    assert len(mcqs) == 6 and mcqs[0]["options"] == ["mass", "length", "time", "current"]
+    assert not groq_calls
+
+    prose = "This paper has no multiple choice questions. " * 10
+    assert extractor._extract_questions(None, True, text=prose, images=False) == []
+    assert len(groq_calls) == 1
+
+
+def test_extraction_benchmark_reports_parser_stages(tmp_path):
+    pytest.importorskip("fitz")
+    import json
+    import subprocess
+    import sys
+    from pathlib import Path
+
+    backend = Path(__file__).resolve().parent.parent
+    paper = tmp_path / "text-paged.pdf"
+    paper.write_bytes(_paged_paper())
+
+    proc = subprocess.run(
+        [sys.executable, "benchmarks/extraction.py", "--worker", str(paper), "--runs", "1"],
+        cwd=backend, capture_output=True, text=True, check=True,
+    )
+
+    stages = json.loads(proc.stdout.strip().splitlines()[-1])["stages"]
+    assert any(name.startswith("parser_") for name in stages), sorted(stages)
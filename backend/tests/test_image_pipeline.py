@@ -0,0 +1,72 @@
+import io
+
+import pytest
+
+PIL = pytest.importorskip("PIL")
+from PIL import Image
+
+import image_pipeline
+
+
+def _png(img) -> bytes:
+    out = io.BytesIO()
+    img.save(out, format="PNG")
+    return out.getvalue()
+
+
+def test_large_scan_is_downsampled_and_thumbnailed():
+    noise = Image.effect_noise((1600, 1000), 60).convert("RGB")
+    raw = _png(noise)
+
+    result = image_pipeline.process_image(raw)
+
+    stored = Image.open(io.BytesIO(result["image_data"]))
+    assert max(stored.size) == image_pipeline.IMAGE_MAX_DIMENSION
+    assert len(result["image_data"]) < len(raw)
+    thumb = Image.open(io.BytesIO(result["thumbnail_data"]))
+    assert max(thumb.size) <= image_pipeline.IMAGE_THUMBNAIL_DIMENSION
+    assert result["image_type"] == thumb.format.lower()
+
+
+def test_line_art_stays_lossless_and_metadata_is_dropped():
+    diagram = Image.new("RGB", (400, 300), "white")
+    for x in range(50, 350):
+        diagram.putpixel((x, 150), (0, 0, 0))
+    out = io.BytesIO()
+    diagram.save(out, format="PNG", pnginfo=_text_chunk("Author", "scanner"))
+
+    result = image_pipeline.process_image(out.getvalue())
+
+    stored = Image.open(io.BytesIO(result["image_data"]))
+    assert "Author" not in stored.info
+    assert list(stored.convert("RGB").getdata()) == list(diagram.getdata())
+
+
+def test_kept_original_loses_its_exif_and_xmp():
+    photo = Image.effect_noise((320, 240), 40).convert("RGB")
+    exif = Image.Exif()
+    exif[0x010F] = "SecretCam"  # Make
+    out = io.BytesIO()
+    photo.save(out, format="JPEG", quality=20, exif=exif, comment=b"owner")
+    xmp = b"http://ns.adobe.com/xap/1.0/\x00<x:xmpmeta>gps</x:xmpmeta>"
+    raw = out.getvalue()[:2] + b"\xff\xe1" + (len(xmp) + 2).to_bytes(2, "big") + xmp + out.getvalue()[2:]
+
+    result = image_pipeline.process_image(raw)
+
+    assert result["image_type"] == "jpeg"  # Smaller than any re-encode at IMAGE_QUALITY
+    for secret in (b"SecretCam", b"xmpmeta", b"owner"):
+        assert secret in raw and secret not in result["image_data"]
+    stored = Image.open(io.BytesIO(result["image_data"]))
+    assert list(stored.getdata()) == list(Image.open(io.BytesIO(raw)).getdata())
+
+
+def test_undecodable_bytes_are_skipped():
+    assert image_pipeline.process_images([b"not an image"]) == [None]
+
+
+def _text_chunk(key, value):
+    from PIL import PngImagePlugin
+
+    info = PngImagePlugin.PngInfo()
+    info.add_text(key, value)
+    return info
@@ -0,0 +1,124 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import local_ai
+
+
+def test_concurrent_prompts_are_batched(monkeypatch):
+    """Concurrent requests of one type share a batched generate call."""
+    batches = []
+    release = threading.Event()
+
+    def fake_run_batch(prompts, kwargs):
+        release.wait(5)
+        batches.append((list(prompts), kwargs["num_beams"]))
+        return [prompt.upper() for prompt in prompts]
+
+    monkeypatch.setattr(local_ai, "_run_batch", fake_run_batch)
+    server = local_ai.LocalInferenceServer(max_batch_size=4, max_wait_ms=200)
+    try:
+        with ThreadPoolExecutor(max_workers=8) as pool:
+            futures = [pool.submit(server.generate, f"hint {i}", "hint") for i in range(8)]
+            release.set()
+            results = [f.result(timeout=10) for f in futures]
+    finally:
+        server.stop(timeout=5)
+
+    assert results == [f"HINT {i}" for i in range(8)]
+    assert all(len(prompts) <= 4 for prompts, _ in batches)
+    assert len(batches) < 8
+    assert {beams for _, beams in batches} == {1}
+
+
+def test_request_types_use_their_own_profile(monkeypatch):
+    """Explanations and hints are never mixed in one generate call."""
+    seen = []
+
+    def fake_run_batch(prompts, kwargs):
+        seen.append((tuple(prompts), kwargs["num_beams"], kwargs["max_new_tokens"]))
+        return list(prompts)
+
+    monkeypatch.setattr(local_ai, "_run_batch", fake_run_batch)
+    server = local_ai.LocalInferenceServer(max_batch_size=8, max_wait_ms=100)
+    try:
+        explain = server.submit("explain", "explanation")
+        hint = server.submit("hint", "hint")
+        assert explain.result(timeout=5) == "explain"
+        assert hint.result(timeout=5) == "hint"
+    finally:
+        server.stop(timeout=5)
+
+    assert sorted(seen) == [(("explain",), 4, 180), (("hint",), 1, 120)]
+
+
+def test_batch_errors_reach_every_caller(monkeypatch):
+    def failing_run_batch(prompts, kwargs):
+        raise local_ai.LocalAIUnavailable("model missing")
+
+    monkeypatch.setattr(local_ai, "_run_batch", failing_run_batch)
+    server = local_ai.LocalInferenceServer(max_batch_size=2, max_wait_ms=50)
+    try:
+        futures = [server.submit("a", "hint"), server.submit("b", "hint")]
+        for future in futures:
+            try:
+                future.result(timeout=5)
+            except local_ai.LocalAIUnavailable:
+                continue
+            raise AssertionError("expected LocalAIUnavailable")
+    finally:
+        server.stop(timeout=5)
+
+
+def test_a_timed_out_request_is_cancelled_and_reported_unavailable(monkeypatch):
+    release = threading.Event()
+    batches = []
+
+    def slow_run_batch(prompts, kwargs):
+        release.wait(5)
+        batches.append(list(prompts))
+        return list(prompts)
+
+    monkeypatch.setattr(local_ai, "_run_batch", slow_run_batch)
+    monkeypatch.setattr(local_ai, "REQUEST_TIMEOUT_SECONDS", 0.2)
+    server = local_ai.LocalInferenceServer(max_batch_size=1, max_wait_ms=0)
+    try:
+        busy = server.submit("busy", "hint")
+        try:
+            server.generate("queued", "hint")
+        except local_ai.LocalAIUnavailable as exc:
+            assert "0.2s" in str(exc)
+        else:
+            raise AssertionError("expected LocalAIUnavailable")
+        release.set()
+        assert busy.result(timeout=5) == "busy"
+    finally:
+        server.stop(timeout=5)
+
+    assert batches == [["busy"]]  # The timed-out prompt never reached the model
+
+
+def test_stopping_fails_the_requests_still_queued(monkeypatch):
+    started = threading.Event()
+    release = threading.Event()
+
+    def slow_run_batch(prompts, kwargs):
+        started.set()
+        release.wait(5)
+        return list(prompts)
+
+    monkeypatch.setattr(local_ai, "_run_batch", slow_run_batch)
+    server = local_ai.LocalInferenceServer(max_batch_size=1, max_wait_ms=0)
+    busy = server.submit("busy", "hint")
+    assert started.wait(5)
+    queued = [server.submit(f"queued {i}", "hint") for i in range(3)]
+
+    server.stop(timeout=0.1)
+
+    for future in queued:
+        try:
+            future.result(timeout=1)
+        except local_ai.LocalAIUnavailable:
+            continue
+        raise AssertionError("expected LocalAIUnavailable")
+    release.set()
+    assert busy.result(timeout=5) == "busy"
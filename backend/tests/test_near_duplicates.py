@@ -0,0 +1,103 @@
+from fastapi.testclient import TestClient
+
+from main import app
+from near_duplicates import fingerprint, is_near_duplicate
+
+client = TestClient(app)
+
+PENDULUM = "The time period of a simple pendulum depends upon which of the following quantities?"
+PENDULUM_OPTIONS = ["Mass of bob", "Length of string", "Amplitude", "Material of bob"]
+
+
+def test_fingerprints_match_reformatted_and_ocr_variants_only():
+    original = fingerprint(PENDULUM, PENDULUM_OPTIONS)
+
+    variants = [
+        ("12. The time period of a simple  pendulum depends upon which of the following quantities ?",
+         PENDULUM_OPTIONS),
+        ("The tirne period of a simple pendulurn depends upon which of the fo11owing quantities?", PENDULUM_OPTIONS),
+        (PENDULUM, list(reversed(PENDULUM_OPTIONS))),
+    ]
+    for question, options in variants:
+        assert is_near_duplicate(original, fingerprint(question, options)), question
+
+    distinct = [
+        (PENDULUM.replace("depends", "does not depend"), PENDULUM_OPTIONS),
+        (PENDULUM, ["Gravity", "Length of string", "Temperature", "Latitude"]),
+        ("A force of 10 N acts on a mass of 2 kg. What is its acceleration?", ["5 m/s2", "20 m/s2"]),
+    ]
+    for question, options in distinct:
+        assert not is_near_duplicate(original, fingerprint(question, options)), question
+    force = fingerprint(*distinct[2])
+    assert not is_near_duplicate(force, fingerprint(distinct[2][0].replace("10 N", "20 N"), distinct[2][1]))
+
+
+def test_ingest_skips_near_duplicates_and_lists_clusters(monkeypatch):
+    import main
+    from db import SessionLocal
+    from models import Question
+    from near_duplicates import index_missing
+    from tests.test_api import _streamed
+
+    batches = [
+        [
+            {"question": PENDULUM, "options": PENDULUM_OPTIONS, "correct_option": 1},
+            {"question": "Which quantity is conserved in an elastic collision?", "options": ["Momentum", "Heat"]},
+            {"question": PENDULUM.upper(), "options": PENDULUM_OPTIONS, "correct_option": 1},
+        ],
+        [{"question": "1. " + PENDULUM, "options": list(reversed(PENDULUM_OPTIONS))}],
+    ]
+    monkeypatch.setattr(main, "iter_questions_from_pdf", _streamed(lambda path: batches.pop(0)))
+    monkeypatch.setattr(main, "generate_explanations", lambda filename: None)
+    monkeypatch.setattr(main, "DUPLICATE_POLICY", "skip")
+
+    first = client.post("/upload", files={"file": ("paper-a.pdf", b"%PDF-1.4 a", "application/pdf")}).json()
+    assert (first["saved_count"], first["total_parsed"], first["duplicate_count"]) == (2, 3, 1)
+    assert "skipped" in first["message"]
+    second = client.post("/upload", files={"file": ("paper-b.pdf", b"%PDF-1.4 b", "application/pdf")}).json()
+    assert (second["saved_count"], second["duplicate_count"]) == (0, 1)
+
+    # Rows written before the index existed are picked up by the backfill.
+    db = SessionLocal()
+    try:
+        legacy = [
+            Question(
+                question="Which colour of visible light has the longest wavelength?",
+                options=["Red", "Violet"],
+                source_file=name,
+            )
+            for name in ("old-1.pdf", "old-2.pdf", "old-3.pdf")
+        ]
+        db.add_all(legacy)
+        db.commit()
+        legacy_ids = [question.id for question in legacy]
+        indexed, duplicates = index_missing(db, chunk_size=2)
+    finally:
+        db.close()
+    assert indexed >= 3 and duplicates >= 2
+
+    clusters = {cluster["canonical_id"]: cluster for cluster in client.get("/questions/duplicates").json()}
+    assert clusters[legacy_ids[0]]["question_ids"] == legacy_ids
+    assert clusters[legacy_ids[0]]["source_files"] == ["old-1.pdf", "old-2.pdf", "old-3.pdf"]
+
+
+def test_near_duplicates_are_saved_and_flagged_by_default(monkeypatch):
+    import main
+    from tests.test_api import _streamed
+
+    question = "A ray of light passes from glass into air. Which of these quantities stays the same?"
+    options = ["Frequency", "Speed", "Wavelength", "Direction"]
+    monkeypatch.setattr(main, "iter_questions_from_pdf", _streamed(lambda path: [
+        {"question": question, "options": options},
+        {"question": question.upper(), "options": list(reversed(options))},
+    ]))
+    monkeypatch.setattr(main, "generate_explanations", lambda filename: None)
+
+    assert main.DUPLICATE_POLICY == "flag"
+    body = client.post("/upload", files={"file": ("paper-flag.pdf", b"%PDF-1.4 f", "application/pdf")}).json()
+    assert (body["saved_count"], body["duplicate_count"]) == (2, 1)
+    assert "saved and flagged" in body["message"]
+
+    clusters = client.get("/questions/duplicates").json()
+    flagged = [cluster for cluster in clusters if cluster["source_files"] == ["paper-flag.pdf"]]
+    assert len(flagged) == 1 and len(flagged[0]["question_ids"]) == 2
@@ -0,0 +1,140 @@
+from question_cache import LRUCacheBackend, QuestionCache
+
+
+def _entry(question_id, text="question"):
+    return {"payload": {"id": question_id, "question": text}, "updated_at": None}
+
+
+def test_read_through_and_hit_rate():
+    cache = QuestionCache(LRUCacheBackend(max_entries=10, max_bytes=10_000, ttl=0))
+    loads = []
+
+    def loader(question_id):
+        loads.append(question_id)
+        return _entry(question_id)
+
+    for _ in range(3):
+        assert cache.get_question(1, loader)["payload"]["id"] == 1
+    assert loads == [1]
+    stats = cache.stats()
+    assert (stats["hits"], stats["misses"]) == (2, 1)
+    assert stats["hit_rate"] == round(2 / 3, 4)
+
+
+def test_bulk_lookup_loads_misses_once():
+    cache = QuestionCache(LRUCacheBackend(max_entries=10, max_bytes=10_000, ttl=0))
+    cache.get_question(2, _entry)
+    batches = []
+
+    def loader(ids):
+        batches.append(sorted(ids))
+        return {qid: _entry(qid) for qid in ids}
+
+    entries = cache.get_questions([3, 2, 4], loader)
+    assert [e["payload"]["id"] for e in entries] == [3, 2, 4]
+    assert batches == [[3, 4]]
+
+
+def test_lru_evicts_by_entries_and_bytes():
+    backend = LRUCacheBackend(max_entries=2, max_bytes=10_000, ttl=0)
+    backend.set("a", "x")
+    backend.set("b", "x")
+    backend.get("a")
+    backend.set("c", "x")
+    assert backend.get("b") is None
+    assert backend.get("a") == "x"
+
+    small = LRUCacheBackend(max_entries=100, max_bytes=50, ttl=0)
+    small.set("a", "x" * 30)
+    small.set("b", "x" * 30)
+    assert small.get("a") is None
+    assert small.get("b") is not None
+
+
+def test_version_change_clears_local_entries():
+    cache = QuestionCache(LRUCacheBackend(max_entries=10, max_bytes=10_000, ttl=0), version_check_seconds=0)
+    version = [1]
+    cache.sync_version(lambda: version[0])
+    cache.get_question(1, _entry)
+    cache.get_pool(None, lambda topic: [1])
+
+    cache.sync_version(lambda: version[0])
+    assert cache.backend.get("q:1") is not None
+
+    version[0] = 2
+    cache.sync_version(lambda: version[0])
+    assert cache.backend.get("q:1") is None
+    assert cache.backend.get("pool:") is None
+
+
+def test_own_writes_keep_the_cache_and_foreign_writes_clear_it():
+    cache = QuestionCache(LRUCacheBackend(max_entries=10, max_bytes=10_000, ttl=0), version_check_seconds=0)
+    version = [1]
+    cache.sync_version(lambda: version[0])
+    cache.get_question(1, _entry)
+
+    version[0] = 3
+    cache.note_local_bumps(2)
+    cache.sync_version(lambda: version[0])
+    assert cache.backend.get("q:1") is not None
+
+    version[0] = 4  # Bumped by another worker
+    cache.sync_version(lambda: version[0])
+    assert cache.backend.get("q:1") is None
+
+
+def test_topic_pools_are_normalized_and_bounded(monkeypatch):
+    import question_cache
+
+    monkeypatch.setattr(question_cache, "MAX_TOPIC_POOLS", 2)
+    cache = QuestionCache(LRUCacheBackend(max_entries=100, max_bytes=100_000, ttl=0))
+    topics = []
+
+    def loader(topic):
+        topics.append(topic)
+        return [1]
+
+    cache.get_pool("  Simple   Harmonic ", loader)
+    cache.get_pool("simple harmonic", loader)
+    assert topics == ["simple harmonic"]
+
+    cache.get_pool(None, loader)
+    for topic in ("optics", "waves", "torque"):
+        cache.get_pool(topic, loader)
+    assert cache.backend.get("pool:simple harmonic") is None
+    assert cache.backend.get("pool:optics") is None
+    assert cache.backend.get("pool:waves") is not None and cache.backend.get("pool:torque") is not None
+    assert cache.backend.get("pool:") is not None  # The all-questions pool does not count
+
+
+def test_explanation_write_keeps_other_cached_questions(monkeypatch):
+    import main
+    from question_cache import question_cache
+    from tests.test_api import _create_question, client
+
+    monkeypatch.setattr(question_cache, "version_check_seconds", 0)
+    monkeypatch.setattr(question_cache, "_next_version_check", 0.0)
+    first = _create_question(question="Cache coherence: first?")
+    second = _create_question(question="Cache coherence: second?")
+    client.get(f"/questions/{first}")
+    client.get(f"/questions/{second}")
+
+    main._save_explanation(first, "Because.")
+    assert client.get(f"/questions/{first}").json()["explanation"] == "Because."
+    assert question_cache.backend.get(f"q:{second}") is not None
+
+
+def test_redis_size_does_not_walk_the_keys():
+    from question_cache import RedisCacheBackend
+
+    class FakeRedis:
+        def dbsize(self):
+            return 42
+
+        def scan_iter(self, match=None):
+            raise AssertionError("size() must not scan every key")
+
+    backend = RedisCacheBackend.__new__(RedisCacheBackend)
+    backend._client, backend._prefix = FakeRedis(), "quiz:"
+
+    assert QuestionCache(backend).stats()["entries"] == 42
@@ -0,0 +1,63 @@
+from fastapi.testclient import TestClient
+
+from main import app
+from tests.test_api import _create_question
+
+client = TestClient(app)
+
+
+def test_stats_follow_flushed_attempts_and_match_a_rebuild():
+    from attempts import attempt_buffer
+    from db import SessionLocal
+    from question_stats import rebuild
+
+    source_file = "stats-paper.pdf"
+    easy = _create_question(question="Stats: easy question?", source_file=source_file, correct_option=0)
+    hard = _create_question(question="Stats: hard question?", source_file=source_file, correct_option=3)
+
+    for answer in (0, 0, 0, 1):
+        attempt_buffer.record(easy, answer, answer == 0, "feedback")
+    attempt_buffer.flush()
+    # A second flush adds to the existing counters.
+    for answer in (3, 1, 2, None):
+        attempt_buffer.record(hard, answer, answer == 3, "feedback")
+    attempt_buffer.record(easy, None, False, "feedback")
+    attempt_buffer.flush()
+
+    def snapshot():
+        rows = client.get(f"/stats/questions?source_file={source_file}&sort=hardest").json()
+        sources = {row["source_file"]: row for row in client.get("/stats/sources").json()}
+        return rows, sources[source_file]
+
+    rows, source = snapshot()
+    assert [row["question_id"] for row in rows] == [hard, easy]
+    assert rows[0]["option_counts"] == [0, 1, 1, 1, 0] and rows[0]["skipped"] == 1
+    assert (rows[1]["attempts"], rows[1]["correct"], rows[1]["accuracy"]) == (5, 3, 0.6)
+    assert rows[1]["question"] == "Stats: easy question?"
+    assert (source["attempts"], source["correct"], source["difficulty"]) == (9, 4, round(1 - 4 / 9, 4))
+    assert client.get(f"/stats/questions/{easy}").json()["option_counts"] == [3, 1, 0, 0, 0]
+
+    db = SessionLocal()
+    try:
+        rebuild(db)
+    finally:
+        db.close()
+    assert snapshot() == (rows, source)
+
+    assert client.get("/stats/questions?sort=bogus").status_code == 400
+    assert client.get("/stats/questions/999999").status_code == 404
+
+
+def test_deleting_every_question_clears_the_stats():
+    from attempts import attempt_buffer
+
+    question_id = _create_question(question="Stats: deleted with the bank?", source_file="stats-deleted.pdf")
+    attempt_buffer.record(question_id, 0, True, "feedback")
+    attempt_buffer.flush()
+    assert client.get(f"/stats/questions/{question_id}").status_code == 200
+
+    assert client.delete("/questions/all").json()["status"] == "success"
+
+    assert client.get(f"/stats/questions/{question_id}").status_code == 404
+    assert client.get("/stats/questions").json() == []
+    assert client.get("/stats/sources").json() == []
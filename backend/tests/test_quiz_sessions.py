@@ -0,0 +1,78 @@
+from datetime import datetime, timedelta
+
+from fastapi.testclient import TestClient
+
+from main import app
+from tests.test_api import _create_question
+
+client = TestClient(app)
+
+
+def test_session_serves_pinned_questions_in_order_and_scores_answers():
+    from question_cache import question_cache
+
+    topic = "session-topic"
+    ids = [
+        _create_question(question=f"Which {topic} quantity is number {n}?", correct_option=n % 2)
+        for n in range(4)
+    ]
+    ids.append(_create_question(question=f"Ungraded {topic} question?", correct_option=None))
+
+    created = client.post("/quiz/sessions", json={"limit": 10, "topic": topic})
+    assert created.status_code == 201
+    session = created.json()
+    session_id = session["session_id"]
+    assert (session["total"], session["answered"], session["position"]) == (5, 0, 0)
+    assert session["question"]["correct_option"] is None and session["question"]["explanation"] is None
+
+    served = []
+    question = session["question"]
+    hits = question_cache.stats()["hits"]
+    for position in range(5):
+        served.append(question["id"])
+        answer = 0
+        response = client.post(f"/quiz/sessions/{session_id}/answers", json={"position": position, "answer": answer})
+        assert response.status_code == 200
+        body = response.json()
+        assert body["result"]["question_id"] == question["id"]
+        correct_option = body["result"]["correct_option"]
+        assert body["result"]["is_correct"] == (None if correct_option is None else correct_option == answer)
+        question = body["question"]
+    assert sorted(served) == sorted(ids)
+    # Upcoming questions were prefetched, so the rest of the quiz came from the cache.
+    assert question_cache.stats()["hits"] > hits
+    assert body["finished"] and body["question"] is None and body["position"] is None
+
+    # A retry of the same answer is idempotent; changing it is a conflict.
+    assert client.post(f"/quiz/sessions/{session_id}/answers", json={"position": 0, "answer": 0}).status_code == 200
+    assert client.post(f"/quiz/sessions/{session_id}/answers", json={"position": 0, "answer": 1}).status_code == 409
+
+    score = client.get(f"/quiz/sessions/{session_id}/score").json()
+    assert (score["answered"], score["graded"], score["score"]) == (5, 4, 2)
+    assert score["percentage"] == 50.0
+    assert [result["question_id"] for result in score["results"]] == served
+
+
+def test_session_answers_must_follow_order_and_expire():
+    import main
+    from models import QuizSession
+
+    _create_question(question="Expiring session question about torque?")
+    session = client.post("/quiz/sessions", json={"limit": 2, "topic": "torque"}).json()
+    session_id = session["session_id"]
+
+    ahead = client.post(f"/quiz/sessions/{session_id}/answers", json={"position": 1, "answer": 0})
+    assert ahead.status_code in (400, 409)
+    bad = client.post(f"/quiz/sessions/{session_id}/answers", json={"position": 0, "answer": 9})
+    assert bad.status_code == 400
+    assert client.get("/quiz/sessions/not-a-session").status_code == 404
+
+    db = main.SessionLocal()
+    try:
+        db.query(QuizSession).filter(QuizSession.id == session_id).update(
+            {QuizSession.expires_at: datetime.utcnow() - timedelta(seconds=1)}
+        )
+        db.commit()
+    finally:
+        db.close()
+    assert client.get(f"/quiz/sessions/{session_id}").status_code == 410
@@ -0,0 +1,92 @@
+from datetime import datetime, timedelta
+
+from fastapi.testclient import TestClient
+
+from main import app
+from tests.test_api import _create_question
+
+client = TestClient(app)
+
+
+def test_sm2_intervals_grow_on_success_and_reset_on_lapse():
+    from db import SessionLocal
+    from review_schedule import MIN_EASE, RELEARN_MINUTES, review
+
+    question_id = _create_question(question="Scheduling: what is the unit of power?", correct_option=1)
+    now = datetime(2026, 1, 1)
+    db = SessionLocal()
+    try:
+        intervals = []
+        for _ in range(3):
+            card = review(db, "sm2-learner", question_id, 1, True, now=now)
+            intervals.append(card.interval_days)
+        assert intervals[:2] == [1.0, 6.0] and intervals[2] > 6.0
+        card = review(db, "sm2-learner", question_id, 0, False, now=now)
+        assert (card.repetitions, card.lapses) == (0, 1)
+        assert card.due_at == now + timedelta(minutes=RELEARN_MINUTES)
+        for _ in range(5):
+            card = review(db, "sm2-learner", question_id, None, None, now=now)
+        assert card.ease == MIN_EASE
+        db.rollback()
+    finally:
+        db.close()
+
+
+def test_adaptive_quiz_serves_due_then_new_then_later_questions():
+    from db import SessionLocal
+    from question_cache import question_cache
+    from review_schedule import RELEARN_MINUTES, pick
+
+    topic = "adaptive-topic"
+    learner = "learner-adaptive"
+    ids = [_create_question(question=f"Which {topic} law is number {n}?", correct_option=0) for n in range(3)]
+
+    session = client.post("/quiz/sessions", json={"limit": 10, "topic": topic, "learner_id": learner}).json()
+    assert session["learner_id"] == learner and session["total"] == 3
+    question = session["question"]
+    outcome = {}
+    for position, answer in enumerate((1, 0, None)):  # wrong, right, skipped
+        outcome[question["id"]] = answer
+        body = client.post(
+            f"/quiz/sessions/{session['session_id']}/answers", json={"position": position, "answer": answer}
+        ).json()
+        question = body["question"]
+    assert body["finished"]
+
+    schedule = client.get(f"/learners/{learner}/schedule").json()
+    assert (schedule["cards"], schedule["due"]) == (3, 0) and schedule["next_due_at"]
+
+    failed = {question_id for question_id, answer in outcome.items() if answer != 0}
+    passed = [question_id for question_id, answer in outcome.items() if answer == 0]
+    new = _create_question(question=f"Which {topic} law came last?", correct_option=0)
+    pool = ids + [new]
+    db = SessionLocal()
+    try:
+        later = datetime.utcnow() + timedelta(minutes=RELEARN_MINUTES + 1)
+        picked = pick(db, learner, pool, 10, restrict_to_pool=True, now=later)
+    finally:
+        db.close()
+    # Relearning cards are due first, then the unseen question, then the passed one.
+    assert set(picked[:2]) == failed and picked[2:] == [new] + passed
+
+    question_cache.clear()  # The new question was added behind the cached topic pool
+    quiz = client.get(f"/quiz?topic={topic}&learner_id={learner}&limit=2").json()
+    assert quiz["total"] == 2 and quiz["questions"][0]["id"] == new
+    assert client.get("/quiz?learner_id=").status_code == 400
+
+
+def test_feedback_with_learner_updates_schedule(monkeypatch):
+    import main
+
+    seen = []
+
+    async def fake_feedback(question, options, student_answer, correct_option):
+        seen.append((question, options, correct_option))
+        return "feedback"
+
+    monkeypatch.setattr(main, "groq_generate_feedback_async", fake_feedback)
+    question_id = _create_question(question="Feedback scheduling: unit of charge?", correct_option=2)
+    response = client.post(f"/assistant/feedback?question_id={question_id}&student_answer=2&learner_id=fb-learner")
+    assert response.json() == {"feedback": "feedback", "is_correct": True}
+    assert seen == [("Feedback scheduling: unit of charge?", ["Newton", "Joule", "Watt", "Pascal"], 2)]
+    assert client.get("/learners/fb-learner/schedule").json()["cards"] == 1
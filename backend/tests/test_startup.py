@@ -0,0 +1,20 @@
+import json
+import subprocess
+import sys
+from pathlib import Path
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+
+HEAVY_MODULES = ("fitz", "pdfminer", "pdf2image", "pytesseract", "PIL", "groq", "torch", "transformers")
+
+
+def test_importing_app_keeps_heavy_dependencies_lazy():
+    """Importing main must not pull in PDF/OCR/LLM libraries or touch the DB."""
+    code = (
+        "import json, sys, main; "
+        f"print(json.dumps(sorted(m for m in {HEAVY_MODULES!r} if m in sys.modules)))"
+    )
+    proc = subprocess.run(
+        [sys.executable, "-c", code], cwd=BACKEND_DIR, capture_output=True, text=True, check=True
+    )
+    assert json.loads(proc.stdout.strip().splitlines()[-1]) == []
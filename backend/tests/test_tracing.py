@@ -0,0 +1,110 @@
+import json
+import logging
+
+import pytest
+
+pytest.importorskip("opentelemetry.sdk")
+from fastapi.testclient import TestClient
+from opentelemetry.sdk.trace.export import SimpleSpanProcessor
+from opentelemetry.sdk.trace.export.in_memory_span_exporter import InMemorySpanExporter
+
+import tracing
+from main import app
+
+
+@pytest.fixture
+def spans():
+    exporter = InMemorySpanExporter()
+    assert tracing.configure_tracing(processor=SimpleSpanProcessor(exporter))
+    try:
+        yield exporter
+    finally:
+        tracing.shutdown_tracing()
+
+
+def _pdf_bytes() -> bytes:
+    fitz = pytest.importorskip("fitz")
+    doc = fitz.open()
+    for number in range(2):
+        doc.new_page().insert_text((50, 100), f"{number + 1}. Which quantity is a vector?")
+    return doc.tobytes()
+
+
+def test_extraction_stages_share_one_trace(spans, caplog):
+    from extractor import extract_questions_from_pdf
+
+    with caplog.at_level(logging.INFO, logger="extractor"):
+        with tracing.span("upload") as root:
+            extract_questions_from_pdf(_pdf_bytes(), skip_ocr=True)
+
+    finished = {span.name: span for span in spans.get_finished_spans()}
+    assert {"extract_questions", "extract.pymupdf", "extract.paper_type"} <= set(finished)
+    assert finished["extract.pymupdf"].attributes["pdf.pages"] == 2
+    assert {span.context.trace_id for span in finished.values()} == {root.get_span_context().trace_id}
+
+    trace_id = format(root.get_span_context().trace_id, "032x")
+    assert caplog.records and all(record.trace_id == trace_id for record in caplog.records)
+
+
+def test_groq_answers_and_batch_files_join_the_callers_trace(spans, monkeypatch, tmp_path):
+    import time
+
+    import extractor
+    from batch_ingest import FileProgress, IngestJobs
+    from metrics import llm_call
+    from uploads import SpooledUpload
+
+    def fake_identify(question, options):
+        with llm_call("identify_answer"):
+            return 1
+
+    monkeypatch.setenv("GROQ_API_KEY", "test-key")
+    monkeypatch.setattr(extractor, "identify_correct_answer_with_groq", fake_identify)
+    mcqs = [{"question": f"Q{n}?", "options": ["a", "b"], "correct_option": None} for n in range(3)]
+
+    def ingest(path, name, report):
+        with tracing.span("ingest_file"):
+            return 0, 0
+
+    workdir = tmp_path / "job"
+    workdir.mkdir()
+    files = []
+    for n in range(2):
+        path = workdir / f"paper-{n}.pdf"
+        path.write_bytes(b"%PDF-1.4")
+        files.append(FileProgress(path.name, SpooledUpload(str(path), 8, "")))
+
+    jobs = IngestJobs(workers=2)
+    with tracing.span("upload") as root:
+        extractor.resolve_answers_with_groq(mcqs)
+        job = jobs.start(files, str(workdir), ingest)
+    deadline = time.monotonic() + 5
+    while job.finished_at is None and time.monotonic() < deadline:
+        time.sleep(0.01)
+    jobs.shutdown()
+    assert [mcq["correct_option"] for mcq in mcqs] == [1, 1, 1]
+
+    finished = spans.get_finished_spans()
+    joined = [span for span in finished if span.name in ("groq.identify_answer", "ingest_file")]
+    assert len(joined) == 5
+    assert {span.context.trace_id for span in joined} == {root.get_span_context().trace_id}
+
+
+def test_requests_get_a_root_span_named_after_the_endpoint(spans):
+    TestClient(app).get("/health")
+    names = [span.name for span in spans.get_finished_spans()]
+    assert "GET health_check" in names
+
+
+def test_json_exporter_writes_one_file_per_trace(tmp_path):
+    processor = SimpleSpanProcessor(tracing._json_exporter(tmp_path))
+    assert tracing.configure_tracing(processor=processor)
+    try:
+        with tracing.span("upload"):
+            with tracing.span("extract.ocr_page", page=3):
+                trace_id = tracing.current_trace_id()
+    finally:
+        tracing.shutdown_tracing()
+
+    lines = (tmp_path / f"{trace_id}.jsonl").read_text().splitlines()
+    assert [json.loads(line)["name"] for line in lines] == ["extract.ocr_page", "upload"]
@@ -0,0 +1,190 @@
+"""Per-request tracing with OpenTelemetry.
+
+Every HTTP request gets a root span. Extraction stages (see ``metrics.stage_timer``),
+Groq calls (``metrics.llm_call``) and DB writes open child spans, so one slow
+``/upload`` can be read stage by stage from a single trace. Log lines carry the
+current trace id.
+
+``TRACE_EXPORTER`` selects where spans go:
+
+* ``json``: one JSON-lines file per trace in ``TRACE_DIR``;
+* ``otlp``: a collector at ``OTEL_EXPORTER_OTLP_ENDPOINT`` (needs
+  ``opentelemetry-exporter-otlp``);
+* ``console``: stdout;
+* unset: tracing is off.
+
+``opentelemetry-sdk`` is optional. Without it, ``span`` and ``annotate`` do nothing.
+"""
+
+import importlib.util
+import json
+import logging
+import os
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, Iterator, Optional
+
+logger = logging.getLogger(__name__)
+
+OTEL_AVAILABLE = importlib.util.find_spec("opentelemetry") is not None
+TRACE_EXPORTER = os.getenv("TRACE_EXPORTER", "").lower()
+TRACE_DIR = Path(os.getenv("TRACE_DIR", "traces"))
+SERVICE_NAME = os.getenv("OTEL_SERVICE_NAME", "quiz-backend")
+
+_provider = None
+_tracer = None
+
+
+def _span_context():
+    if _tracer is None:
+        return None
+    from opentelemetry import trace
+
+    context = trace.get_current_span().get_span_context()
+    return context if context.is_valid else None
+
+
+def current_trace_id() -> Optional[str]:
+    context = _span_context()
+    return format(context.trace_id, "032x") if context else None
+
+
+def install_log_correlation() -> None:
+    """Give every log record a ``trace_id`` attribute (``-`` outside a trace)."""
+    previous = logging.getLogRecordFactory()
+    if getattr(previous, "adds_trace_id", False):
+        return
+
+    def factory(*args: Any, **kwargs: Any) -> logging.LogRecord:
+        record = previous(*args, **kwargs)
+        record.trace_id = current_trace_id() or "-"
+        return record
+
+    factory.adds_trace_id = True
+    logging.setLogRecordFactory(factory)
+
+
+def _json_exporter(directory: Path):
+    from opentelemetry.sdk.trace.export import SpanExporter, SpanExportResult
+
+    class JsonFileSpanExporter(SpanExporter):
+        """Append finished spans to ``<directory>/<trace_id>.jsonl``."""
+
+        def export(self, spans) -> "SpanExportResult":
+            directory.mkdir(parents=True, exist_ok=True)
+            by_trace = {}
+            for span in spans:
+                trace_id = format(span.context.trace_id, "032x")
+                by_trace.setdefault(trace_id, []).append(json.loads(span.to_json(indent=None)))
+            for trace_id, items in by_trace.items():
+                with open(directory / f"{trace_id}.jsonl", "a", encoding="utf-8") as handle:
+                    for item in items:
+                        handle.write(json.dumps(item) + "\n")
+            return SpanExportResult.SUCCESS
+
+    return JsonFileSpanExporter()
+
+
+def _make_exporter(kind: str):
+    if kind == "json":
+        return _json_exporter(TRACE_DIR)
+    if kind == "console":
+        from opentelemetry.sdk.trace.export import ConsoleSpanExporter
+
+        return ConsoleSpanExporter()
+    if kind == "otlp":
+        from opentelemetry.exporter.otlp.proto.http.trace_exporter import OTLPSpanExporter
+
+        return OTLPSpanExporter()
+    raise ValueError(f"Unknown TRACE_EXPORTER: {kind}")
+
+
+def configure_tracing(exporter: Optional[str] = None, processor=None) -> bool:
+    """Set up the tracer provider once per process; returns whether tracing is on.
+
+    ``processor`` overrides the exporter (used by tests to capture spans in memory).
+    """
+    global _provider, _tracer
+    kind = (exporter if exporter is not None else TRACE_EXPORTER).lower()
+    if _tracer is not None or (not kind and processor is None):
+        return _tracer is not None
+    if not OTEL_AVAILABLE:
+        logger.warning("TRACE_EXPORTER is set but opentelemetry-sdk is not installed; tracing disabled")
+        return False
+
+    from opentelemetry.sdk.resources import Resource
+    from opentelemetry.sdk.trace import TracerProvider
+    from opentelemetry.sdk.trace.export import BatchSpanProcessor
+
+    try:
+        provider = TracerProvider(resource=Resource.create({"service.name": SERVICE_NAME}))
+        provider.add_span_processor(processor or BatchSpanProcessor(_make_exporter(kind)))
+    except (ImportError, ValueError) as exc:
+        logger.warning(f"Tracing disabled: {exc}")
+        return False
+    _provider, _tracer = provider, provider.get_tracer("quiz")
+    logger.info(f"Tracing enabled ({kind or 'custom processor'})")
+    return True
+
+
+def shutdown_tracing() -> None:
+    """Flush pending spans (called on application shutdown)."""
+    global _provider, _tracer
+    if _provider is not None:
+        _provider.shutdown()
+    _provider = _tracer = None
+
+
+@contextmanager
+def span(name: str, **attributes: Any) -> Iterator[Any]:
+    """Run the block in a child span of the current one (no-op when tracing is off)."""
+    if _tracer is None:
+        yield None
+        return
+    with _tracer.start_as_current_span(name, attributes=_clean(attributes)) as current:
+        yield current
+
+
+def annotate(**attributes: Any) -> None:
+    """Set attributes (page counts, chunk sizes, ...) on the current span."""
+    if _tracer is None:
+        return
+    from opentelemetry import trace
+
+    current = trace.get_current_span()
+    for key, value in _clean(attributes).items():
+        current.set_attribute(key, value)
+
+
+def _clean(attributes: dict) -> dict:
+    return {
+        key: value if isinstance(value, (str, bool, int, float)) else str(value)
+        for key, value in attributes.items()
+        if value is not None
+    }
+
+
+class TracingMiddleware:
+    """Open a root span per HTTP request, named after the routed endpoint."""
+
+    def __init__(self, app) -> None:
+        self.app = app
+
+    async def __call__(self, scope, receive, send) -> None:
+        if scope["type"] != "http" or _tracer is None:
+            await self.app(scope, receive, send)
+            return
+
+        async def send_wrapper(message) -> None:
+            if message["type"] == "http.response.start":
+                current.set_attribute("http.status_code", message["status"])
+            await send(message)
+
+        attributes = {"http.method": scope["method"], "http.target": scope["path"]}
+        with span(f"{scope['method']} {scope['path']}", **attributes) as current:
+            try:
+                await self.app(scope, receive, send_wrapper)
+            finally:
+                endpoint = getattr(scope.get("endpoint"), "__name__", None)
+                if endpoint:
+                    current.update_name(f"{scope['method']} {endpoint}")
@@ -0,0 +1,251 @@
+"""Streamed PDF uploads: written to disk in chunks, size-capped and hashed on the way in.
+
+``UploadLimitMiddleware`` rejects an oversized request with 413 before its body
+is parsed. It checks ``Content-Length`` first, and for chunked bodies it counts
+bytes as they are received. :func:`spool_upload` then copies the parsed file
+part to a temp file one chunk at a time, hashing it on the fly. The extractor
+opens that file by path, so a request never holds the whole PDF in memory.
+
+The limit is ``max_upload_size_mb`` from ``config.Settings``
+(``MAX_UPLOAD_SIZE_MB``, default 15).
+"""
+
+import hashlib
+import json
+import logging
+import os
+import tempfile
+import zipfile
+from contextlib import asynccontextmanager
+from pathlib import PurePosixPath
+from typing import AsyncIterator, Iterable, List, NamedTuple, Optional, Tuple
+
+from fastapi import HTTPException, UploadFile, status
+from fastapi.concurrency import run_in_threadpool
+
+from config import get_settings
+
+logger = logging.getLogger(__name__)
+
+MAX_UPLOAD_BYTES = get_settings().max_upload_size_mb * 1024 * 1024
+CHUNK_SIZE = 1024 * 1024
+# Room for multipart boundaries, part headers and small form fields.
+MULTIPART_OVERHEAD = 64 * 1024
+# Where spooled uploads are written (default: the system temp dir).
+UPLOAD_TMP_DIR = os.getenv("UPLOAD_TMP_DIR") or None
+
+
+class SpooledUpload(NamedTuple):
+    path: str
+    size: int
+    sha256: str
+
+
+def _describe(size: int) -> str:
+    return f"{size // (1024 * 1024)} MB" if size >= 1024 * 1024 else f"{size} byte"
+
+
+def _too_large(max_bytes: int) -> HTTPException:
+    return HTTPException(
+        status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+        detail=f"File exceeds the {_describe(max_bytes)} upload limit",
+    )
+
+
+async def save_upload(
+    file: UploadFile,
+    max_bytes: Optional[int] = None,
+    directory: Optional[str] = None,
+    suffix: str = ".pdf",
+) -> SpooledUpload:
+    """Copy ``file`` to a temp file in chunks, hashing it; the caller deletes the file.
+
+    Raises 413 as soon as the copy passes ``max_bytes`` and 400 for an empty file.
+    """
+    limit = MAX_UPLOAD_BYTES if max_bytes is None else max_bytes
+    digest = hashlib.sha256()
+    size = 0
+    handle = tempfile.NamedTemporaryFile(
+        prefix="upload-", suffix=suffix, dir=directory or UPLOAD_TMP_DIR, delete=False
+    )
+    try:
+        with handle:
+            while chunk := await file.read(CHUNK_SIZE):
+                size += len(chunk)
+                if size > limit:
+                    raise _too_large(limit)
+                digest.update(chunk)
+                await run_in_threadpool(handle.write, chunk)
+        if not size:
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Uploaded file is empty")
+    except BaseException:
+        _remove(handle.name)
+        raise
+    return SpooledUpload(handle.name, size, digest.hexdigest())
+
+
+def _remove(path: str) -> None:
+    try:
+        os.unlink(path)
+    except OSError as exc:
+        logger.warning(f"Could not remove spooled upload {path}: {exc}")
+
+
+def _contents_too_large(max_bytes: int) -> HTTPException:
+    return HTTPException(
+        status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+        detail=f"Unpacked PDFs exceed the {_describe(max_bytes)} batch limit",
+    )
+
+
+def unpack_zip(
+    path: str,
+    directory: str,
+    max_member_bytes: Optional[int] = None,
+    max_files: Optional[int] = None,
+    max_total_bytes: Optional[int] = None,
+) -> List[Tuple[str, SpooledUpload]]:
+    """Stream every PDF in the ZIP at ``path`` into ``directory``; returns ``(name, upload)`` pairs.
+
+    Other members are ignored. Each PDF is held to the upload limit while it is
+    inflated, so a member that lies about its size in the header is still caught.
+    Unpacking stops at the first PDF past ``max_files`` (400) or at the byte
+    that takes the inflated total past ``max_total_bytes`` (413), so a ZIP bomb
+    never writes more than the budget to disk.
+    """
+    limit = MAX_UPLOAD_BYTES if max_member_bytes is None else max_member_bytes
+    unpacked: List[Tuple[str, SpooledUpload]] = []
+    inflated = 0
+    try:
+        with zipfile.ZipFile(path) as archive:
+            for info in archive.infolist():
+                name = PurePosixPath(info.filename).name
+                if info.is_dir() or info.filename.startswith("__MACOSX/") or name.startswith("."):
+                    continue
+                if not name.lower().endswith(".pdf"):
+                    continue
+                if max_files is not None and len(unpacked) >= max_files:
+                    raise HTTPException(
+                        status_code=status.HTTP_400_BAD_REQUEST,
+                        detail=f"ZIP archive holds more PDFs than the batch allows ({max_files} more)",
+                    )
+                if info.file_size > limit:
+                    raise _too_large(limit)
+                budget = None if max_total_bytes is None else max_total_bytes - inflated
+                if budget is not None and info.file_size > budget:
+                    raise _contents_too_large(max_total_bytes)
+                upload = _inflate(archive, info, directory, limit, budget, max_total_bytes)
+                unpacked.append((name, upload))
+                inflated += upload.size
+    except zipfile.BadZipFile as exc:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=f"Invalid ZIP archive: {exc}") from exc
+    except BaseException:
+        for _, upload in unpacked:
+            _remove(upload.path)
+        raise
+    return unpacked
+
+
+def _inflate(
+    archive: zipfile.ZipFile,
+    info: zipfile.ZipInfo,
+    directory: str,
+    limit: int,
+    budget: Optional[int] = None,
+    max_total_bytes: Optional[int] = None,
+) -> SpooledUpload:
+    digest = hashlib.sha256()
+    size = 0
+    handle = tempfile.NamedTemporaryFile(prefix="upload-", suffix=".pdf", dir=directory, delete=False)
+    try:
+        with handle, archive.open(info) as member:
+            while chunk := member.read(CHUNK_SIZE):
+                size += len(chunk)
+                if size > limit:
+                    raise _too_large(limit)
+                if budget is not None and size > budget:
+                    raise _contents_too_large(max_total_bytes)
+                digest.update(chunk)
+                handle.write(chunk)
+    except BaseException:
+        _remove(handle.name)
+        raise
+    return SpooledUpload(handle.name, size, digest.hexdigest())
+
+
+@asynccontextmanager
+async def spool_upload(file: UploadFile, max_bytes: Optional[int] = None) -> AsyncIterator[SpooledUpload]:
+    """:func:`save_upload` for the duration of the block; the temp file is deleted on exit."""
+    upload = await save_upload(file, max_bytes)
+    try:
+        yield upload
+    finally:
+        _remove(upload.path)
+
+
+class _BodyTooLarge(HTTPException):
+    # An HTTPException, so FastAPI's body parsing re-raises it and answers 413
+    # instead of wrapping it in a 400 "error parsing the body".
+    def __init__(self, max_bytes: int) -> None:
+        super().__init__(status.HTTP_413_REQUEST_ENTITY_TOO_LARGE, _too_large(max_bytes).detail)
+
+
+class UploadLimitMiddleware:
+    """Answer 413 for upload requests whose body is larger than the limit, before it is parsed."""
+
+    def __init__(self, app, paths: Iterable[str], max_bytes: Optional[int] = None) -> None:
+        self.app = app
+        self.paths = frozenset(paths)
+        self.max_bytes = max_bytes
+
+    def _max_bytes(self) -> int:
+        # Read at request time so tests can lower MAX_UPLOAD_BYTES.
+        return MAX_UPLOAD_BYTES if self.max_bytes is None else self.max_bytes
+
+    async def __call__(self, scope, receive, send) -> None:
+        if scope["type"] != "http" or scope["path"] not in self.paths:
+            await self.app(scope, receive, send)
+            return
+
+        max_bytes = self._max_bytes()
+        limit = max_bytes + MULTIPART_OVERHEAD
+        declared = dict(scope["headers"]).get(b"content-length")
+        if declared is not None and declared.isdigit() and int(declared) > limit:
+            await self._reject(send, max_bytes)
+            return
+
+        received = 0
+        started = False
+
+        async def counting_receive():
+            nonlocal received
+            message = await receive()
+            if message["type"] == "http.request":
+                received += len(message.get("body", b""))
+                if received > limit:
+                    raise _BodyTooLarge(max_bytes)
+            return message
+
+        async def send_wrapper(message) -> None:
+            nonlocal started
+            if message["type"] == "http.response.start":
+                started = True
+            await send(message)
+
+        try:
+            await self.app(scope, counting_receive, send_wrapper)
+        except _BodyTooLarge:
+            if started:
+                raise
+            await self._reject(send, max_bytes)
+
+    async def _reject(self, send, max_bytes: int) -> None:
+        logger.warning(f"Rejected upload larger than {max_bytes} bytes")
+        exc = _too_large(max_bytes)
+        body = json.dumps({"detail": exc.detail}).encode()
+        await send({
+            "type": "http.response.start",
+            "status": exc.status_code,
+            "headers": [(b"content-type", b"application/json"), (b"content-length", str(len(body)).encode())],
+        })
+        await send({"type": "http.response.body", "body": body})